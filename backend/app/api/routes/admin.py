@@ -4,11 +4,19 @@ PICAM Admin API Routes
 Administrative endpoints for system management.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File
 from datetime import date, timedelta
+from typing import Optional
 
 from app.services.sample_data_generator import generate_sample_data
-from app.services import get_insight_generator
+from app.services.backfill import backfill_file, detect_format
+from app.services import (
+    get_insight_generator,
+    get_rollup_service,
+    get_query_plan_recorder,
+    get_location_registry,
+    get_audit_sink
+)
 
 router = APIRouter()
 
@@ -41,4 +49,120 @@ async def generate_all_insights(
     end_date = date.today()
     start_date = end_date - timedelta(days=days - 1)
     
-    return await service.regenerate_insights(start_date, end_date)
\ No newline at end of file
+    return await service.regenerate_insights(start_date, end_date)
+
+
+@router.post("/rebuild-rollups", response_model=dict)
+async def rebuild_rollups(
+    start_date: date,
+    end_date: date
+):
+    """
+    Recompute hourly and daily rollups from raw operational data.
+    
+    Use after importing data that bypassed ingestion, or if rollups
+    have drifted.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    
+    if (end_date - start_date).days > 366:
+        raise HTTPException(status_code=400, detail="Rebuild at most one year at a time")
+    
+    return await get_rollup_service().rebuild_range(start_date, end_date)
+
+
+@router.post("/backfill", response_model=dict)
+async def backfill(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(default=None, pattern="^(csv|parquet)$"),
+    chunk_size: Optional[int] = Query(default=None, ge=100, le=100000),
+    source: str = Query(default="backfill", min_length=1, max_length=100),
+    idempotent: bool = Query(default=False)
+):
+    """
+    Import a CSV or Parquet export of historical operational data.
+    
+    The upload is read in chunks; each chunk is validated column-wise,
+    bulk inserted and folded into the rollups. Columns must use the
+    ingestion field names (the backfill script can rename them).
+    Parquet needs pyarrow on the server. idempotent=true upserts, so an
+    interrupted import can simply be re-run.
+    """
+    file_format = format or detect_format(file.filename or "")
+    if file_format is None:
+        raise HTTPException(status_code=400, detail="Unknown file type; pass format=csv or format=parquet")
+    
+    try:
+        summary = await backfill_file(
+            file.file, file_format, data_source=source, chunk_size=chunk_size,
+            idempotent=idempotent
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    summary["errors"] = summary["errors"][:10]
+    return summary
+
+
+@router.get("/query-plans", response_model=dict)
+async def get_query_plans(clear: bool = Query(default=False)):
+    """
+    Recent explain() summaries of repository reads (DEBUG mode only).
+    
+    Collection scans and in-memory sorts are flagged; a high
+    examined_per_returned ratio points at a missing or unselective index.
+    """
+    recorder = get_query_plan_recorder()
+    plans = recorder.get_plans()
+    if clear:
+        recorder.clear()
+    
+    return {
+        "enabled": recorder.enabled,
+        "count": len(plans),
+        "collection_scans": sum(1 for p in plans if p["collection_scan"]),
+        "in_memory_sorts": sum(1 for p in plans if p["in_memory_sort"]),
+        "plans": plans
+    }
+
+
+@router.get("/audit/verify", response_model=dict)
+async def verify_audit_chains(chain_id: Optional[str] = None):
+    """
+    Verify the hash chains of the calculation audit log.
+    
+    Checks one chain, or every chain written by any API worker when no
+    chain_id is given. A failed chain reports the first bad batch.
+    """
+    sink = get_audit_sink()
+    if chain_id:
+        chains = [await sink.verify_chain(chain_id)]
+    else:
+        chains = await sink.verify_all_chains()
+    
+    return {
+        "valid": all(chain["valid"] for chain in chains),
+        "current_chain_id": sink.chain_id,
+        "chains": chains
+    }
+
+
+@router.put("/locations/{location_id}/capacity", response_model=dict)
+async def set_location_capacity(
+    location_id: str,
+    max_servers: int = Query(..., ge=1),
+    max_queue_capacity: int = Query(..., ge=1)
+):
+    """
+    Set a registered location's capacity used by the physics engine.
+    
+    Other API workers pick the change up when their registry cache is
+    reloaded (LOCATION_CACHE_TTL_SECONDS).
+    """
+    entry = await get_location_registry().set_capacity(
+        location_id, max_servers, max_queue_capacity
+    )
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Location '{location_id}' is not registered")
+    return entry.to_dict()
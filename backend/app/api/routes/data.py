@@ -2,8 +2,9 @@
 PICAM Data Ingestion API Routes (Updated)
 """
 
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Body, Request
+from typing import Any, Dict, List, Optional
+from dataclasses import asdict
 from datetime import date
 
 from app.models.schemas import (
@@ -15,6 +16,7 @@ from app.services import (
     DataIngestionService,
     VideoProcessorService,
     get_ingestion_service,
+    get_location_registry,
     get_video_processor
 )
 from app.utils import now_utc
@@ -22,6 +24,19 @@ from app.utils import now_utc
 router = APIRouter()
 
 
+def _write_counts(result) -> Dict[str, int]:
+    """
+    Inserted / matched (already stored) totals of a bulk result.
+    
+    Idempotent writes only $setOnInsert, so a matched point is never
+    modified and no modified count is reported.
+    """
+    return {
+        "inserted": result.inserted,
+        "matched": result.matched
+    }
+
+
 @router.post("/ingest", response_model=dict)
 async def ingest_operational_data(data: OperationalDataInput):
     """
@@ -48,20 +63,109 @@ async def ingest_operational_data(data: OperationalDataInput):
 
 
 @router.post("/ingest/batch", response_model=dict)
-async def ingest_batch_operational_data(data: BatchOperationalDataInput):
+async def ingest_batch_operational_data(
+    data: BatchOperationalDataInput,
+    idempotent: bool = Query(default=False)
+):
     """
     Ingest multiple operational data points in batch.
+    
+    With idempotent=true points are upserted on (location_id, timestamp,
+    source): a retried batch stores nothing twice, and replayed points
+    are reported as matched.
     """
     service = get_ingestion_service()
-    result = await service.ingest_batch(data, source="api_batch")
+    try:
+        result = await service.ingest_batch(data, source="api_batch", idempotent=idempotent)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
     
-    return {
+    response = {
         "status": "success" if result.success else "partial",
         "message": f"Processed {result.records_processed} records",
         "processed": result.records_processed,
         "failed": result.records_failed,
         "errors": result.errors[:10] if result.errors else []
     }
+    if idempotent:
+        response.update(_write_counts(result))
+    return response
+
+
+@router.post("/ingest/bulk", response_model=dict)
+async def ingest_bulk_operational_data(
+    rows: List[Dict[str, Any]] = Body(..., min_length=1),
+    chunk_size: Optional[int] = Query(default=None, ge=100, le=100000),
+    source: str = Query(default="bulk", min_length=1, max_length=100),
+    idempotent: bool = Query(default=False)
+):
+    """
+    Ingest a large JSON array of data points (e.g. sensor gateway replays).
+    
+    Rows use the single-ingest field names but are validated column-wise
+    and written in unordered chunks; invalid rows and failed chunks are
+    reported without stopping the rest. idempotent=true upserts instead
+    of inserting, so replaying a gateway buffer is safe.
+    """
+    service = get_ingestion_service()
+    try:
+        result = await service.ingest_bulk(
+            rows, source=source, chunk_size=chunk_size, idempotent=idempotent
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    
+    return {
+        "status": "success" if result.success else "partial",
+        "message": f"Processed {result.records_processed} records",
+        "processed": result.records_processed,
+        "failed": result.records_failed,
+        **_write_counts(result),
+        "errors": result.errors[:10] if result.errors else [],
+        "chunks": [{**asdict(chunk), "errors": chunk.errors[:10]} for chunk in result.chunks]
+    }
+
+
+@router.post("/ingest/stream", response_model=dict)
+async def ingest_stream_operational_data(
+    request: Request,
+    format: Optional[str] = Query(default=None, pattern="^(ndjson|csv)$"),
+    chunk_size: Optional[int] = Query(default=None, ge=100, le=100000),
+    source: str = Query(default="stream", min_length=1, max_length=100),
+    idempotent: bool = Query(default=False)
+):
+    """
+    Stream an NDJSON or CSV upload (e.g. historical imports).
+    
+    One record per line; CSV needs a header line. The format comes from
+    the format parameter or the Content-Type (text/csv,
+    application/x-ndjson). The body is parsed, validated and inserted in
+    bounded chunks as it arrives, so memory use does not grow with file
+    size. Returns a summary per chunk. idempotent=true as for
+    /ingest/bulk.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        format = "csv" if content_type in ("text/csv", "application/csv") else "ndjson"
+    
+    service = get_ingestion_service()
+    try:
+        result = await service.ingest_stream(
+            request.stream(), format, source=source, chunk_size=chunk_size,
+            idempotent=idempotent
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    
+    return {
+        "status": "success" if result.success else "partial",
+        "message": f"Processed {result.records_processed} records",
+        "processed": result.records_processed,
+        "failed": result.records_failed,
+        **_write_counts(result),
+        "errors": result.errors[:10] if result.errors else [],
+        "chunks": [asdict(chunk) for chunk in result.chunks]
+    }
 
 
 @router.post("/ingest/video-frame", response_model=dict)
@@ -118,6 +222,14 @@ async def get_locations():
     return await service.get_locations()
 
 
+@router.get("/locations/registry", response_model=List[dict])
+async def get_location_registry_entries():
+    """
+    Registered locations with type, capacity and first/last seen.
+    """
+    return [entry.to_dict() for entry in await get_location_registry().get_all()]
+
+
 @router.get("/quality", response_model=dict)
 async def get_data_quality(
     start_date: date,
@@ -126,6 +238,10 @@ async def get_data_quality(
 ):
     """
     Get data quality report for a date range.
+    
+    Includes completeness per location and day, the largest gaps
+    (missing intervals), duplicate timestamps and consistency violation
+    counts, all computed in the database.
     """
     service = get_ingestion_service()
     report = await service.check_data_quality(start_date, end_date, location_id)
@@ -136,6 +252,10 @@ async def get_data_quality(
         "completeness_score": report.completeness_score,
         "consistency_score": report.consistency_score,
         "issues": report.issues,
+        "consistency_violations": report.consistency_violations,
+        "gaps": report.gaps,
+        "duplicate_timestamps": report.duplicate_timestamps,
+        "location_days": report.location_days,
         "quality_grade": (
             "A" if report.completeness_score > 0.9 and report.consistency_score > 0.95 else
             "B" if report.completeness_score > 0.7 and report.consistency_score > 0.9 else
@@ -8,13 +8,16 @@ from typing import Optional, List
 from datetime import date, datetime
 
 from app.models.mongodb_models import OperationalDataPoint
-from app.models.domain import FlowMeasurement, LocationType, CapacityConstraint
 from app.core import (
     LittlesLawCalculator,
     EntropyCalculator,
     LossCalculator,
     get_physics_engine
 )
+from app.services.flow_repository import get_flow_repository
+from app.services.live_metrics import get_live_metrics_registry
+from app.services.rollups import get_rollup_service
+from app.services.location_registry import get_location_registry
 from app.utils import get_date_range, now_utc
 from app.config import get_settings
 
@@ -33,51 +36,34 @@ async def get_metrics_summary(
     All calculations are deterministic and traceable.
     """
     try:
-        start_dt, end_dt = get_date_range(target_date, target_date)
-        
-        # Build query
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-        
-        # Fetch data points
-        data_points = await OperationalDataPoint.find(query).to_list()
-        
-        if not data_points:
+        # Maintained daily rollups; aggregate raw data unless they cover
+        # every stored point of the day
+        summary = await get_rollup_service().summarize_day(target_date, location_id)
+        method = "Daily rollups"
+        if summary is None:
+            summary = await get_flow_repository().summarize_day(target_date, location_id)
+            method = "MongoDB aggregation pipeline"
+        
+        if not summary:
             return {
                 "date": target_date.isoformat(),
                 "status": "no_data",
                 "message": "No operational data for this date"
             }
         
-        # Aggregate metrics
-        total_arrivals = sum(dp.arrival_count for dp in data_points)
-        total_departures = sum(dp.departure_count for dp in data_points)
-        
-        queue_lengths = [dp.queue_length for dp in data_points]
-        avg_queue = sum(queue_lengths) / len(queue_lengths)
-        max_queue = max(queue_lengths)
-        
-        wait_times = [dp.avg_wait_time for dp in data_points if dp.avg_wait_time]
-        avg_wait = sum(wait_times) / len(wait_times) if wait_times else 0
-        max_wait = max(wait_times) if wait_times else 0
-        
-        service_times = [dp.avg_service_duration for dp in data_points if dp.avg_service_duration]
-        avg_service = sum(service_times) / len(service_times) if service_times else 0
-        
-        # Calculate utilization
-        utilizations = []
-        for dp in data_points:
-            if dp.departure_rate and dp.departure_rate > 0:
-                rho = dp.arrival_rate / dp.departure_rate
-                utilizations.append(min(rho, 2.0))
-        
-        avg_util = sum(utilizations) / len(utilizations) if utilizations else 0
-        peak_util = max(utilizations) if utilizations else 0
+        total_arrivals = summary["total_arrivals"]
+        total_departures = summary["total_departures"]
+        avg_queue = summary["avg_queue"]
+        max_queue = summary["max_queue"]
+        avg_wait = summary["avg_wait"] or 0
+        max_wait = summary["max_wait"] or 0
+        avg_service = summary["avg_service"] or 0
+        avg_util = summary["avg_util"] or 0
+        peak_util = summary["peak_util"] or 0
         
         return {
             "date": target_date.isoformat(),
-            "data_points_count": len(data_points),
+            "data_points_count": summary["count"],
             "flow_metrics": {
                 "total_arrivals": total_arrivals,
                 "total_departures": total_departures,
@@ -100,7 +86,8 @@ async def get_metrics_summary(
             "calculation_metadata": {
                 "timestamp": now_utc().isoformat(),
                 "is_deterministic": True,
-                "formula": "Standard queueing metrics aggregation"
+                "formula": "Standard queueing metrics aggregation",
+                "method": method
             }
         }
         
@@ -123,39 +110,19 @@ async def calculate_littles_law(
     - Plus queue-specific metrics (Lq, Wq, ρ)
     """
     try:
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-            
-        data_points = await OperationalDataPoint.find(query).to_list()
+        series = await get_flow_repository().fetch_series(target_date, location_id)
+        count = len(series) if series is not None else 0
         
-        if len(data_points) < 10:
+        if count < 10:
             return {
                 "date": target_date.isoformat(),
                 "status": "insufficient_data",
-                "message": f"Need at least 10 data points, have {len(data_points)}"
+                "message": f"Need at least 10 data points, have {count}"
             }
         
-        # Convert to FlowMeasurements
-        measurements = []
-        for dp in data_points:
-            m = FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
-            )
-            measurements.append(m)
-        
         # Calculate Little's Law
         calculator = LittlesLawCalculator()
-        result = calculator.calculate(measurements)
+        result = calculator.calculate(series)
         
         if not result:
             return {
@@ -165,7 +132,7 @@ async def calculate_littles_law(
             }
         
         # Verify the law holds
-        verification = calculator.verify_littles_law(measurements)
+        verification = calculator.verify_littles_law(series)
         
         return {
             "date": target_date.isoformat(),
@@ -204,7 +171,11 @@ async def calculate_littles_law(
 @router.get("/entropy/{target_date}", response_model=dict)
 async def calculate_entropy(
     target_date: date,
-    location_id: Optional[str] = None
+    location_id: Optional[str] = None,
+    use_sketch: bool = Query(
+        False,
+        description="Read the running entropy sketch instead of reloading all points (requires location_id)"
+    )
 ):
     """
     Calculate operational entropy (variability) for a specific date.
@@ -215,41 +186,48 @@ async def calculate_entropy(
     - Kingman's formula impact on wait times
     """
     try:
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-            
-        data_points = await OperationalDataPoint.find(query).to_list()
-        
-        if len(data_points) < 10:
-            return {
-                "date": target_date.isoformat(),
-                "status": "insufficient_data"
-            }
+        calculator = EntropyCalculator()
         
-        # Convert to FlowMeasurements
-        measurements = [
-            FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
+        if use_sketch and location_id:
+            # Precomputed per-hour sketches maintained during ingestion
+            registry = get_live_metrics_registry()
+            day = await registry.get_day_metrics(location_id, target_date)
+            
+            if day.count < 10:
+                return {
+                    "date": target_date.isoformat(),
+                    "status": "insufficient_data"
+                }
+            
+            entropy = calculator.entropy_from_sketch(
+                day.entropy_sketch(),
+                location_id,
+                day.littles.last_timestamp
             )
-            for dp in data_points
-        ]
-        
-        # Calculate entropy
-        calculator = EntropyCalculator()
-        entropy = calculator.calculate_entropy(
-            measurements,
-            location_id or data_points[0].location_id
-        )
+            patterns = calculator.patterns_from_sketches(day.hourly_entropy)
+            littles_result = day.littles.result()
+            method = "Running entropy sketch (fixed bins)"
+        else:
+            series = await get_flow_repository().fetch_series(target_date, location_id)
+            
+            if series is None or len(series) < 10:
+                return {
+                    "date": target_date.isoformat(),
+                    "status": "insufficient_data"
+                }
+            
+            # Calculate entropy
+            entropy = calculator.calculate_entropy(
+                series,
+                location_id or series.location_id
+            )
+            
+            # Analyze patterns
+            patterns = calculator.analyze_patterns(series)
+            
+            # Need utilization for Kingman impact
+            littles_result = LittlesLawCalculator().calculate(series)
+            method = "Full data scan"
         
         if not entropy:
             return {
@@ -257,14 +235,7 @@ async def calculate_entropy(
                 "status": "calculation_failed"
             }
         
-        # Analyze patterns
-        patterns = calculator.analyze_patterns(measurements)
-        
         # Calculate Kingman impact
-        # Need utilization for this
-        littles_calc = LittlesLawCalculator()
-        littles_result = littles_calc.calculate(measurements)
-        
         kingman_impact = None
         if littles_result:
             kingman_impact = calculator.calculate_kingman_impact(
@@ -298,6 +269,7 @@ async def calculate_entropy(
             "kingman_impact": kingman_impact,
             "calculation_metadata": {
                 "timestamp": now_utc().isoformat(),
+                "method": method,
                 "formula": "Kingman: Wq ≈ (ρ/(1-ρ)) × ((Ca² + Cs²)/2) × (1/μ)"
             }
         }
@@ -320,63 +292,38 @@ async def calculate_financial_loss(
     - Walk-away cost
     - Idle time cost
     - Overtime cost
+    
+    Idle time and overtime need a capacity, which only front desk data
+    has: the registered capacity of location_id, or the default front
+    desk capacity.
     """
     try:
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-            
-        data_points = await OperationalDataPoint.find(query).to_list()
+        series = await get_flow_repository().fetch_series(target_date, location_id)
         
-        if not data_points:
+        if series is None:
             return {
                 "date": target_date.isoformat(),
                 "status": "no_data"
             }
         
-        # Convert to FlowMeasurements
-        measurements = [
-            FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
-            )
-            for dp in data_points
-        ]
-        
-        # Get settings for capacity
-        settings = get_settings()
-        loc_type = data_points[0].location_type
-        
-        capacity = None
-        if loc_type == "front_desk":
-            capacity = CapacityConstraint(
-                location_type=LocationType.FRONT_DESK,
-                max_servers=settings.front_desk_stations,
-                max_queue_capacity=50
-            )
+        capacity = await get_location_registry().loss_capacity(
+            location_id, series.location_type.value
+        )
         
         # Calculate supporting metrics
         littles_calc = LittlesLawCalculator()
         entropy_calc = EntropyCalculator()
         
-        littles_result = littles_calc.calculate(measurements, capacity)
+        littles_result = littles_calc.calculate(series, capacity)
         entropy = entropy_calc.calculate_entropy(
-            measurements,
-            location_id or data_points[0].location_id
+            series,
+            location_id or series.location_id
         )
         
         # Calculate loss
         loss_calc = LossCalculator()
         loss = loss_calc.calculate_total_loss(
-            measurements=measurements,
+            measurements=series,
             littles_result=littles_result,
             entropy=entropy,
             capacity=capacity,
@@ -385,7 +332,7 @@ async def calculate_financial_loss(
         
         return {
             "date": target_date.isoformat(),
-            "location": location_id or data_points[0].location_id,
+            "location": location_id or series.location_id,
             "status": "calculated",
             "loss_breakdown": {
                 "wait_time_cost": round(loss.wait_time_cost, 2),
@@ -427,46 +374,22 @@ async def get_complete_analysis(
     into a unified analysis.
     """
     try:
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-            
-        data_points = await OperationalDataPoint.find(query).to_list()
+        series = await get_flow_repository().fetch_series(target_date, location_id)
         
-        if not data_points:
+        if series is None:
             return {
                 "date": target_date.isoformat(),
                 "status": "no_data"
             }
         
-        # Convert to FlowMeasurements
-        measurements = [
-            FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
-            )
-            for dp in data_points
-        ]
-        
         # Use physics engine for complete analysis
         engine = get_physics_engine()
         
-        settings = get_settings()
-        capacity = CapacityConstraint(
-            location_type=LocationType.FRONT_DESK,
-            max_servers=settings.front_desk_stations,
-            max_queue_capacity=50
-        )
+        # A requested location is analyzed against its registered capacity
+        # (any type); the data of all locations against the front desk's
+        capacity = await get_location_registry().analysis_capacity(location_id)
         
-        analysis = engine.analyze_location(measurements, capacity)
+        analysis = engine.analyze_location(series, capacity)
         
         return {
             "date": target_date.isoformat(),
@@ -486,42 +409,27 @@ async def get_hourly_metrics(
     Get metrics broken down by hour for a specific date.
     """
     try:
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-            
-        data_points = await OperationalDataPoint.find(query).to_list()
+        # Hourly rollups when they cover the day, else the raw data pipeline
+        hours = await get_rollup_service().hourly_breakdown(target_date, location_id)
+        if not hours:
+            hours = await get_flow_repository().hourly_breakdown(target_date, location_id)
         
-        if not data_points:
+        if not hours:
             return {
                 "date": target_date.isoformat(),
                 "status": "no_data"
             }
         
-        # Group by hour
-        hourly = {h: {"arrivals": 0, "queue_lengths": [], "wait_times": []} 
-                  for h in range(24)}
-        
-        for dp in data_points:
-            hour = dp.timestamp.hour
-            hourly[hour]["arrivals"] += dp.arrival_count
-            hourly[hour]["queue_lengths"].append(dp.queue_length)
-            if dp.avg_wait_time:
-                hourly[hour]["wait_times"].append(dp.avg_wait_time)
-        
-        # Calculate hourly averages
+        # One aggregated row per hour with data, in hour order
         result = {}
-        for hour, data in hourly.items():
-            if data["queue_lengths"]:
-                result[hour] = {
-                    "arrivals": data["arrivals"],
-                    "avg_queue_length": round(
-                        sum(data["queue_lengths"]) / len(data["queue_lengths"]), 2
-                    ),
-                    "avg_wait_time": round(
-                        sum(data["wait_times"]) / len(data["wait_times"]), 2
-                    ) if data["wait_times"] else None
-                }
+        for row in hours:
+            result[row["_id"]] = {
+                "arrivals": row["arrivals"],
+                "avg_queue_length": round(row["avg_queue"], 2),
+                "avg_wait_time": (
+                    round(row["avg_wait"], 2) if row["avg_wait"] is not None else None
+                )
+            }
         
         # Find peak hour
         peak_hour = None
@@ -536,4 +444,143 @@ async def get_hourly_metrics(
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/percentiles/{start_date}", response_model=dict)
+async def get_duration_percentiles(
+    start_date: date,
+    end_date: Optional[date] = None,
+    location_id: Optional[str] = None
+):
+    """
+    p50/p90/p95/p99 wait and service times for a date or date range.
+    
+    Merged from the quantile sketches stored in hourly rollups, so long
+    ranges never reread raw data. Each percentile is within the sketch's
+    relative accuracy of the exact value.
+    """
+    try:
+        end_date = end_date or start_date
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+        
+        sketches = await get_rollup_service().get_quantile_sketches(
+            start_date, end_date, location_id
+        )
+        
+        def percentiles(name: str) -> Optional[dict]:
+            sketch = sketches.get(name)
+            if sketch is None or sketch.count == 0:
+                return None
+            return {
+                "count": sketch.count,
+                **{
+                    f"p{int(q * 100)}_seconds": round(sketch.quantile(q), 2)
+                    for q in (0.5, 0.9, 0.95, 0.99)
+                }
+            }
+        
+        wait = percentiles("avg_wait_time")
+        service = percentiles("avg_service_duration")
+        
+        if wait is None and service is None:
+            return {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "status": "no_data"
+            }
+        
+        accuracy = next(iter(sketches.values())).relative_accuracy
+        
+        return {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "location_id": location_id,
+            "status": "calculated",
+            "wait_time": wait,
+            "service_time": service,
+            "calculation_metadata": {
+                "timestamp": now_utc().isoformat(),
+                "method": "Merged hourly quantile sketches (DDSketch)",
+                "relative_accuracy": accuracy,
+                "note": "Percentiles of per-period average durations; zero waits are not measured"
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/live/{location_id}", response_model=dict)
+async def get_live_metrics(
+    location_id: str,
+    target_date: Optional[date] = None,
+    servers: int = Query(1, ge=1, description="Number of parallel servers (c) for ρ")
+):
+    """
+    Current Little's Law metrics for a location, from running accumulators.
+    
+    Updated on every ingested data point; reading costs O(1) and does
+    not rescan the day's data. Defaults to today (UTC).
+    """
+    try:
+        settings = get_settings()
+        registry = get_live_metrics_registry()
+        accumulator = await registry.get_accumulator(location_id, target_date)
+        
+        result = accumulator.result(
+            num_servers=servers,
+            confidence_level=settings.confidence_level
+        )
+        
+        if not result:
+            return {
+                "location_id": location_id,
+                "date": accumulator.target_date.isoformat(),
+                "status": "no_data" if accumulator.count == 0 else "no_arrivals",
+                "data_points_used": accumulator.count
+            }
+        
+        wait_time = accumulator.wait_time
+        
+        return {
+            "location_id": location_id,
+            "date": accumulator.target_date.isoformat(),
+            "status": "live",
+            "as_of": result.timestamp.isoformat(),
+            "littles_law": {
+                "L": round(result.L, 4),
+                "lambda_rate": round(result.lambda_rate, 6),
+                "W_seconds": round(result.W, 2),
+                "formula": "L = λW"
+            },
+            "queue_metrics": {
+                "L_q": round(result.L_q, 4),
+                "W_q_seconds": round(result.W_q, 2),
+                "service_rate_mu": round(accumulator.departure_rate.mean, 6),
+                "utilization_rho": round(result.rho, 4),
+                "observed_avg_wait_seconds": (
+                    round(wait_time.mean, 2) if wait_time.count else None
+                )
+            },
+            "system_state": {
+                "is_stable": result.rho < 1.0,
+                "is_valid": result.is_valid,
+                "confidence_interval": [
+                    round(result.confidence_interval_lower, 4),
+                    round(result.confidence_interval_upper, 4)
+                ]
+            },
+            "data_points_used": result.data_points_used,
+            "calculation_metadata": {
+                "timestamp": now_utc().isoformat(),
+                "is_deterministic": True,
+                "method": "Running (Welford) accumulators"
+            }
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
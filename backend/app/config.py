@@ -31,6 +31,48 @@ class Settings(BaseSettings):
         default="picam",
         description="Database name"
     )
+    use_timeseries_collection: bool = Field(
+        default=False,
+        description="Store operational data in a MongoDB time-series collection (run app.scripts.migrate_timeseries first for existing data)"
+    )
+    timeseries_granularity: str = Field(
+        default="minutes",
+        description="Time-series bucket granularity: seconds, minutes or hours",
+        pattern="^(seconds|minutes|hours)$"
+    )
+    bulk_insert_chunk_size: int = Field(
+        default=5000,
+        description="Documents per unordered insert_many in the bulk ingestion path",
+        ge=100,
+        le=100000
+    )
+    ingest_batch_max_size: int = Field(
+        default=100,
+        description="Single-point ingests coalesced into one insert_many (1 disables batching)",
+        ge=1
+    )
+    ingest_batch_linger_ms: int = Field(
+        default=5,
+        description="Maximum time a single-point ingest waits for its batch to fill",
+        ge=0,
+        le=1000
+    )
+    audit_batch_max_size: int = Field(
+        default=500,
+        description="Audit log entries per group-commit insert_many",
+        ge=1
+    )
+    audit_flush_interval_ms: int = Field(
+        default=1000,
+        description="Maximum time buffered audit log entries wait before a flush",
+        ge=10
+    )
+    
+    location_cache_ttl_seconds: int = Field(
+        default=60,
+        description="How long the in-process location registry is served before reloading (picks up other workers' locations)",
+        ge=0
+    )
     
     # Hotel Configuration (Fixed Capacity)
     hotel_name: str = "Default Hotel"
@@ -86,6 +128,28 @@ class Settings(BaseSettings):
         description="Minimum observations needed for valid calculation",
         ge=5
     )
+    analysis_pool_workers: int = Field(
+        default=0,
+        description="Worker processes for per-location daily analysis - 0 runs sequentially",
+        ge=0
+    )
+    entropy_bin_edges: list[float] = Field(
+        default=[1, 2, 3, 5, 8, 12, 18, 27, 40, 60, 90],
+        description="Fixed arrival-count bin edges for streaming entropy sketches"
+    )
+    use_entropy_sketches: bool = Field(
+        default=False,
+        description=(
+            "Use precomputed entropy sketches in daily analysis when they cover all data "
+            "(entropy scores then come from the fixed sketch bins)"
+        )
+    )
+    quantile_sketch_accuracy: float = Field(
+        default=0.01,
+        description="Relative accuracy of the stored wait/service duration quantile sketches",
+        gt=0,
+        lt=0.5
+    )
     
     # Video Processing (Privacy-First)
     video_retention_seconds: int = Field(
@@ -5,6 +5,10 @@ This package contains the physics-based calculation engine that converts
 operational data into provable financial losses.
 
 Key Components:
+- FlowSeries: Columnar flow data shared by all calculators
+- LittlesLawAccumulator: Streaming Little's Law inputs per location/day
+- FlowStatistics: Mergeable sufficient statistics for any date range
+- QuantileSketch: Mergeable relative-error percentiles (DDSketch)
 - LittlesLawCalculator: L = λW calculations
 - EntropyCalculator: Variability and its cost impact
 - LossCalculator: Conservative financial loss estimation
@@ -17,9 +21,27 @@ All calculations are:
 - Fully auditable
 """
 
+from app.core.flow_series import (
+    FlowSeries,
+    FlowData,
+    as_flow_series
+)
+
+from app.core.online_stats import (
+    RunningMoments,
+    LittlesLawAccumulator,
+    EntropySketch,
+    FieldStatistics,
+    FlowStatistics,
+    QuantileSketch
+)
+
 from app.core.littles_law import (
     LittlesLawCalculator,
     MultiServerQueueCalculator,
+    QueueMetrics,
+    StaffingPlan,
+    erlang_b,
     create_audit_log
 )
 
@@ -30,19 +52,38 @@ from app.core.entropy_calculator import (
 
 from app.core.loss_calculator import (
     LossCalculator,
+    LossComponents,
     FinancialParameters,
     ROICalculator
 )
 
 from app.core.physics_engine import (
     PhysicsEngine,
-    get_physics_engine
+    LocationAnalysisContext,
+    get_physics_engine,
+    shutdown_analysis_pool
 )
 
 __all__ = [
+    # Flow data
+    "FlowSeries",
+    "FlowData",
+    "as_flow_series",
+    
+    # Online statistics
+    "RunningMoments",
+    "LittlesLawAccumulator",
+    "EntropySketch",
+    "FieldStatistics",
+    "FlowStatistics",
+    "QuantileSketch",
+    
     # Little's Law
     "LittlesLawCalculator",
     "MultiServerQueueCalculator",
+    "QueueMetrics",
+    "StaffingPlan",
+    "erlang_b",
     "create_audit_log",
     
     # Entropy
@@ -51,10 +92,13 @@ __all__ = [
     
     # Loss Calculation
     "LossCalculator",
+    "LossComponents",
     "FinancialParameters",
     "ROICalculator",
     
     # Main Engine
     "PhysicsEngine",
-    "get_physics_engine"
+    "LocationAnalysisContext",
+    "get_physics_engine",
+    "shutdown_analysis_pool"
 ]
\ No newline at end of file
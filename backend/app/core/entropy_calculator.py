@@ -20,6 +20,8 @@ import numpy as np
 from scipy import stats
 
 from app.models.domain import FlowMeasurement, EntropyMeasurement
+from app.core.flow_series import FlowData, as_flow_series
+from app.core.online_stats import EntropySketch, RunningMoments
 from app.utils import now_utc
 
 
@@ -42,31 +44,28 @@ class EntropyCalculator:
     
     def calculate_entropy(
         self,
-        measurements: List[FlowMeasurement],
+        measurements: FlowData,
         location_id: str
     ) -> Optional[EntropyMeasurement]:
         """
         Calculate entropy metrics from flow measurements.
         
         Args:
-            measurements: List of flow measurements
+            measurements: FlowSeries or list of flow measurements
             location_id: Location identifier
             
         Returns:
             EntropyMeasurement with variability metrics
         """
-        if len(measurements) < self.min_data_points:
+        series = as_flow_series(measurements)
+        if series is None or len(series) < self.min_data_points:
             return None
         
         # Extract arrival data
-        arrivals = np.array([m.arrival_count for m in measurements])
+        arrivals = series.arrival_count
         
         # Extract service duration data (if available)
-        service_times = np.array([
-            m.avg_service_duration 
-            for m in measurements 
-            if m.avg_service_duration is not None
-        ])
+        service_times = series.avg_service_duration[series.has_service_duration]
         
         # Calculate Coefficient of Variation for arrivals
         arrival_cv = self._calculate_cv(arrivals)
@@ -85,7 +84,7 @@ class EntropyCalculator:
         variance_impact = (arrival_cv ** 2 + service_cv ** 2) / 2
         
         return EntropyMeasurement(
-            timestamp=measurements[-1].timestamp,
+            timestamp=series.last_timestamp,
             location_id=location_id,
             arrival_cv=float(arrival_cv),
             service_cv=float(service_cv),
@@ -93,6 +92,62 @@ class EntropyCalculator:
             variance_impact_multiplier=float(max(1.0, 1 + variance_impact))
         )
     
+    def entropy_from_sketch(
+        self,
+        sketch: EntropySketch,
+        location_id: str,
+        timestamp: datetime
+    ) -> Optional[EntropyMeasurement]:
+        """
+        Calculate entropy metrics from a precomputed EntropySketch.
+        
+        CVs come from the sketch's running moments (same values as
+        calculate_entropy up to rounding), so the variance multiplier and
+        losses match the batch path. The entropy score does not: it is
+        taken over the sketch's fixed bins and normalized by
+        log2(min(bins, n)), while calculate_entropy uses min(10, n // 2)
+        equal-width bins over the observed range. The two scores are
+        comparable with their own kind only.
+        
+        Args:
+            sketch: Arrival/service sketch for the period
+            location_id: Location identifier
+            timestamp: Timestamp of the latest observation covered
+            
+        Returns:
+            EntropyMeasurement with variability metrics
+        """
+        if sketch.count < self.min_data_points:
+            return None
+        
+        arrival_cv = self._moments_cv(sketch.arrivals)
+        
+        if sketch.service_times.count >= self.min_data_points:
+            service_cv = self._moments_cv(sketch.service_times)
+        else:
+            # Assume moderate variability if no service data
+            service_cv = 0.5
+        
+        entropy_score = sketch.entropy_score()
+        
+        # Calculate variance impact multiplier (Kingman's approximation)
+        variance_impact = (arrival_cv ** 2 + service_cv ** 2) / 2
+        
+        return EntropyMeasurement(
+            timestamp=timestamp,
+            location_id=location_id,
+            arrival_cv=float(arrival_cv),
+            service_cv=float(service_cv),
+            entropy_score=float(entropy_score),
+            variance_impact_multiplier=float(max(1.0, 1 + variance_impact))
+        )
+    
+    def _moments_cv(self, moments: RunningMoments) -> float:
+        """CV (σ/μ, sample σ) from running moments."""
+        if moments.count < 2 or moments.mean <= 0:
+            return 0.0
+        return moments.std / moments.mean
+    
     def _calculate_cv(self, data: np.ndarray) -> float:
         """
         Calculate Coefficient of Variation (CV = σ/μ).
@@ -145,9 +200,17 @@ class EntropyCalculator:
         
         return entropy / max_entropy
     
+    # Pattern bucket sizes: name -> number of buckets
+    PATTERN_BUCKETS = {
+        "hour": 24,
+        "quarter_hour": 96,
+        "hour_of_week": 168,
+    }
+    
     def analyze_patterns(
         self,
-        measurements: List[FlowMeasurement]
+        measurements: FlowData,
+        bucket: str = "hour"
     ) -> Dict[str, any]:
         """
         Analyze temporal patterns in the data.
@@ -156,50 +219,119 @@ class EntropyCalculator:
         - Peak hours
         - High variability periods
         - Predictable vs unpredictable patterns
+        
+        Args:
+            measurements: FlowSeries or list of flow measurements
+            bucket: "hour" (0-23), "quarter_hour" (0-95, hour*4 + minute//15)
+                or "hour_of_week" (0-167, weekday*24 + hour, Monday = 0)
         """
-        if len(measurements) < self.min_data_points:
+        if bucket not in self.PATTERN_BUCKETS:
+            raise ValueError(f"Unknown pattern bucket: {bucket}")
+        
+        series = as_flow_series(measurements)
+        if series is None or len(series) < self.min_data_points:
             return {"status": "insufficient_data"}
         
-        # Group by hour
-        hourly_data: Dict[int, List[int]] = {h: [] for h in range(24)}
-        
-        for m in measurements:
-            hour = m.timestamp.hour
-            hourly_data[hour].append(m.arrival_count)
-        
-        # Calculate hourly statistics
-        hourly_stats = {}
-        for hour, arrivals in hourly_data.items():
-            if arrivals:
-                hourly_stats[hour] = {
-                    "mean": float(np.mean(arrivals)),
-                    "std": float(np.std(arrivals)) if len(arrivals) > 1 else 0,
-                    "cv": float(self._calculate_cv(np.array(arrivals))) if len(arrivals) > 1 else 0,
-                    "count": len(arrivals)
-                }
-        
-        # Identify peak hours (top 3 by mean arrivals)
-        sorted_hours = sorted(
-            hourly_stats.items(),
-            key=lambda x: x[1]["mean"],
-            reverse=True
+        if bucket == "quarter_hour":
+            keys = series.minute_of_day // 15
+        elif bucket == "hour_of_week":
+            keys = series.weekday * 24 + series.hours
+        else:
+            keys = series.hours
+        
+        # Grouped count, sum and sum of squares per bucket. Arrival counts
+        # are integers, so all three are exact.
+        num_buckets = self.PATTERN_BUCKETS[bucket]
+        arrivals = series.arrival_count
+        counts = np.bincount(keys, minlength=num_buckets)
+        sums = np.bincount(keys, weights=arrivals, minlength=num_buckets)
+        sumsq = np.bincount(keys, weights=arrivals * arrivals, minlength=num_buckets)
+        
+        present = np.flatnonzero(counts)
+        n = counts[present].astype(np.float64)
+        total = sums[present]
+        mean = total / n
+        # n·Σx² - (Σx)² is an exact integer; clamp tiny negatives anyway
+        spread = np.maximum(n * sumsq[present] - total * total, 0.0)
+        std = np.sqrt(spread) / n
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sample_std = np.sqrt(spread / (n * (n - 1)))
+            cv = np.where((n > 1) & (mean > 0), sample_std / mean, 0.0)
+        
+        return self._summarize_patterns(present, mean, std, cv, counts[present], bucket)
+    
+    def patterns_from_sketches(
+        self,
+        hourly_sketches: Dict[int, EntropySketch]
+    ) -> Dict[str, any]:
+        """
+        Temporal patterns from per-hour EntropySketches.
+        
+        Produces the same structure as analyze_patterns without
+        revisiting the observations.
+        """
+        total = sum(sketch.count for sketch in hourly_sketches.values())
+        if total < self.min_data_points:
+            return {"status": "insufficient_data"}
+        
+        hours = [h for h in sorted(hourly_sketches) if hourly_sketches[h].count]
+        moments = [hourly_sketches[h].arrivals for h in hours]
+        
+        return self._summarize_patterns(
+            np.array(hours, dtype=np.int64),
+            np.array([m.mean for m in moments], dtype=np.float64),
+            np.sqrt([m.population_variance for m in moments]),
+            np.array([self._moments_cv(m) for m in moments], dtype=np.float64),
+            np.array([m.count for m in moments], dtype=np.int64),
+            "hour"
         )
-        peak_hours = [h for h, _ in sorted_hours[:3] if hourly_stats[h]["mean"] > 0]
+    
+    def _summarize_patterns(
+        self,
+        buckets: np.ndarray,
+        mean: np.ndarray,
+        std: np.ndarray,
+        cv: np.ndarray,
+        count: np.ndarray,
+        bucket: str
+    ) -> Dict[str, any]:
+        """
+        Peak buckets, variability and predictability from per-bucket stats
+        (arrays aligned with ascending bucket indices).
+        """
+        single = count <= 1
+        
+        hourly_stats = {
+            b: {
+                "mean": m,
+                "std": 0 if one else s,
+                "cv": 0 if one else c,
+                "count": k
+            }
+            for b, m, s, c, k, one in zip(
+                buckets.tolist(), mean.tolist(), std.tolist(),
+                cv.tolist(), count.tolist(), single.tolist()
+            )
+        }
+        
+        # Identify peak hours (top 3 by mean arrivals; ties keep bucket order)
+        top = np.argsort(-mean, kind="stable")[:3]
+        peak_hours = [int(buckets[i]) for i in top if mean[i] > 0]
         
         # Identify high variability hours
-        high_var_hours = [
-            h for h, s in hourly_stats.items()
-            if s.get("cv", 0) > 1.0 and s.get("count", 0) >= 3
-        ]
+        reliable = count >= 3
+        high_var_hours = buckets[(cv > 1.0) & reliable & ~single].tolist()
         
         # Calculate overall pattern predictability
-        all_cvs = [s["cv"] for s in hourly_stats.values() if s.get("count", 0) >= 3]
-        avg_cv = np.mean(all_cvs) if all_cvs else 0
+        all_cvs = np.where(single, 0.0, cv)[reliable]
+        avg_cv = np.mean(all_cvs) if len(all_cvs) else 0
         
         predictability = "high" if avg_cv < 0.5 else "medium" if avg_cv < 1.0 else "low"
         
         return {
             "status": "analyzed",
+            "bucket": bucket,
             "peak_hours": peak_hours,
             "high_variability_hours": high_var_hours,
             "predictability": predictability,
@@ -316,6 +448,25 @@ class EntropyCalculator:
             return "Very high variability cost - urgent attention needed"
 
 
+@dataclass(frozen=True)
+class StabilityWindows:
+    """
+    Per-window stability indicators from a sliding-window pass.
+    
+    Window i covers observations [i, i + window_size); all arrays are
+    aligned on the window start index.
+    """
+    window_size: int
+    arrival_trend: np.ndarray  # Slope normalized by window mean
+    queue_trend: np.ndarray  # Slope normalized by window mean
+    arrival_cv: np.ndarray  # Population std / mean of arrivals
+    queue_mean: np.ndarray
+    states: np.ndarray  # "stable", "transition", "degrading", "recovering", "crisis"
+    
+    def __len__(self) -> int:
+        return len(self.states)
+
+
 class OperationalStabilityAnalyzer:
     """
     Analyzes operational stability over time.
@@ -328,60 +479,46 @@ class OperationalStabilityAnalyzer:
     
     def analyze_stability(
         self,
-        measurements: List[FlowMeasurement],
+        measurements: FlowData,
         window_size: int = 12  # 1 hour with 5-min intervals
     ) -> Dict[str, any]:
         """
         Analyze stability using rolling window analysis.
+        
+        The full per-window state sequence is returned as "state_series";
+        "periods" keeps the detailed view of the first 20 windows.
         """
-        if len(measurements) < window_size * 2:
+        series = as_flow_series(measurements)
+        if series is None or len(series) < window_size * 2:
             return {"status": "insufficient_data"}
         
-        arrivals = [m.arrival_count for m in measurements]
-        queues = [m.queue_length for m in measurements]
-        
-        # Calculate rolling statistics
-        stability_periods = []
+        windows = self.sliding_windows(series, window_size)
+        if windows is None:
+            return {"status": "insufficient_data"}
+        states = windows.states
+        total = len(windows)
         
-        for i in range(len(measurements) - window_size):
-            window_arrivals = arrivals[i:i + window_size]
-            window_queues = queues[i:i + window_size]
-            
-            # Stability indicators
-            arrival_trend = self._calculate_trend(window_arrivals)
-            queue_trend = self._calculate_trend(window_queues)
-            arrival_cv = np.std(window_arrivals) / np.mean(window_arrivals) if np.mean(window_arrivals) > 0 else 0
-            
-            # Classify period
-            if abs(arrival_trend) < 0.1 and abs(queue_trend) < 0.2:
-                state = "stable"
-            elif queue_trend > 0.5:
-                state = "degrading"
-            elif queue_trend < -0.5:
-                state = "recovering"
-            else:
-                state = "transition"
-            
-            # Check for crisis (queue growing rapidly)
-            if np.mean(window_queues) > 10 and queue_trend > 0.3:
-                state = "crisis"
-            
-            stability_periods.append({
+        # Detail for the first windows
+        stability_periods = [
+            {
                 "index": i,
-                "timestamp": measurements[i].timestamp.isoformat(),
-                "state": state,
-                "arrival_trend": round(arrival_trend, 4),
-                "queue_trend": round(queue_trend, 4),
-                "arrival_cv": round(arrival_cv, 4)
-            })
-        
-        # Summarize
-        state_counts = {}
-        for p in stability_periods:
-            state = p["state"]
-            state_counts[state] = state_counts.get(state, 0) + 1
+                "timestamp": series.timestamp_at(i).isoformat(),
+                "state": str(states[i]),
+                "arrival_trend": round(float(windows.arrival_trend[i]), 4),
+                "queue_trend": round(float(windows.queue_trend[i]), 4),
+                "arrival_cv": round(float(windows.arrival_cv[i]), 4)
+            }
+            for i in range(min(20, total))
+        ]
         
-        total = len(stability_periods)
+        # Summarize (states in order of first appearance)
+        unique_states, first_index, counts = np.unique(
+            states, return_index=True, return_counts=True
+        )
+        order = np.argsort(first_index)
+        state_counts = {
+            str(unique_states[k]): int(counts[k]) for k in order
+        }
         
         return {
             "status": "analyzed",
@@ -390,23 +527,112 @@ class OperationalStabilityAnalyzer:
                 state: round(count / total, 4)
                 for state, count in state_counts.items()
             },
-            "crisis_periods": sum(1 for p in stability_periods if p["state"] == "crisis"),
+            "crisis_periods": state_counts.get("crisis", 0),
             "stable_percentage": round(
                 state_counts.get("stable", 0) / total * 100, 2
             ),
-            "periods": stability_periods[:20]  # First 20 for detail
+            "periods": stability_periods,  # First 20 for detail
+            "state_series": states.tolist()
         }
     
-    def _calculate_trend(self, data: List[float]) -> float:
-        """Calculate linear trend (slope) of data."""
-        if len(data) < 2:
-            return 0.0
+    def sliding_windows(
+        self,
+        measurements: FlowData,
+        window_size: int = 12
+    ) -> Optional[StabilityWindows]:
+        """
+        Compute trend, CV and state for every window in O(n).
         
-        x = np.arange(len(data))
-        slope, _, _, _, _ = stats.linregress(x, data)
+        Window sums of y, x·y and y² come from cumulative sums, so each
+        window's least-squares slope is
+            (w·Σxy - Σx·Σy) / (w·Σx² - (Σx)²)
+        with x = 0..w-1 inside the window. Counts are integers, so all
+        sums are exact and only the final divisions are rounded.
         
-        # Normalize by mean
-        mean = np.mean(data)
-        if mean > 0:
-            return slope / mean
-        return 0.0
\ No newline at end of file
+        Windows start at 0..n-w-1 (the last full window is not included,
+        consistent with the historical analysis). A single-observation
+        window has no trend (slope 0).
+        """
+        series = as_flow_series(measurements)
+        if series is None or window_size < 1 or len(series) <= window_size:
+            return None
+        
+        w = window_size
+        num_windows = len(series) - w
+        
+        arrival_slope, arrival_mean, arrival_var = self._window_moments(
+            series.arrival_count, w, num_windows
+        )
+        queue_slope, queue_mean, _ = self._window_moments(
+            series.queue_length, w, num_windows
+        )
+        
+        arrival_trend = self._normalize(arrival_slope, arrival_mean)
+        queue_trend = self._normalize(queue_slope, queue_mean)
+        arrival_cv = self._normalize(np.sqrt(arrival_var), arrival_mean)
+        
+        # Classify windows
+        states = np.select(
+            [
+                (np.abs(arrival_trend) < 0.1) & (np.abs(queue_trend) < 0.2),
+                queue_trend > 0.5,
+                queue_trend < -0.5
+            ],
+            ["stable", "degrading", "recovering"],
+            default="transition"
+        ).astype(object)
+        
+        # Crisis: long queue that is still growing
+        states[(queue_mean > 10) & (queue_trend > 0.3)] = "crisis"
+        
+        return StabilityWindows(
+            window_size=w,
+            arrival_trend=arrival_trend,
+            queue_trend=queue_trend,
+            arrival_cv=arrival_cv,
+            queue_mean=queue_mean,
+            states=states
+        )
+    
+    def _window_moments(
+        self,
+        data: np.ndarray,
+        w: int,
+        num_windows: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Slope, mean and population variance of each length-w window.
+        """
+        y = np.asarray(data)
+        if not np.issubdtype(y.dtype, np.integer):
+            y = y.astype(np.float64)
+        j = np.arange(len(y))
+        
+        def window_sum(values: np.ndarray) -> np.ndarray:
+            cumulative = np.concatenate(([0], np.cumsum(values)))
+            return cumulative[w:w + num_windows] - cumulative[:num_windows]
+        
+        start = np.arange(num_windows)
+        sum_y = window_sum(y)
+        sum_jy = window_sum(j * y)
+        sum_yy = window_sum(y * y)
+        
+        # Shift global index j to the window-local x = j - start
+        sum_xy = sum_jy - start * sum_y
+        sum_x = w * (w - 1) // 2
+        sum_xx = (w - 1) * w * (2 * w - 1) // 6
+        
+        if w < 2:
+            slope = np.zeros(num_windows, dtype=np.float64)
+        else:
+            slope = (w * sum_xy - sum_x * sum_y) / (w * sum_xx - sum_x ** 2)
+        mean = sum_y / w
+        variance = np.maximum(sum_yy / w - mean ** 2, 0.0)
+        
+        return slope, mean, variance
+    
+    def _normalize(self, values: np.ndarray, mean: np.ndarray) -> np.ndarray:
+        """Divide by the window mean; 0 where the mean is not positive."""
+        result = np.zeros(len(values), dtype=np.float64)
+        np.divide(values, mean, out=result, where=mean > 0)
+        return result
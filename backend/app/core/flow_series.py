@@ -0,0 +1,263 @@
+"""
+PICAM Flow Series
+
+Columnar (array-backed) representation of a sequence of FlowMeasurements.
+
+The physics calculators operate on whole columns (arrivals, queue lengths,
+wait times, ...) rather than on individual measurements. Building those
+columns once per location and sharing them between calculators avoids
+re-extracting the same attributes from thousands of Python objects on
+every calculation.
+
+Missing optional durations (avg_wait_time, avg_service_duration) are stored
+as NaN with an explicit presence mask, so the "None vs. value" distinction
+of FlowMeasurement is preserved exactly.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, tzinfo
+from typing import List, Optional, Sequence, Union
+import numpy as np
+
+from app.models.domain import FlowMeasurement, LocationType
+
+
+@dataclass(frozen=True)
+class FlowSeries:
+    """
+    Immutable column store for the flow measurements of one location.
+    
+    Timestamps are kept as wall-clock datetime64 values (so hour/weekday
+    bucketing matches FlowMeasurement.timestamp.hour) together with the
+    original tzinfo, which is restored when a Python datetime is requested.
+    """
+    location_id: str
+    location_type: LocationType
+    
+    timestamps: np.ndarray  # datetime64[us], wall-clock
+    arrival_count: np.ndarray  # int64
+    departure_count: np.ndarray  # int64
+    queue_length: np.ndarray  # int64
+    in_service_count: np.ndarray  # int64
+    avg_service_duration: np.ndarray  # float64, NaN where missing
+    avg_wait_time: np.ndarray  # float64, NaN where missing
+    observation_period_seconds: np.ndarray  # float64
+    
+    # Presence masks for the optional duration columns
+    has_service_duration: np.ndarray  # bool
+    has_wait_time: np.ndarray  # bool
+    
+    tz: Optional[tzinfo] = None
+    
+    # ============== Construction ==============
+    
+    @classmethod
+    def from_measurements(
+        cls,
+        measurements: Sequence[FlowMeasurement]
+    ) -> "FlowSeries":
+        """
+        Build a series from FlowMeasurement objects (single pass).
+        
+        Location metadata is taken from the first measurement, matching
+        the behaviour of the calculators before columnar storage.
+        """
+        if not measurements:
+            raise ValueError("Cannot build a FlowSeries from no measurements")
+        
+        first = measurements[0]
+        tz = first.timestamp.tzinfo
+        
+        n = len(measurements)
+        timestamps = np.empty(n, dtype="datetime64[us]")
+        arrival = np.empty(n, dtype=np.int64)
+        departure = np.empty(n, dtype=np.int64)
+        queue = np.empty(n, dtype=np.int64)
+        in_service = np.empty(n, dtype=np.int64)
+        service = np.full(n, np.nan, dtype=np.float64)
+        wait = np.full(n, np.nan, dtype=np.float64)
+        period = np.empty(n, dtype=np.float64)
+        
+        for i, m in enumerate(measurements):
+            ts = m.timestamp
+            if tz is not None and ts.tzinfo is not None:
+                ts = ts.astimezone(tz)
+            timestamps[i] = ts.replace(tzinfo=None)
+            arrival[i] = m.arrival_count
+            departure[i] = m.departure_count
+            queue[i] = m.queue_length
+            in_service[i] = m.in_service_count
+            if m.avg_service_duration is not None:
+                service[i] = m.avg_service_duration
+            if m.avg_wait_time is not None:
+                wait[i] = m.avg_wait_time
+            period[i] = m.observation_period_seconds
+        
+        return cls.from_columns(
+            location_id=first.location_id,
+            location_type=first.location_type,
+            timestamps=timestamps,
+            arrival_count=arrival,
+            departure_count=departure,
+            queue_length=queue,
+            in_service_count=in_service,
+            avg_service_duration=service,
+            avg_wait_time=wait,
+            observation_period_seconds=period,
+            tz=tz
+        )
+    
+    @classmethod
+    def from_columns(
+        cls,
+        location_id: str,
+        location_type: Union[LocationType, str],
+        timestamps: np.ndarray,
+        arrival_count: np.ndarray,
+        departure_count: np.ndarray,
+        queue_length: np.ndarray,
+        in_service_count: np.ndarray,
+        avg_service_duration: Optional[np.ndarray] = None,
+        avg_wait_time: Optional[np.ndarray] = None,
+        observation_period_seconds: Union[np.ndarray, float] = 300,
+        tz: Optional[tzinfo] = None
+    ) -> "FlowSeries":
+        """
+        Build a series from pre-extracted columns.
+        
+        Missing durations must be encoded as NaN; presence masks are
+        derived from them.
+        """
+        n = len(timestamps)
+        
+        if avg_service_duration is None:
+            avg_service_duration = np.full(n, np.nan)
+        if avg_wait_time is None:
+            avg_wait_time = np.full(n, np.nan)
+        
+        service = np.ascontiguousarray(avg_service_duration, dtype=np.float64)
+        wait = np.ascontiguousarray(avg_wait_time, dtype=np.float64)
+        period = np.broadcast_to(
+            np.asarray(observation_period_seconds, dtype=np.float64), (n,)
+        ).copy()
+        
+        return cls(
+            location_id=location_id,
+            location_type=LocationType(location_type),
+            timestamps=np.ascontiguousarray(timestamps, dtype="datetime64[us]"),
+            arrival_count=np.ascontiguousarray(arrival_count, dtype=np.int64),
+            departure_count=np.ascontiguousarray(departure_count, dtype=np.int64),
+            queue_length=np.ascontiguousarray(queue_length, dtype=np.int64),
+            in_service_count=np.ascontiguousarray(in_service_count, dtype=np.int64),
+            avg_service_duration=service,
+            avg_wait_time=wait,
+            observation_period_seconds=period,
+            has_service_duration=~np.isnan(service),
+            has_wait_time=~np.isnan(wait),
+            tz=tz
+        )
+    
+    # ============== Derived columns ==============
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    @property
+    def arrival_rate(self) -> np.ndarray:
+        """λ - arrivals per second (0 where the period is not positive)."""
+        return self._per_second(self.arrival_count)
+    
+    @property
+    def departure_rate(self) -> np.ndarray:
+        """μ - departures per second (0 where the period is not positive)."""
+        return self._per_second(self.departure_count)
+    
+    @property
+    def total_in_system(self) -> np.ndarray:
+        """L - total in system (queue + service)."""
+        return self.queue_length + self.in_service_count
+    
+    @property
+    def hours(self) -> np.ndarray:
+        """Hour of day (0-23) of each observation."""
+        return (
+            self.timestamps.astype("datetime64[h]") -
+            self.timestamps.astype("datetime64[D]")
+        ).astype(np.int64)
+    
+    @property
+    def minute_of_day(self) -> np.ndarray:
+        """Minutes since midnight (0-1439) of each observation."""
+        return (
+            self.timestamps.astype("datetime64[m]") -
+            self.timestamps.astype("datetime64[D]")
+        ).astype(np.int64)
+    
+    @property
+    def weekday(self) -> np.ndarray:
+        """Day of week (Monday = 0) of each observation."""
+        days = self.timestamps.astype("datetime64[D]").astype(np.int64)
+        return (days + 3) % 7  # 1970-01-01 was a Thursday
+    
+    def _per_second(self, counts: np.ndarray) -> np.ndarray:
+        period = self.observation_period_seconds
+        valid = period > 0
+        rates = np.zeros(len(counts), dtype=np.float64)
+        np.divide(counts, period, out=rates, where=valid)
+        return rates
+    
+    # ============== Access ==============
+    
+    def timestamp_at(self, index: int) -> datetime:
+        """Python datetime for an observation, with the original tzinfo."""
+        ts = self.timestamps[index].astype(datetime)
+        return ts.replace(tzinfo=self.tz) if self.tz is not None else ts
+    
+    @property
+    def first_timestamp(self) -> datetime:
+        return self.timestamp_at(0)
+    
+    @property
+    def last_timestamp(self) -> datetime:
+        return self.timestamp_at(-1)
+    
+    def to_measurements(self) -> List[FlowMeasurement]:
+        """Expand back into FlowMeasurement objects."""
+        return [
+            FlowMeasurement(
+                timestamp=self.timestamp_at(i),
+                location_id=self.location_id,
+                location_type=self.location_type,
+                arrival_count=int(self.arrival_count[i]),
+                departure_count=int(self.departure_count[i]),
+                queue_length=int(self.queue_length[i]),
+                in_service_count=int(self.in_service_count[i]),
+                avg_service_duration=(
+                    float(self.avg_service_duration[i])
+                    if self.has_service_duration[i] else None
+                ),
+                avg_wait_time=(
+                    float(self.avg_wait_time[i])
+                    if self.has_wait_time[i] else None
+                ),
+                observation_period_seconds=float(self.observation_period_seconds[i])
+            )
+            for i in range(len(self))
+        ]
+
+
+# Anything a calculator accepts as flow data
+FlowData = Union[FlowSeries, Sequence[FlowMeasurement]]
+
+
+def as_flow_series(data: FlowData) -> Optional[FlowSeries]:
+    """
+    Return data as a FlowSeries, converting a measurement list if needed.
+    
+    Returns None for empty input.
+    """
+    if isinstance(data, FlowSeries):
+        return data
+    if not data:
+        return None
+    return FlowSeries.from_measurements(data)
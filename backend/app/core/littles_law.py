@@ -23,6 +23,7 @@ import hashlib
 import json
 
 from app.models.domain import FlowMeasurement, LittlesLawResult, CapacityConstraint
+from app.core.flow_series import FlowData, as_flow_series
 from app.utils import now_utc, create_deterministic_hash
 
 
@@ -50,27 +51,27 @@ class LittlesLawCalculator:
     
     def calculate(
         self,
-        measurements: List[FlowMeasurement],
+        measurements: FlowData,
         capacity: Optional[CapacityConstraint] = None
     ) -> Optional[LittlesLawResult]:
         """
         Calculate Little's Law metrics from flow measurements.
         
         Args:
-            measurements: List of FlowMeasurement observations
+            measurements: FlowSeries or list of FlowMeasurement observations
             capacity: Optional capacity constraints for the location
             
         Returns:
             LittlesLawResult with all metrics, or None if insufficient data
         """
-        if len(measurements) < self.min_data_points:
+        series = as_flow_series(measurements)
+        if series is None or len(series) < self.min_data_points:
             return None
         
         # Extract time series data
-        arrival_rates = np.array([m.arrival_rate for m in measurements])
-        queue_lengths = np.array([m.queue_length for m in measurements])
-        in_service = np.array([m.in_service_count for m in measurements])
-        total_in_system = queue_lengths + in_service
+        arrival_rates = series.arrival_rate
+        queue_lengths = series.queue_length
+        total_in_system = series.total_in_system
         
         # Calculate average arrival rate (λ)
         lambda_rate = np.mean(arrival_rates)
@@ -87,7 +88,7 @@ class LittlesLawCalculator:
         W_q = L_q / lambda_rate if lambda_rate > 0 else 0
         
         # Calculate service rate (μ) from departures
-        departure_rates = np.array([m.departure_rate for m in measurements])
+        departure_rates = series.departure_rate
         mu_rate = np.mean(departure_rates)
         
         # Calculate utilization (ρ = λ / μ)
@@ -105,8 +106,8 @@ class LittlesLawCalculator:
         )
         
         # Get location info from first measurement
-        location_id = measurements[0].location_id
-        timestamp = measurements[-1].timestamp
+        location_id = series.location_id
+        timestamp = series.last_timestamp
         
         return LittlesLawResult(
             timestamp=timestamp,
@@ -117,7 +118,7 @@ class LittlesLawCalculator:
             L_q=float(L_q),
             W_q=float(W_q),
             rho=float(min(rho, 2.0)),  # Cap at 200% for display
-            data_points_used=len(measurements),
+            data_points_used=len(series),
             confidence_interval_lower=float(ci_lower),
             confidence_interval_upper=float(ci_upper)
         )
@@ -180,7 +181,7 @@ class LittlesLawCalculator:
     
     def verify_littles_law(
         self,
-        measurements: List[FlowMeasurement],
+        measurements: FlowData,
         tolerance: float = 0.15
     ) -> dict:
         """
@@ -196,24 +197,25 @@ class LittlesLawCalculator:
         Returns:
             Verification result with diagnostics
         """
-        if len(measurements) < self.min_data_points:
+        series = as_flow_series(measurements)
+        data_points = len(series) if series is not None else 0
+        if data_points < self.min_data_points:
             return {
                 "verified": False,
                 "reason": "Insufficient data points",
-                "data_points": len(measurements)
+                "data_points": data_points
             }
         
         # Calculate components
-        arrival_rates = [m.arrival_rate for m in measurements]
-        total_in_system = [m.queue_length + m.in_service_count for m in measurements]
+        lambda_avg = np.mean(series.arrival_rate)
+        L_observed = np.mean(series.total_in_system)
         
-        lambda_avg = np.mean(arrival_rates)
-        L_observed = np.mean(total_in_system)
+        # Get wait times if available (zero wait counts as missing)
+        wait_times = series.avg_wait_time[
+            series.has_wait_time & (series.avg_wait_time != 0)
+        ]
         
-        # Get wait times if available
-        wait_times = [m.avg_wait_time for m in measurements if m.avg_wait_time]
-        
-        if not wait_times:
+        if len(wait_times) == 0:
             # Estimate W from L/λ
             W_estimated = L_observed / lambda_avg if lambda_avg > 0 else 0
             return {
@@ -319,6 +321,62 @@ class LittlesLawCalculator:
         }
 
 
+def erlang_b(offered_load, servers) -> np.ndarray:
+    """
+    Erlang B blocking probability B(c, a), vectorized.
+    
+    Uses the recurrence
+        B(0, a) = 1
+        B(k, a) = a·B(k-1, a) / (k + a·B(k-1, a))
+    which stays in [0, 1] at every step, so it neither overflows nor
+    loses precision for large server counts (unlike a^c / c!).
+    
+    Args:
+        offered_load: a = λ/μ (scalar or array)
+        servers: c (scalar or integer array, broadcast against the load)
+        
+    Returns:
+        Array of B(c, a) with the broadcast shape of the inputs
+    """
+    load, c = np.broadcast_arrays(
+        np.asarray(offered_load, dtype=np.float64),
+        np.asarray(servers, dtype=np.int64)
+    )
+    
+    b = np.ones(load.shape)
+    result = np.ones(load.shape)
+    max_servers = int(c.max()) if c.size else 0
+    
+    for k in range(1, max_servers + 1):
+        ab = load * b
+        b = ab / (k + ab)
+        np.copyto(result, b, where=(c == k))
+    
+    return result
+
+
+@dataclass(frozen=True)
+class QueueMetrics:
+    """
+    M/M/c metrics for arrays of arrival rates and server counts.
+    
+    Entries where ρ >= 1 are flagged unstable; their p_wait is 1 and
+    queue metrics are infinite.
+    """
+    arrival_rate: np.ndarray
+    servers: np.ndarray
+    rho: np.ndarray
+    p_wait: np.ndarray  # Erlang C
+    L_q: np.ndarray
+    W_q: np.ndarray
+    W: np.ndarray
+    L: np.ndarray
+    
+    @property
+    def stable(self) -> np.ndarray:
+        return self.rho < 1.0
+
+
 class MultiServerQueueCalculator:
     """
     M/M/c Queue Calculator for multi-server scenarios.
@@ -349,12 +407,8 @@ class MultiServerQueueCalculator:
         Returns:
             Dictionary of queue metrics
         """
-        lambda_rate = arrival_rate
-        c = self.c
-        mu = self.mu
-        
-        # Traffic intensity
-        rho = lambda_rate / (c * mu)
+        metrics = self.evaluate(arrival_rate)
+        rho = float(metrics.rho)
         
         if rho >= 1.0:
             return {
@@ -363,60 +417,77 @@ class MultiServerQueueCalculator:
                 "message": "Arrival rate exceeds capacity - queue grows unbounded"
             }
         
-        # Erlang C formula for P(wait)
-        # This gives probability that an arriving customer must wait
-        p0 = self._calculate_p0(lambda_rate, mu, c)
-        erlang_c = self._calculate_erlang_c(lambda_rate, mu, c, p0)
-        
-        # Expected queue length: Lq = (Erlang_C * ρ) / (1 - ρ)
-        L_q = (erlang_c * rho) / (1 - rho)
-        
-        # Expected wait time in queue: Wq = Lq / λ
-        W_q = L_q / lambda_rate if lambda_rate > 0 else 0
-        
-        # Expected time in system: W = Wq + 1/μ
-        W = W_q + (1 / mu)
-        
-        # Expected number in system: L = λW
-        L = lambda_rate * W
-        
         return {
             "status": "stable",
-            "servers": c,
+            "servers": self.c,
             "rho": round(rho, 4),
-            "p_wait": round(erlang_c, 4),  # Probability of waiting
-            "L": round(L, 4),
-            "L_q": round(L_q, 4),
-            "W": round(W, 2),
-            "W_q": round(W_q, 2),
-            "service_rate": mu,
-            "arrival_rate": lambda_rate
+            "p_wait": round(float(metrics.p_wait), 4),  # Probability of waiting
+            "L": round(float(metrics.L), 4),
+            "L_q": round(float(metrics.L_q), 4),
+            "W": round(float(metrics.W), 2),
+            "W_q": round(float(metrics.W_q), 2),
+            "service_rate": self.mu,
+            "arrival_rate": arrival_rate
         }
     
-    def _calculate_p0(self, lambda_rate: float, mu: float, c: int) -> float:
-        """Calculate probability of empty system (P0)."""
-        rho = lambda_rate / (c * mu)
-        a = lambda_rate / mu  # Offered load
+    def evaluate(self, arrival_rates, num_servers=None) -> QueueMetrics:
+        """
+        Evaluate M/M/c metrics for many arrival rates and server counts.
         
-        sum_term = sum((a ** n) / np.math.factorial(n) for n in range(c))
-        last_term = ((a ** c) / np.math.factorial(c)) * (1 / (1 - rho))
+        Arrival rates and server counts broadcast against each other, so
+        a staffing curve for every interval of a day is one call:
+            evaluate(rates[:, None], np.arange(1, n + 1)[None, :])
         
-        p0 = 1 / (sum_term + last_term)
-        return p0
-    
-    def _calculate_erlang_c(
-        self, 
-        lambda_rate: float, 
-        mu: float, 
-        c: int, 
-        p0: float
-    ) -> float:
-        """Calculate Erlang C (probability of waiting)."""
+        Args:
+            arrival_rates: λ per interval (scalar or array)
+            num_servers: c (scalar or array); defaults to this calculator's c
+            
+        Returns:
+            QueueMetrics with the broadcast shape of the inputs
+        """
+        mu = self.mu
+        lambda_rate, c = np.broadcast_arrays(
+            np.asarray(arrival_rates, dtype=np.float64),
+            np.asarray(self.c if num_servers is None else num_servers, dtype=np.int64)
+        )
+        
+        # Offered load and traffic intensity
         a = lambda_rate / mu
-        rho = lambda_rate / (c * mu)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rho = lambda_rate / (c * mu)
+        stable = rho < 1.0
+        
+        # Erlang C from Erlang B: C = B / (1 - ρ(1 - B))
+        b = erlang_b(a, c)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            erlang_c = np.where(stable, b / (1 - rho * (1 - b)), 1.0)
+            
+            # Expected queue length: Lq = (Erlang_C * ρ) / (1 - ρ)
+            L_q = np.where(stable, erlang_c * rho / (1 - rho), np.inf)
+            
+            # Expected wait time in queue: Wq = Lq / λ
+            W_q = np.where(
+                stable,
+                np.where(lambda_rate > 0, L_q / lambda_rate, 0.0),
+                np.inf
+            )
+        
+        # Expected time in system: W = Wq + 1/μ
+        W = W_q + (1 / mu)
+        
+        # Expected number in system: L = λW
+        L = lambda_rate * W
         
-        erlang_c = ((a ** c) / np.math.factorial(c)) * (1 / (1 - rho)) * p0
-        return erlang_c
+        return QueueMetrics(
+            arrival_rate=lambda_rate,
+            servers=c,
+            rho=rho,
+            p_wait=erlang_c,
+            L_q=L_q,
+            W_q=W_q,
+            W=W,
+            L=L
+        )
     
     def find_optimal_servers(
         self,
@@ -435,24 +506,122 @@ class MultiServerQueueCalculator:
         Returns:
             Optimal configuration
         """
-        for c in range(1, max_servers + 1):
-            calc = MultiServerQueueCalculator(c, self.mu)
-            metrics = calc.calculate_metrics(arrival_rate)
-            
-            if metrics.get("status") == "stable" and metrics["W_q"] <= target_wait_time:
-                return {
-                    "optimal_servers": c,
-                    "achieved_wait_time": metrics["W_q"],
-                    "target_wait_time": target_wait_time,
-                    "utilization": metrics["rho"],
-                    "metrics": metrics
-                }
+        plan = self.plan_staffing(arrival_rate, target_wait_time, max_servers)
+        
+        if plan.feasible[0]:
+            c = int(plan.servers[0])
+            metrics = MultiServerQueueCalculator(c, self.mu).calculate_metrics(arrival_rate)
+            return {
+                "optimal_servers": c,
+                "achieved_wait_time": metrics["W_q"],
+                "target_wait_time": target_wait_time,
+                "utilization": metrics["rho"],
+                "metrics": metrics
+            }
         
         return {
             "optimal_servers": None,
             "message": f"Cannot achieve target with <= {max_servers} servers",
             "target_wait_time": target_wait_time
         }
+    
+    def plan_staffing(
+        self,
+        arrival_rates,
+        target_wait_time: float,
+        max_servers: int = 20
+    ) -> "StaffingPlan":
+        """
+        Minimum servers meeting the target wait for every arrival rate.
+        
+        Walks c = 1..max_servers once, advancing the Erlang-B recurrence
+        for all rates together. A rate is only tested from its stability
+        bound (c > λ/μ) onwards and drops out as soon as its target is
+        met, so the whole plan costs O(max_servers) vector steps instead
+        of a fresh Erlang C evaluation per rate and server count.
+        
+        The acceptance test matches calculate_metrics: stable and
+        round(W_q, 2) <= target_wait_time.
+        
+        Args:
+            arrival_rates: λ per interval (scalar or 1-D array)
+            target_wait_time: Maximum acceptable wait time
+            max_servers: Maximum servers to consider
+            
+        Returns:
+            StaffingPlan with one entry per arrival rate
+        """
+        mu = self.mu
+        lambda_rate = np.atleast_1d(np.asarray(arrival_rates, dtype=np.float64))
+        a = lambda_rate / mu
+        
+        servers = np.zeros(len(lambda_rate), dtype=np.int64)
+        W_q = np.full(len(lambda_rate), np.nan)
+        rho = np.full(len(lambda_rate), np.nan)
+        
+        pending = np.ones(len(lambda_rate), dtype=bool)
+        # Nothing below floor(λ/μ) servers can be stable; the exact ρ < 1
+        # test below settles the boundary case
+        first_candidate = np.maximum(np.floor(a), 1)
+        
+        b = np.ones(len(lambda_rate))
+        for c in range(1, max_servers + 1):
+            ab = a * b
+            b = ab / (c + ab)
+            
+            idx = np.flatnonzero(pending & (first_candidate <= c))
+            if len(idx) == 0:
+                if not pending.any():
+                    break
+                continue
+            
+            lam = lambda_rate[idx]
+            b_c = b[idx]
+            rho_c = lam / (c * mu)
+            stable = rho_c < 1.0
+            
+            with np.errstate(divide="ignore", invalid="ignore"):
+                erlang_c = b_c / (1 - rho_c * (1 - b_c))
+                L_q = erlang_c * rho_c / (1 - rho_c)
+                wq = np.where(lam > 0, L_q / lam, 0.0)
+            
+            meets = stable & np.array(
+                [round(w, 2) <= target_wait_time for w in wq.tolist()],
+                dtype=bool
+            )
+            
+            done = idx[meets]
+            servers[done] = c
+            W_q[done] = wq[meets]
+            rho[done] = rho_c[meets]
+            pending[done] = False
+        
+        return StaffingPlan(
+            arrival_rate=lambda_rate,
+            servers=servers,
+            W_q=W_q,
+            rho=rho,
+            target_wait_time=target_wait_time
+        )
+
+
+@dataclass(frozen=True)
+class StaffingPlan:
+    """
+    Minimum server count per arrival rate for a target wait time.
+    
+    servers is 0 (and W_q/rho NaN) where the target cannot be met
+    within the search limit.
+    """
+    arrival_rate: np.ndarray
+    servers: np.ndarray
+    W_q: np.ndarray
+    rho: np.ndarray
+    target_wait_time: float
+    
+    @property
+    def feasible(self) -> np.ndarray:
+        return self.servers > 0
 
 
 def create_audit_log(
@@ -27,9 +27,22 @@ from app.models.domain import (
     FinancialLoss,
     CapacityConstraint
 )
+from app.core.flow_series import FlowData, as_flow_series
 from app.utils import now_utc, create_deterministic_hash
 
 
+def _sequential_sum(values: np.ndarray) -> float:
+    """
+    Left-to-right float sum of an array.
+    
+    np.sum uses pairwise summation; accumulating sequentially keeps totals
+    bit-for-bit identical to a running Python sum over the same values.
+    """
+    if len(values) == 0:
+        return 0.0
+    return float(np.add.accumulate(values)[-1])
+
+
 @dataclass
 class FinancialParameters:
     """
@@ -57,6 +70,30 @@ class FinancialParameters:
     conservative_factor: float = 0.7  # Multiply losses by this for conservatism
 
 
+@dataclass(frozen=True)
+class LossComponents:
+    """
+    Physical quantities behind each loss category, before costing.
+    
+    These are plain sums over observations, so components of disjoint
+    periods can be added together.
+    """
+    excess_wait_seconds: float = 0.0  # Σ (wait - acceptable) × queue
+    lost_throughput_count: int = 0  # Arrivals beyond service capacity
+    estimated_walkaways: int = 0  # Expected customers who left the queue
+    idle_seconds: float = 0.0  # Server time below target utilization
+    overtime_seconds: float = 0.0  # Server time above full utilization
+    
+    def __add__(self, other: "LossComponents") -> "LossComponents":
+        return LossComponents(
+            excess_wait_seconds=self.excess_wait_seconds + other.excess_wait_seconds,
+            lost_throughput_count=self.lost_throughput_count + other.lost_throughput_count,
+            estimated_walkaways=self.estimated_walkaways + other.estimated_walkaways,
+            idle_seconds=self.idle_seconds + other.idle_seconds,
+            overtime_seconds=self.overtime_seconds + other.overtime_seconds
+        )
+
+
 @dataclass
 class LossCalculator:
     """
@@ -73,7 +110,7 @@ class LossCalculator:
     
     def calculate_total_loss(
         self,
-        measurements: List[FlowMeasurement],
+        measurements: FlowData,
         littles_result: Optional[LittlesLawResult],
         entropy: Optional[EntropyMeasurement],
         capacity: Optional[CapacityConstraint] = None,
@@ -83,7 +120,7 @@ class LossCalculator:
         Calculate comprehensive financial loss from all sources.
         
         Args:
-            measurements: Operational measurements for the period
+            measurements: FlowSeries or operational measurements for the period
             littles_result: Pre-calculated Little's Law metrics
             entropy: Pre-calculated entropy metrics
             capacity: Capacity constraints
@@ -92,18 +129,52 @@ class LossCalculator:
         Returns:
             FinancialLoss with breakdown of all loss types
         """
-        if not measurements:
+        series = as_flow_series(measurements)
+        if series is None or len(series) == 0:
             return self._empty_loss(target_date or date.today())
         
-        location_id = measurements[0].location_id
-        calc_date = target_date or measurements[0].timestamp.date()
+        # Physical quantities for all loss types in one pass
+        components = self.calculate_loss_components(series, capacity)
         
-        # Calculate each loss type
-        wait_time_loss = self._calculate_wait_time_loss(measurements)
-        throughput_loss = self._calculate_throughput_loss(measurements, capacity)
-        walkaway_loss = self._calculate_walkaway_loss(measurements)
-        idle_loss = self._calculate_idle_time_loss(measurements, capacity)
-        overtime_loss = self._calculate_overtime_loss(measurements, capacity)
+        return self.loss_from_components(
+            components,
+            location_id=series.location_id,
+            calc_date=target_date or series.first_timestamp.date(),
+            entropy=entropy
+        )
+    
+    def loss_from_components(
+        self,
+        components: LossComponents,
+        location_id: str,
+        calc_date: date,
+        entropy: Optional[EntropyMeasurement] = None
+    ) -> FinancialLoss:
+        """
+        Cost out loss components (e.g. merged from stored day summaries).
+        """
+        # Convert to money
+        wait_time_loss = (
+            components.excess_wait_seconds,
+            self._wait_time_cost(components.excess_wait_seconds)
+        )
+        throughput_loss = (
+            components.lost_throughput_count,
+            self._throughput_cost(components.lost_throughput_count)
+        )
+        walkaway_loss = (
+            components.estimated_walkaways,
+            self._walkaway_cost(components.estimated_walkaways)
+        )
+        idle_loss = (
+            components.idle_seconds,
+            self._idle_time_cost(components.idle_seconds)
+        )
+        overtime_hours = components.overtime_seconds / 3600
+        overtime_loss = (
+            overtime_hours,
+            self._overtime_cost(overtime_hours)
+        )
         
         # Apply entropy multiplier if available
         if entropy and entropy.variance_impact_multiplier > 1.0:
@@ -133,182 +204,147 @@ class LossCalculator:
         
         return loss
     
-    def _calculate_wait_time_loss(
+    def calculate_loss_components(
         self,
-        measurements: List[FlowMeasurement]
-    ) -> Tuple[float, float]:
+        measurements: FlowData,
+        capacity: Optional[CapacityConstraint] = None
+    ) -> LossComponents:
         """
-        Calculate cost of customer wait time.
+        Calculate the physical quantity behind every loss category.
         
-        Only counts wait time ABOVE acceptable threshold.
-        Returns (total_wait_seconds, cost)
-        """
-        total_excess_wait_seconds = 0.0
-        total_customers = 0
-        
-        threshold_seconds = self.params.acceptable_wait_minutes * 60
-        
-        for m in measurements:
-            if m.avg_wait_time and m.avg_wait_time > threshold_seconds:
-                # Excess wait per customer
-                excess_wait = m.avg_wait_time - threshold_seconds
-                
-                # Estimate customers who waited
-                # Use queue length as proxy
-                customers_waiting = m.queue_length
-                
-                total_excess_wait_seconds += excess_wait * customers_waiting
-                total_customers += customers_waiting
-        
-        # Convert to cost
-        total_excess_wait_minutes = total_excess_wait_seconds / 60
-        cost = total_excess_wait_minutes * self.params.customer_time_value_per_minute
-        
-        # Apply conservative factor
-        cost *= self.params.conservative_factor
+        Vectorized single pass over the columns: rates, utilization and the
+        wait-time masks are computed once and shared by all categories.
+        Per-observation truncation (int()) of lost customers and walkaways
+        is applied before summing, and float totals are accumulated
+        left-to-right so results match a per-observation loop exactly.
         
-        return (total_excess_wait_seconds, cost)
-    
-    def _calculate_throughput_loss(
-        self,
-        measurements: List[FlowMeasurement],
-        capacity: Optional[CapacityConstraint]
-    ) -> Tuple[int, float]:
+        Capacity-dependent categories (throughput, idle, overtime) are zero
+        when no capacity is given.
         """
-        Calculate revenue lost due to throughput limits.
+        series = as_flow_series(measurements)
+        if series is None or len(series) == 0:
+            return LossComponents()
+        
+        queue = series.queue_length
+        period = series.observation_period_seconds
+        
+        # Observations with a known, non-zero wait time
+        wait = series.avg_wait_time
+        has_wait = series.has_wait_time & (wait != 0)
+        
+        # 1. Excess wait above the acceptable threshold.
+        #    Queue length is the proxy for customers who waited.
+        acceptable_seconds = self.params.acceptable_wait_minutes * 60
+        over_acceptable = has_wait & (wait > acceptable_seconds)
+        excess_wait_seconds = _sequential_sum(
+            (wait[over_acceptable] - acceptable_seconds) * queue[over_acceptable]
+        )
+        
+        # 2. Walkaways once the wait exceeds the walkaway threshold
+        #    (probability capped at 50%, whole customers per observation)
+        walkaway_seconds = self.params.walkaway_threshold_minutes * 60
+        over_walkaway = has_wait & (wait > walkaway_seconds)
+        excess_minutes = (wait[over_walkaway] - walkaway_seconds) / 60
+        walkaway_prob = np.minimum(
+            0.5, excess_minutes * self.params.walkaway_probability_per_minute
+        )
+        expected_walkaways = queue[over_walkaway] * walkaway_prob
+        estimated_walkaways = int(np.trunc(expected_walkaways).astype(np.int64).sum())
         
-        When demand exceeds capacity, potential revenue is lost.
-        Returns (lost_customers, lost_revenue)
-        """
         if not capacity:
-            return (0, 0.0)
+            return LossComponents(
+                excess_wait_seconds=excess_wait_seconds,
+                estimated_walkaways=estimated_walkaways
+            )
+        
+        num_servers = capacity.max_servers
+        target_util = capacity.target_utilization
         
-        total_lost = 0
+        # 3. Arrivals beyond service capacity (20% buffer)
+        arrivals = series.arrival_count
+        max_throughput = num_servers * period / 60
+        exceeded = arrivals > max_throughput * 1.2
+        lost = np.trunc(arrivals[exceeded] - max_throughput[exceeded]).astype(np.int64)
+        lost_throughput_count = int(np.maximum(lost, 0).sum())
+        
+        # Utilization per observation where departures are known
+        departure_rate = series.departure_rate
+        known = departure_rate > 0
+        utilization = np.full(len(series), np.nan)
+        np.divide(
+            series.arrival_rate, num_servers * departure_rate,
+            out=utilization, where=known
+        )
         
-        for m in measurements:
-            # Check if arrivals exceeded service capacity
-            max_throughput = capacity.max_servers * m.observation_period_seconds / 60
-            
-            if m.arrival_count > max_throughput * 1.2:  # 20% buffer
-                # Excess arrivals couldn't be served
-                lost = int(m.arrival_count - max_throughput)
-                total_lost += max(0, lost)
+        # 4. Idle time when significantly below target (50% assumed if unknown)
+        actual_util = np.where(known, utilization, 0.5)
+        idle = actual_util < target_util * 0.7
+        idle_seconds = _sequential_sum(
+            (target_util - actual_util[idle]) * period[idle] * num_servers
+        )
         
-        # Calculate revenue impact (conservative)
-        lost_revenue = total_lost * self.params.avg_revenue_per_customer
-        lost_revenue *= self.params.conservative_factor
+        # 5. Overtime when overloaded (utilization > 100%)
+        overloaded = known & (utilization > 1.0)
+        overtime_seconds = _sequential_sum(
+            (utilization[overloaded] - 1.0) * period[overloaded] * num_servers
+        )
         
-        return (total_lost, lost_revenue)
+        return LossComponents(
+            excess_wait_seconds=excess_wait_seconds,
+            lost_throughput_count=lost_throughput_count,
+            estimated_walkaways=estimated_walkaways,
+            idle_seconds=idle_seconds,
+            overtime_seconds=overtime_seconds
+        )
     
-    def _calculate_walkaway_loss(
-        self,
-        measurements: List[FlowMeasurement]
-    ) -> Tuple[int, float]:
+    def _wait_time_cost(self, excess_wait_seconds: float) -> float:
         """
-        Calculate cost of customers who walked away.
-        
-        Uses conservative probability model based on wait time.
-        Returns (estimated_walkaways, cost)
+        Cost of customer wait time above the acceptable threshold.
         """
-        threshold_seconds = self.params.walkaway_threshold_minutes * 60
-        prob_per_minute = self.params.walkaway_probability_per_minute
-        
-        estimated_walkaways = 0
-        
-        for m in measurements:
-            if m.avg_wait_time and m.avg_wait_time > threshold_seconds:
-                # Time over threshold
-                excess_minutes = (m.avg_wait_time - threshold_seconds) / 60
-                
-                # Probability of walkaway (capped at 50%)
-                walkaway_prob = min(0.5, excess_minutes * prob_per_minute)
-                
-                # Expected walkaways from queue
-                expected = m.queue_length * walkaway_prob
-                estimated_walkaways += int(expected)
-        
-        # Calculate cost (direct loss + future value)
-        direct_loss = estimated_walkaways * self.params.avg_revenue_per_customer
-        future_loss = estimated_walkaways * self.params.customer_lifetime_value * 0.1  # 10% of LTV
-        
-        total_cost = (direct_loss + future_loss) * self.params.conservative_factor
-        
-        return (estimated_walkaways, total_cost)
+        excess_wait_minutes = excess_wait_seconds / 60
+        cost = excess_wait_minutes * self.params.customer_time_value_per_minute
+        
+        # Apply conservative factor
+        cost *= self.params.conservative_factor
+        
+        return cost
     
-    def _calculate_idle_time_loss(
-        self,
-        measurements: List[FlowMeasurement],
-        capacity: Optional[CapacityConstraint]
-    ) -> Tuple[float, float]:
+    def _throughput_cost(self, lost_customers: int) -> float:
         """
-        Calculate cost of idle staff time.
-        
-        Idle time occurs when utilization is significantly below target.
-        Returns (idle_seconds, cost)
+        Revenue lost when demand exceeds capacity (conservative).
         """
-        if not capacity:
-            return (0.0, 0.0)
-        
-        target_util = capacity.target_utilization
-        num_servers = capacity.max_servers
+        lost_revenue = lost_customers * self.params.avg_revenue_per_customer
+        lost_revenue *= self.params.conservative_factor
         
-        total_idle_seconds = 0.0
+        return lost_revenue
+    
+    def _walkaway_cost(self, walkaways: int) -> float:
+        """
+        Cost of customers who walked away (direct loss + future value).
+        """
+        direct_loss = walkaways * self.params.avg_revenue_per_customer
+        future_loss = walkaways * self.params.customer_lifetime_value * 0.1  # 10% of LTV
         
-        for m in measurements:
-            # Calculate actual utilization
-            if m.departure_rate and m.departure_rate > 0:
-                actual_util = m.arrival_rate / (num_servers * m.departure_rate)
-            else:
-                actual_util = 0.5  # Assume 50% if unknown
-            
-            # Idle time when below target
-            if actual_util < target_util * 0.7:  # Significantly below target
-                idle_fraction = (target_util - actual_util)
-                idle_seconds = idle_fraction * m.observation_period_seconds * num_servers
-                total_idle_seconds += idle_seconds
-        
-        # Convert to cost
-        idle_hours = total_idle_seconds / 3600
+        return (direct_loss + future_loss) * self.params.conservative_factor
+    
+    def _idle_time_cost(self, idle_seconds: float) -> float:
+        """
+        Cost of idle staff time.
+        """
+        idle_hours = idle_seconds / 3600
         cost = idle_hours * self.params.labor_cost_per_hour
         cost *= self.params.conservative_factor
         
-        return (total_idle_seconds, cost)
+        return cost
     
-    def _calculate_overtime_loss(
-        self,
-        measurements: List[FlowMeasurement],
-        capacity: Optional[CapacityConstraint]
-    ) -> Tuple[float, float]:
+    def _overtime_cost(self, overtime_hours: float) -> float:
         """
-        Calculate overtime costs from overloaded periods.
-        
-        Returns (overtime_hours, cost)
+        Overtime premium paid for overloaded periods.
         """
-        if not capacity:
-            return (0.0, 0.0)
-        
-        total_overtime_seconds = 0.0
-        num_servers = capacity.max_servers
-        
-        for m in measurements:
-            # Check for overload (utilization > 100%)
-            if m.departure_rate and m.departure_rate > 0:
-                utilization = m.arrival_rate / (num_servers * m.departure_rate)
-                
-                if utilization > 1.0:
-                    # Extra work required
-                    overload_factor = utilization - 1.0
-                    overtime_seconds = overload_factor * m.observation_period_seconds * num_servers
-                    total_overtime_seconds += overtime_seconds
-        
-        # Convert to cost (overtime premium)
-        overtime_hours = total_overtime_seconds / 3600
         base_cost = overtime_hours * self.params.labor_cost_per_hour
         overtime_premium = base_cost * (self.params.overtime_multiplier - 1)
         
-        total_cost = overtime_premium * self.params.conservative_factor
-        
-        return (overtime_hours, total_cost)
+        return overtime_premium * self.params.conservative_factor
     
     def _empty_loss(self, calc_date: date) -> FinancialLoss:
         """Create empty loss record."""
@@ -0,0 +1,540 @@
+"""
+PICAM Online Statistics
+
+Streaming (single-pass) accumulators for the physics metrics.
+
+Every accumulator is updated in O(1) per observation and can be merged
+with another accumulator of the same kind, so running values can be kept
+per location and day while data is ingested, and combined across hours,
+days or locations without revisiting the raw observations.
+
+Running mean/variance use Welford's update and Chan's parallel merge,
+which stay numerically stable for long streams. Stored summaries
+(FlowStatistics) instead keep plain sums (n, Σx, Σx²), which MongoDB can
+maintain with $inc and which merge by addition.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+
+from scipy import stats
+
+from app.models.domain import FlowMeasurement, LittlesLawResult
+from app.core.loss_calculator import LossComponents
+
+
+# Arrivals per observation period; roughly geometric so both quiet and
+# peak periods are resolved
+DEFAULT_ARRIVAL_BIN_EDGES: Tuple[float, ...] = (
+    1, 2, 3, 5, 8, 12, 18, 27, 40, 60, 90
+)
+
+
+@dataclass
+class RunningMoments:
+    """Running count, mean and variance of a stream of values."""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0  # Sum of squared deviations from the mean
+    
+    def update(self, value: float) -> None:
+        """Add one observation (Welford)."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    def merge(self, other: "RunningMoments") -> None:
+        """Fold another accumulator into this one (Chan et al.)."""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return
+        
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+    
+    @property
+    def variance(self) -> float:
+        """Sample variance (ddof=1); 0 with fewer than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    @property
+    def population_variance(self) -> float:
+        """Population variance (ddof=0)."""
+        return self.m2 / self.count if self.count > 0 else 0.0
+    
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+    
+    @property
+    def sem(self) -> float:
+        """Standard error of the mean."""
+        return math.sqrt(self.variance / self.count) if self.count > 1 else 0.0
+    
+    def confidence_interval(self, confidence: float) -> Tuple[float, float]:
+        """t-distribution confidence interval for the mean."""
+        if self.count < 2:
+            return (self.mean, self.mean)
+        
+        t_value = stats.t.ppf((1 + confidence) / 2, self.count - 1)
+        margin = t_value * self.sem
+        return (self.mean - margin, self.mean + margin)
+
+
+@dataclass
+class LittlesLawAccumulator:
+    """
+    Running Little's Law inputs for one location and day.
+    
+    Tracks the same quantities LittlesLawCalculator.calculate averages
+    over (λ, μ, L, L_q) plus observed wait times, so the current
+    L = λW picture is available without re-reading the day's data.
+    """
+    location_id: str
+    target_date: date
+    
+    arrival_rate: RunningMoments = field(default_factory=RunningMoments)  # λ
+    departure_rate: RunningMoments = field(default_factory=RunningMoments)  # μ
+    in_system: RunningMoments = field(default_factory=RunningMoments)  # L
+    queue_length: RunningMoments = field(default_factory=RunningMoments)  # L_q
+    wait_time: RunningMoments = field(default_factory=RunningMoments)  # observed W_q
+    
+    last_timestamp: Optional[datetime] = None
+    
+    @property
+    def count(self) -> int:
+        return self.in_system.count
+    
+    def update(self, measurement: FlowMeasurement) -> None:
+        """Add one observation."""
+        self.arrival_rate.update(measurement.arrival_rate)
+        self.departure_rate.update(measurement.departure_rate)
+        self.in_system.update(measurement.total_in_system)
+        self.queue_length.update(measurement.queue_length)
+        
+        # Same convention as the calculators: zero means "not measured"
+        if measurement.avg_wait_time:
+            self.wait_time.update(measurement.avg_wait_time)
+        
+        if self.last_timestamp is None or measurement.timestamp > self.last_timestamp:
+            self.last_timestamp = measurement.timestamp
+    
+    def merge(self, other: "LittlesLawAccumulator") -> None:
+        """Fold another accumulator (e.g. another hour) into this one."""
+        self.arrival_rate.merge(other.arrival_rate)
+        self.departure_rate.merge(other.departure_rate)
+        self.in_system.merge(other.in_system)
+        self.queue_length.merge(other.queue_length)
+        self.wait_time.merge(other.wait_time)
+        
+        if other.last_timestamp is not None and (
+            self.last_timestamp is None or other.last_timestamp > self.last_timestamp
+        ):
+            self.last_timestamp = other.last_timestamp
+    
+    def result(
+        self,
+        num_servers: int = 1,
+        confidence_level: float = 0.95
+    ) -> Optional[LittlesLawResult]:
+        """
+        Current Little's Law metrics, using the formulas of
+        LittlesLawCalculator.calculate.
+        
+        Returns None without observations or arrivals.
+        """
+        if self.count == 0:
+            return None
+        
+        lambda_rate = self.arrival_rate.mean
+        if lambda_rate <= 0:
+            return None
+        
+        L = self.in_system.mean
+        L_q = self.queue_length.mean
+        
+        # Apply Little's Law: W = L / λ
+        W = L / lambda_rate
+        W_q = L_q / lambda_rate
+        
+        mu_rate = self.departure_rate.mean
+        if mu_rate > 0:
+            rho = lambda_rate / (num_servers * mu_rate)
+        else:
+            rho = 1.0  # Assume fully utilized if no departure data
+        
+        ci_lower, ci_upper = self.in_system.confidence_interval(confidence_level)
+        
+        return LittlesLawResult(
+            timestamp=self.last_timestamp,
+            location_id=self.location_id,
+            L=float(L),
+            lambda_rate=float(lambda_rate),
+            W=float(W),
+            L_q=float(L_q),
+            W_q=float(W_q),
+            rho=float(min(rho, 2.0)),  # Cap at 200% for display
+            data_points_used=self.count,
+            confidence_interval_lower=float(ci_lower),
+            confidence_interval_upper=float(ci_upper)
+        )
+
+
+@dataclass
+class EntropySketch:
+    """
+    Mergeable summary of arrival counts for entropy and CV estimates.
+    
+    Arrivals are counted into fixed bins (edges shared by every sketch,
+    so sketches for different hours, days or locations can be added
+    together) and their running moments are tracked alongside, together
+    with the moments of reported service durations.
+    
+    Value x falls into bin i where edges[i-1] <= x < edges[i]; the first
+    and last bins are open-ended.
+    
+    key is the (location_id, date) the sketch summarizes; merging sketches
+    with different keys leaves None.
+    """
+    bin_edges: Tuple[float, ...] = DEFAULT_ARRIVAL_BIN_EDGES
+    bin_counts: List[int] = field(default_factory=list)
+    arrivals: RunningMoments = field(default_factory=RunningMoments)
+    service_times: RunningMoments = field(default_factory=RunningMoments)
+    key: Optional[Tuple[str, date]] = None
+    
+    def __post_init__(self):
+        self.bin_edges = tuple(float(e) for e in self.bin_edges)
+        if list(self.bin_edges) != sorted(set(self.bin_edges)):
+            raise ValueError("Bin edges must be strictly increasing")
+        if not self.bin_counts:
+            self.bin_counts = [0] * (len(self.bin_edges) + 1)
+        elif len(self.bin_counts) != len(self.bin_edges) + 1:
+            raise ValueError("Need one more bin count than bin edges")
+    
+    @property
+    def count(self) -> int:
+        return self.arrivals.count
+    
+    @property
+    def num_bins(self) -> int:
+        return len(self.bin_counts)
+    
+    def update(
+        self,
+        arrival_count: float,
+        service_duration: Optional[float] = None
+    ) -> None:
+        """Add one observation period."""
+        self.bin_counts[bisect_right(self.bin_edges, arrival_count)] += 1
+        self.arrivals.update(arrival_count)
+        if service_duration is not None:
+            self.service_times.update(service_duration)
+    
+    def update_measurement(self, measurement: FlowMeasurement) -> None:
+        self.update(measurement.arrival_count, measurement.avg_service_duration)
+    
+    def merge(self, other: "EntropySketch") -> None:
+        """Fold another sketch into this one (bin edges must match)."""
+        if other.bin_edges != self.bin_edges:
+            raise ValueError("Cannot merge entropy sketches with different bin edges")
+        self.bin_counts = [a + b for a, b in zip(self.bin_counts, other.bin_counts)]
+        self.arrivals.merge(other.arrivals)
+        self.service_times.merge(other.service_times)
+        if other.key != self.key:
+            self.key = None
+    
+    @classmethod
+    def merged(
+        cls,
+        sketches: Sequence["EntropySketch"],
+        bin_edges: Sequence[float] = DEFAULT_ARRIVAL_BIN_EDGES
+    ) -> "EntropySketch":
+        """New sketch combining several sketches."""
+        result = cls(
+            bin_edges=tuple(sketches[0].bin_edges if sketches else bin_edges),
+            key=sketches[0].key if sketches else None
+        )
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+    
+    def entropy_score(self) -> float:
+        """
+        Normalized Shannon entropy (0-1) of the binned arrivals.
+        
+        Normalized by the largest entropy reachable with this many
+        observations over these bins, log2(min(bins, n)).
+        """
+        n = self.count
+        if n < 2:
+            return 0.0
+        
+        entropy = 0.0
+        for c in self.bin_counts:
+            if c > 0:
+                p = c / n
+                entropy -= p * math.log2(p)
+        
+        max_entropy = math.log2(min(self.num_bins, n))
+        if max_entropy <= 0:
+            return 0.0
+        
+        return entropy / max_entropy
+
+
+@dataclass
+class FieldStatistics:
+    """
+    Additive summary (n, Σx, Σx², min, max) of one field.
+    
+    Values of zero are also counted separately, since a zero duration
+    means "not measured" for wait times.
+    """
+    count: int = 0
+    zero_count: int = 0
+    total: float = 0.0
+    total_sq: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    
+    def update(self, value: float) -> None:
+        self.count += 1
+        if value == 0:
+            self.zero_count += 1
+        self.total += value
+        self.total_sq += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+    
+    def merge(self, other: "FieldStatistics") -> None:
+        self.count += other.count
+        self.zero_count += other.zero_count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+    
+    def moments(self, exclude_zero: bool = False) -> RunningMoments:
+        """Equivalent running moments (optionally over non-zero values only)."""
+        count = self.count - self.zero_count if exclude_zero else self.count
+        if count <= 0:
+            return RunningMoments()
+        mean = self.total / count
+        # Σ(x - mean)² = Σx² - (Σx)²/n; clamp rounding below zero
+        m2 = max(self.total_sq - self.total * self.total / count, 0.0)
+        return RunningMoments(count=count, mean=mean, m2=m2)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Stored form (the RollupStats layout)."""
+        return {
+            "count": self.count,
+            "zero_count": self.zero_count,
+            "sum": self.total,
+            "sumsq": self.total_sq,
+            "min": self.min,
+            "max": self.max
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FieldStatistics":
+        return cls(
+            count=data.get("count", 0),
+            zero_count=data.get("zero_count", 0),
+            total=data.get("sum", 0.0),
+            total_sq=data.get("sumsq", 0.0),
+            min=data.get("min"),
+            max=data.get("max")
+        )
+
+
+@dataclass
+class FlowStatistics:
+    """
+    Mergeable sufficient statistics of a location's flow data.
+    
+    Holds one FieldStatistics per measured field (arrival_count,
+    queue_length, arrival_rate, avg_wait_time, ...) plus additive loss
+    components, so Little's Law, CVs and confidence intervals for any
+    set of periods follow from merging the per-period statistics.
+    """
+    location_id: str
+    count: int = 0
+    fields: Dict[str, FieldStatistics] = field(default_factory=dict)
+    loss: LossComponents = field(default_factory=LossComponents)
+    
+    def field_stats(self, name: str) -> FieldStatistics:
+        """Statistics of one field (empty if never observed)."""
+        return self.fields.get(name) or FieldStatistics()
+    
+    def update(self, values: Dict[str, Optional[float]]) -> None:
+        """Add one observation; None values are not measured."""
+        self.count += 1
+        for name, value in values.items():
+            if value is None:
+                continue
+            stats_ = self.fields.get(name)
+            if stats_ is None:
+                stats_ = self.fields[name] = FieldStatistics()
+            stats_.update(value)
+    
+    def merge(self, other: "FlowStatistics") -> None:
+        """Fold another period's statistics into this one."""
+        self.count += other.count
+        for name, other_stats in other.fields.items():
+            stats_ = self.fields.get(name)
+            if stats_ is None:
+                stats_ = self.fields[name] = FieldStatistics()
+            stats_.merge(other_stats)
+        self.loss = self.loss + other.loss
+    
+    def littles_law(
+        self,
+        timestamp: datetime,
+        num_servers: int = 1,
+        confidence_level: float = 0.95
+    ) -> Optional[LittlesLawResult]:
+        """
+        Little's Law metrics over the summarized periods, with the
+        formulas of LittlesLawCalculator.calculate. None without arrivals.
+        """
+        accumulator = LittlesLawAccumulator(
+            location_id=self.location_id,
+            target_date=timestamp.date(),
+            arrival_rate=self.field_stats("arrival_rate").moments(),
+            departure_rate=self.field_stats("departure_rate").moments(),
+            in_system=self.field_stats("total_in_system").moments(),
+            queue_length=self.field_stats("queue_length").moments(),
+            wait_time=self.field_stats("avg_wait_time").moments(exclude_zero=True),
+            last_timestamp=timestamp
+        )
+        return accumulator.result(num_servers, confidence_level)
+    
+    def cv(self, name: str) -> float:
+        """Coefficient of variation (sample σ / μ) of a field."""
+        moments = self.field_stats(name).moments()
+        if moments.count < 2 or moments.mean <= 0:
+            return 0.0
+        return moments.std / moments.mean
+    
+    def confidence_interval(self, name: str, confidence: float) -> Tuple[float, float]:
+        """t-distribution confidence interval for a field's mean."""
+        return self.field_stats(name).moments().confidence_interval(confidence)
+    
+    @classmethod
+    def from_dict(
+        cls,
+        location_id: str,
+        count: int,
+        fields: Dict[str, Dict[str, Any]],
+        loss: Optional[Dict[str, float]] = None
+    ) -> "FlowStatistics":
+        """Rebuild from the stored (rollup) layout."""
+        return cls(
+            location_id=location_id,
+            count=count,
+            fields={name: FieldStatistics.from_dict(d) for name, d in fields.items()},
+            loss=LossComponents(**(loss or {}))
+        )
+
+
+@dataclass
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch).
+    
+    Positive values are counted in logarithmic bins: value x falls into
+    bin k = ceil(log_γ x) with γ = (1 + α) / (1 - α), and every quantile
+    is answered within relative error α of the exact (lower) order
+    statistic. Bins are plain counts, so sketches with the same accuracy
+    merge by adding counts - including in MongoDB with $inc.
+    
+    Zero values are counted separately; negative values are rejected.
+    """
+    relative_accuracy: float = 0.01
+    bins: Dict[int, int] = field(default_factory=dict)
+    zero_count: int = 0
+    
+    def __post_init__(self):
+        if not 0 < self.relative_accuracy < 1:
+            raise ValueError("Relative accuracy must be between 0 and 1")
+        self._gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+    
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+    
+    def key(self, value: float) -> int:
+        """Bin index of a positive value."""
+        return math.ceil(math.log(value) / self._log_gamma)
+    
+    def update(self, value: float) -> None:
+        """Add one value (must not be negative)."""
+        if value < 0:
+            raise ValueError("Quantile sketch values must not be negative")
+        if value == 0:
+            self.zero_count += 1
+        else:
+            k = self.key(value)
+            self.bins[k] = self.bins.get(k, 0) + 1
+    
+    def merge(self, other: "QuantileSketch") -> None:
+        """Fold another sketch into this one (accuracy must match)."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for k, n in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + n
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate of the q-quantile (0 <= q <= 1), the order statistic at
+        rank floor(q·(n-1)). None for an empty sketch.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        n = self.count
+        if n == 0:
+            return None
+        
+        rank = q * (n - 1)
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return 0.0
+        for k in sorted(self.bins):
+            cumulative += self.bins[k]
+            if cumulative > rank:
+                # Midpoint (in relative terms) of (γ^(k-1), γ^k]
+                return 2 * self._gamma ** k / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.bins) / (self._gamma + 1)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Stored form; bin keys are strings for MongoDB."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": {str(k): n for k, n in self.bins.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        return cls(
+            relative_accuracy=data.get("relative_accuracy", 0.01),
+            bins={int(k): n for k, n in data.get("bins", {}).items()},
+            zero_count=data.get("zero_count", 0)
+        )
@@ -8,12 +8,17 @@ This is the brain of PICAM - converting raw operational data into
 provable financial insights.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, date, timedelta
 from typing import List, Optional, Dict, Any, Tuple
 import logging
+import multiprocessing
+import threading
 import uuid
 
+import numpy as np
+
 from app.models.domain import (
     FlowMeasurement,
     LittlesLawResult,
@@ -24,8 +29,10 @@ from app.models.domain import (
     DailyInsight,
     LocationType
 )
+from app.core.flow_series import FlowData, FlowSeries, as_flow_series
 from app.core.littles_law import LittlesLawCalculator, MultiServerQueueCalculator
 from app.core.entropy_calculator import EntropyCalculator, OperationalStabilityAnalyzer
+from app.core.online_stats import EntropySketch
 from app.core.loss_calculator import LossCalculator, FinancialParameters, ROICalculator
 from app.utils import now_utc, create_deterministic_hash
 from app.config import get_settings
@@ -33,6 +40,34 @@ from app.config import get_settings
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class LocationAnalysisContext:
+    """
+    Intermediate results of one location's analysis.
+    
+    Each stage is computed exactly once and shared by everything that
+    needs it (the analysis summary, the daily FinancialLoss, before/after
+    comparisons).
+    """
+    series: FlowSeries
+    capacity: Optional[CapacityConstraint]
+    analysis_timestamp: datetime
+    
+    littles_result: Optional[LittlesLawResult]
+    verification: dict
+    entropy: Optional[EntropyMeasurement]
+    patterns: dict
+    stability: dict
+    loss: FinancialLoss
+    
+    # Summary returned by analyze_location
+    analysis: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def location_id(self) -> str:
+        return self.series.location_id
+
+
 @dataclass
 class PhysicsEngine:
     """
@@ -56,64 +91,126 @@ class PhysicsEngine:
     
     # Configuration
     confidence_level: float = 0.95
+    analysis_workers: int = 0  # 0 = analyze locations sequentially
     
     def __post_init__(self):
         settings = get_settings()
         self.confidence_level = settings.confidence_level
         self.littles_law.confidence_level = self.confidence_level
+        self.analysis_workers = settings.analysis_pool_workers
     
     def analyze_location(
         self,
-        measurements: List[FlowMeasurement],
+        measurements: FlowData,
         capacity: Optional[CapacityConstraint] = None
     ) -> Dict[str, Any]:
         """
         Perform complete analysis for a single location.
         
         Args:
-            measurements: Flow measurements for the location
+            measurements: FlowSeries or flow measurements for the location
             capacity: Optional capacity constraints
             
         Returns:
             Complete analysis including queue metrics, entropy, and losses
         """
-        if not measurements:
+        context = self.build_location_context(measurements, capacity)
+        if context is None:
             return {
                 "status": "no_data",
                 "location_id": None
             }
+        return context.analysis
+    
+    def build_location_context(
+        self,
+        measurements: FlowData,
+        capacity: Optional[CapacityConstraint] = None,
+        target_date: Optional[date] = None,
+        entropy_sketch: Optional[EntropySketch] = None
+    ) -> Optional[LocationAnalysisContext]:
+        """
+        Run every analysis stage for a single location once.
+        
+        Args:
+            measurements: FlowSeries or flow measurements for the location
+            capacity: Optional capacity constraints
+            target_date: Calculation date for the FinancialLoss
+            entropy_sketch: Precomputed sketch; used for entropy when it
+                covers exactly the observations being analyzed (see
+                sketch_covers)
+            
+        Returns:
+            LocationAnalysisContext, or None when there is no data
+        """
+        # Build the columnar view once and share it with every calculator
+        series = as_flow_series(measurements)
+        if series is None or len(series) == 0:
+            return None
         
-        location_id = measurements[0].location_id
+        location_id = series.location_id
         analysis_timestamp = now_utc()
         
         # 1. Calculate Little's Law metrics
-        littles_result = self.littles_law.calculate(measurements, capacity)
+        littles_result = self.littles_law.calculate(series, capacity)
         
         # 2. Verify Little's Law holds (data quality check)
-        verification = self.littles_law.verify_littles_law(measurements)
+        verification = self.littles_law.verify_littles_law(series)
         
         # 3. Calculate entropy/variability
-        entropy = self.entropy_calc.calculate_entropy(measurements, location_id)
+        if entropy_sketch is not None and sketch_covers(entropy_sketch, series, target_date):
+            entropy = self.entropy_calc.entropy_from_sketch(
+                entropy_sketch, location_id, series.last_timestamp
+            )
+        else:
+            entropy = self.entropy_calc.calculate_entropy(series, location_id)
         
         # 4. Analyze patterns
-        patterns = self.entropy_calc.analyze_patterns(measurements)
+        patterns = self.entropy_calc.analyze_patterns(series)
         
         # 5. Analyze stability
-        stability = self.stability_analyzer.analyze_stability(measurements)
+        stability = self.stability_analyzer.analyze_stability(series)
         
         # 6. Calculate financial losses
         loss = self.loss_calc.calculate_total_loss(
-            measurements=measurements,
+            measurements=series,
             littles_result=littles_result,
             entropy=entropy,
-            capacity=capacity
+            capacity=capacity,
+            target_date=target_date
         )
         
-        # 7. Create audit hash
+        context = LocationAnalysisContext(
+            series=series,
+            capacity=capacity,
+            analysis_timestamp=analysis_timestamp,
+            littles_result=littles_result,
+            verification=verification,
+            entropy=entropy,
+            patterns=patterns,
+            stability=stability,
+            loss=loss
+        )
+        context.analysis = self._summarize_location(context)
+        return context
+    
+    def _summarize_location(self, context: LocationAnalysisContext) -> Dict[str, Any]:
+        """Build the analyze_location result from a computed context."""
+        series = context.series
+        location_id = context.location_id
+        analysis_timestamp = context.analysis_timestamp
+        littles_result = context.littles_result
+        verification = context.verification
+        entropy = context.entropy
+        patterns = context.patterns
+        stability = context.stability
+        loss = context.loss
+        
+        # Create audit hash
         audit_data = {
             "location_id": location_id,
             "analysis_timestamp": analysis_timestamp.isoformat(),
-            "data_points": len(measurements),
+            "data_points": len(series),
             "total_loss": loss.total_loss
         }
         audit_hash = create_deterministic_hash(audit_data)
@@ -122,7 +219,7 @@ class PhysicsEngine:
             "status": "analyzed",
             "location_id": location_id,
             "analysis_timestamp": analysis_timestamp.isoformat(),
-            "data_points": len(measurements),
+            "data_points": len(series),
             
             # Queue metrics (Little's Law)
             "queue_metrics": littles_result.to_audit_dict() if littles_result else None,
@@ -157,17 +254,21 @@ class PhysicsEngine:
     
     def analyze_day(
         self,
-        measurements_by_location: Dict[str, List[FlowMeasurement]],
+        measurements_by_location: Dict[str, FlowData],
         capacities: Dict[str, CapacityConstraint],
-        target_date: date
+        target_date: date,
+        entropy_sketches: Optional[Dict[Tuple[str, date], EntropySketch]] = None
     ) -> DailyInsight:
         """
         Perform complete daily analysis across all locations.
         
         Args:
-            measurements_by_location: Measurements grouped by location
+            measurements_by_location: FlowSeries or measurements grouped by location
             capacities: Capacity constraints per location
             target_date: Date of analysis
+            entropy_sketches: Optional precomputed entropy sketches keyed
+                by (location_id, date). Loss and CVs are unchanged by them;
+                entropy scores come from the sketch's fixed bins
             
         Returns:
             DailyInsight with top loss point and recommendation
@@ -180,27 +281,26 @@ class PhysicsEngine:
         littles_by_location = {}
         entropy_by_location = {}
         
-        for location_id, measurements in measurements_by_location.items():
-            capacity = capacities.get(location_id)
-            analysis = self.analyze_location(measurements, capacity)
+        results = self._analyze_locations(
+            measurements_by_location, capacities, target_date, entropy_sketches or {}
+        )
+        
+        for location_id, result in results:
+            if result is None:
+                location_analyses[location_id] = {
+                    "status": "no_data",
+                    "location_id": None
+                }
+                continue
             
+            analysis, loss = result
             location_analyses[location_id] = analysis
+            losses_by_location[location_id] = loss
             
-            if analysis.get("status") == "analyzed":
-                # Create FinancialLoss object from analysis
-                loss = self.loss_calc.calculate_total_loss(
-                    measurements=measurements,
-                    littles_result=self.littles_law.calculate(measurements, capacity),
-                    entropy=self.entropy_calc.calculate_entropy(measurements, location_id),
-                    capacity=capacity,
-                    target_date=target_date
-                )
-                losses_by_location[location_id] = loss
-                
-                # Store supporting calculations
-                littles_by_location[location_id] = analysis.get("queue_metrics")
-                if analysis.get("entropy"):
-                    entropy_by_location[location_id] = analysis["entropy"].get("entropy_score", 0)
+            # Store supporting calculations
+            littles_by_location[location_id] = analysis.get("queue_metrics")
+            if analysis.get("entropy"):
+                entropy_by_location[location_id] = analysis["entropy"].get("entropy_score", 0)
         
         # Identify top loss point
         top_loss_info = self.loss_calc.identify_top_loss_point(losses_by_location)
@@ -254,9 +354,71 @@ class PhysicsEngine:
                 for loc, loss in losses_by_location.items()
             },
             data_completeness=data_completeness,
-            calculation_confidence=calculation_confidence
+            calculation_confidence=calculation_confidence,
+            calculation_hash=calculation_hash
+        )
+    
+    def analysis_config(self) -> "AnalysisConfig":
+        """Settings a pool worker needs to rebuild an equivalent engine."""
+        return AnalysisConfig(
+            confidence_level=self.confidence_level,
+            littles_min_data_points=self.littles_law.min_data_points,
+            entropy_min_data_points=self.entropy_calc.min_data_points,
+            financial_params=self.loss_calc.params
         )
     
+    def _analyze_locations(
+        self,
+        measurements_by_location: Dict[str, FlowData],
+        capacities: Dict[str, CapacityConstraint],
+        target_date: date,
+        entropy_sketches: Dict[Tuple[str, date], EntropySketch]
+    ) -> List[Tuple[str, Optional[Tuple[Dict[str, Any], FinancialLoss]]]]:
+        """
+        Analyze every location, in input order.
+        
+        With analysis_workers > 0, locations are fanned out to a process
+        pool as FlowSeries (a handful of NumPy columns pickle cheaply)
+        together with the engine's AnalysisConfig, not the engine itself;
+        each worker keeps an equivalent engine per config. executor.map
+        yields results in submission order, so totals and the
+        calculation hash are identical to the sequential path.
+        """
+        location_ids = list(measurements_by_location)
+        tasks = [
+            (
+                as_flow_series(measurements_by_location[location_id]),
+                capacities.get(location_id),
+                target_date,
+                entropy_sketches.get((location_id, target_date))
+            )
+            for location_id in location_ids
+        ]
+        
+        if self.analysis_workers > 0 and len(tasks) > 1:
+            config = self.analysis_config()
+            pool = _get_analysis_pool(self.analysis_workers)
+            results = pool.map(_analyze_location_task, [(config,) + task for task in tasks])
+        else:
+            results = (self._analyze_series(*task) for task in tasks)
+        
+        return list(zip(location_ids, results))
+    
+    def _analyze_series(
+        self,
+        series: Optional[FlowSeries],
+        capacity: Optional[CapacityConstraint],
+        target_date: date,
+        entropy_sketch: Optional[EntropySketch]
+    ) -> Optional[Tuple[Dict[str, Any], FinancialLoss]]:
+        """Analysis summary and loss of one location, None without data."""
+        if series is None:
+            return None
+        context = self.build_location_context(series, capacity, target_date, entropy_sketch)
+        if context is None:
+            return None
+        return context.analysis, context.loss
+    
     def _generate_recommendation(
         self,
         top_loss_info: dict,
@@ -516,8 +678,8 @@ class PhysicsEngine:
     
     def compare_before_after(
         self,
-        before_measurements: List[FlowMeasurement],
-        after_measurements: List[FlowMeasurement],
+        before_measurements: FlowData,
+        after_measurements: FlowData,
         capacity: Optional[CapacityConstraint] = None
     ) -> dict:
         """
@@ -525,33 +687,13 @@ class PhysicsEngine:
         
         Used for ROI verification.
         """
-        if not before_measurements or not after_measurements:
+        before = self.build_location_context(before_measurements, capacity)
+        after = self.build_location_context(after_measurements, capacity)
+        if before is None or after is None:
             return {"status": "insufficient_data"}
         
-        # Analyze both periods
-        before_analysis = self.analyze_location(before_measurements, capacity)
-        after_analysis = self.analyze_location(after_measurements, capacity)
-        
-        # Calculate losses
-        before_loss = self.loss_calc.calculate_total_loss(
-            before_measurements,
-            self.littles_law.calculate(before_measurements, capacity),
-            self.entropy_calc.calculate_entropy(
-                before_measurements, 
-                before_measurements[0].location_id
-            ),
-            capacity
-        )
-        
-        after_loss = self.loss_calc.calculate_total_loss(
-            after_measurements,
-            self.littles_law.calculate(after_measurements, capacity),
-            self.entropy_calc.calculate_entropy(
-                after_measurements,
-                after_measurements[0].location_id
-            ),
-            capacity
-        )
+        before_analysis, before_loss = before.analysis, before.loss
+        after_analysis, after_loss = after.analysis, after.loss
         
         # Compare
         loss_change = after_loss.total_loss - before_loss.total_loss
@@ -564,13 +706,13 @@ class PhysicsEngine:
         return {
             "status": "compared",
             "before": {
-                "data_points": len(before_measurements),
+                "data_points": len(before.series),
                 "total_loss": round(before_loss.total_loss, 2),
                 "avg_wait_time": before_queue.get("W_q") if before_queue else None,
                 "utilization": before_queue.get("rho") if before_queue else None
             },
             "after": {
-                "data_points": len(after_measurements),
+                "data_points": len(after.series),
                 "total_loss": round(after_loss.total_loss, 2),
                 "avg_wait_time": after_queue.get("W_q") if after_queue else None,
                 "utilization": after_queue.get("rho") if after_queue else None
@@ -587,6 +729,97 @@ class PhysicsEngine:
         }
 
 
+def sketch_covers(
+    sketch: EntropySketch,
+    series: FlowSeries,
+    target_date: Optional[date]
+) -> bool:
+    """
+    Whether a sketch summarizes exactly this series: same (location, date)
+    key, the series lies on that date and the observation counts match.
+    """
+    if target_date is None or sketch.key != (series.location_id, target_date):
+        return False
+    days = series.timestamps.astype("datetime64[D]")
+    day = np.datetime64(target_date, "D")
+    return bool(days.min() == day and days.max() == day) and sketch.count == len(series)
+
+
+@dataclass(frozen=True)
+class AnalysisConfig:
+    """Engine configuration shipped to pool workers with each task."""
+    confidence_level: float
+    littles_min_data_points: int
+    entropy_min_data_points: int
+    financial_params: FinancialParameters
+
+
+# Engine of this worker process, rebuilt when the config changes
+_worker_engine: Optional[Tuple[AnalysisConfig, "PhysicsEngine"]] = None
+
+
+def _engine_for(config: AnalysisConfig) -> "PhysicsEngine":
+    global _worker_engine
+    if _worker_engine is None or _worker_engine[0] != config:
+        engine = PhysicsEngine(
+            littles_law=LittlesLawCalculator(min_data_points=config.littles_min_data_points),
+            entropy_calc=EntropyCalculator(min_data_points=config.entropy_min_data_points),
+            loss_calc=LossCalculator(params=config.financial_params)
+        )
+        engine.confidence_level = config.confidence_level
+        engine.littles_law.confidence_level = config.confidence_level
+        engine.analysis_workers = 0
+        _worker_engine = (config, engine)
+    return _worker_engine[1]
+
+
+def _analyze_location_task(
+    task: Tuple[
+        AnalysisConfig,
+        Optional[FlowSeries],
+        Optional[CapacityConstraint],
+        date,
+        Optional[EntropySketch]
+    ]
+) -> Optional[Tuple[Dict[str, Any], FinancialLoss]]:
+    """Analyze one location in a pool worker."""
+    config, *location_task = task
+    return _engine_for(config)._analyze_series(*location_task)
+
+
+# Shared worker pool for parallel daily analysis
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+_analysis_pool_workers: int = 0
+_analysis_pool_lock = threading.Lock()
+
+
+def _get_analysis_pool(workers: int) -> ProcessPoolExecutor:
+    """Get or create the analysis process pool."""
+    global _analysis_pool, _analysis_pool_workers
+    with _analysis_pool_lock:
+        if _analysis_pool is None or _analysis_pool_workers != workers:
+            if _analysis_pool is not None:
+                _analysis_pool.shutdown(wait=True)
+            # spawn: forking a process that runs an event loop and
+            # database client threads is not safe
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _analysis_pool_workers = workers
+        return _analysis_pool
+
+
+def shutdown_analysis_pool() -> None:
+    """Stop the analysis worker processes, if any were started."""
+    global _analysis_pool, _analysis_pool_workers
+    with _analysis_pool_lock:
+        if _analysis_pool is not None:
+            _analysis_pool.shutdown(wait=True)
+            _analysis_pool = None
+            _analysis_pool_workers = 0
+
+
 # Singleton instance
 _physics_engine: Optional[PhysicsEngine] = None
 
@@ -6,22 +6,48 @@ MongoDB with Motor async driver
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from beanie import init_beanie
+from pymongo.errors import OperationFailure
 from typing import Optional
 import logging
 
 from app.config import get_settings
 from app.models.mongodb_models import (
     OperationalDataPoint,
+    HourlyRollup,
+    DailyRollup,
     DailyInsight,
     ROILogEntry,
     ActionRecommendation,
     SystemConfiguration,
-    CalculationAuditLog
+    CalculationAuditLog,
+    LocationRecord,
+    IDEMPOTENCY_KEY
 )
 
 logger = logging.getLogger(__name__)
 
 
+def timeseries_options(granularity: str) -> dict:
+    """
+    Time-series layout for operational data.
+    
+    Points are bucketed per location (metaField) by timestamp; the
+    location type and all counts stay regular measurement fields, so
+    documents keep the same shape as in a standard collection.
+    
+    location_type is deliberately not part of the metaField: every
+    location has exactly one type, so a {location_id, location_type}
+    meta subdocument would produce the same buckets while moving both
+    fields under "meta" - every query, index, aggregation and the
+    OperationalDataPoint model read them at the top level.
+    """
+    return {
+        "timeField": "timestamp",
+        "metaField": "location_id",
+        "granularity": granularity
+    }
+
+
 class DatabaseManager:
     """
     Manages MongoDB connection lifecycle.
@@ -49,16 +75,22 @@ class DatabaseManager:
         
         cls._database = cls._client[settings.mongodb_database]
         
+        if settings.use_timeseries_collection:
+            await cls._ensure_timeseries_collection()
+        
         # Initialize Beanie with all document models
         await init_beanie(
             database=cls._database,
             document_models=[
                 OperationalDataPoint,
+                HourlyRollup,
+                DailyRollup,
                 DailyInsight,
                 ROILogEntry,
                 ActionRecommendation,
                 SystemConfiguration,
-                CalculationAuditLog
+                CalculationAuditLog,
+                LocationRecord
             ]
         )
         
@@ -67,6 +99,39 @@ class DatabaseManager:
         
         logger.info("MongoDB connection established successfully")
     
+    @classmethod
+    async def _ensure_timeseries_collection(cls) -> None:
+        """
+        Make sure operational data lives in a time-series collection.
+        
+        Creates it if missing. An existing standard collection is only
+        replaced when empty (e.g. pre-created by mongo-init.js); one with
+        data must be converted with app.scripts.migrate_timeseries.
+        """
+        settings = get_settings()
+        name = OperationalDataPoint.Settings.name
+        
+        existing = await cls._database.list_collections(filter={"name": name}).to_list(length=1)
+        if existing:
+            if existing[0].get("type") == "timeseries":
+                return
+            if await cls._database[name].estimated_document_count() > 0:
+                raise RuntimeError(
+                    f"'{name}' is a standard collection with data; run "
+                    f"'python -m app.scripts.migrate_timeseries' before enabling "
+                    f"time-series storage"
+                )
+            await cls._database.drop_collection(name)
+        
+        await cls._database.create_collection(
+            name,
+            timeseries=timeseries_options(settings.timeseries_granularity)
+        )
+        logger.info(
+            f"Created time-series collection '{name}' "
+            f"(granularity: {settings.timeseries_granularity})"
+        )
+    
     @classmethod
     async def _create_indexes(cls) -> None:
         """
@@ -76,8 +141,24 @@ class DatabaseManager:
         await OperationalDataPoint.get_motor_collection().create_index(
             [("timestamp", -1), ("location_id", 1)]
         )
+        # Dominant shape {date, location_id} sorted by timestamp: equality,
+        # equality, sort - no in-memory sort. Its date prefix serves
+        # date-only and date-range queries (quality report, rollup rebuild,
+        # first/last day) and ROI's {location_id, date range} scans keys
+        # for both fields.
         await OperationalDataPoint.get_motor_collection().create_index(
-            [("date", -1)]
+            [("date", -1), ("location_id", 1), ("timestamp", 1)]
+        )
+        await cls._create_idempotency_index()
+        
+        # Rollups: one bucket per location and hour/day
+        await HourlyRollup.get_motor_collection().create_index(
+            [("date", -1), ("location_id", 1), ("hour", 1)],
+            unique=True
+        )
+        await DailyRollup.get_motor_collection().create_index(
+            [("date", -1), ("location_id", 1)],
+            unique=True
         )
         
         # Daily insights: query by date
@@ -99,6 +180,32 @@ class DatabaseManager:
         await CalculationAuditLog.get_motor_collection().create_index(
             [("calculation_type", 1), ("timestamp", -1)]
         )
+        await CalculationAuditLog.get_motor_collection().create_index(
+            [("audit_chain_id", 1), ("batch_sequence", 1)]
+        )
+    
+    @classmethod
+    async def _create_idempotency_index(cls) -> None:
+        """
+        Unique key for idempotent (upsert) ingestion.
+        
+        Time-series collections cannot have unique indexes, and existing
+        duplicates prevent the build; in both cases idempotent ingestion
+        runs without the guarantee and a warning is logged.
+        """
+        if get_settings().use_timeseries_collection:
+            return
+        try:
+            await OperationalDataPoint.get_motor_collection().create_index(
+                [(name, 1) for name in IDEMPOTENCY_KEY],
+                unique=True,
+                name="idempotency_key"
+            )
+        except OperationFailure as e:
+            logger.warning(
+                f"Could not create unique idempotency index on operational data "
+                f"(duplicate points already stored?): {e}"
+            )
     
     @classmethod
     async def disconnect(cls) -> None:
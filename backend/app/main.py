@@ -10,6 +10,9 @@ import logging
 
 from app.config import get_settings
 from app.database import DatabaseManager
+from app.core import shutdown_analysis_pool
+from app.services.audit_sink import get_audit_sink
+from app.services.ingest_queue import get_ingest_batcher
 from app.api.routes import data, metrics, insights, roi, admin
 
 # Configure logging
@@ -34,11 +37,17 @@ async def lifespan(app: FastAPI):
     await DatabaseManager.connect()
     logger.info(f"Connected to MongoDB: {settings.mongodb_database}")
     
+    # Group-commit audit writes
+    await get_audit_sink().start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down PICAM System...")
+    await get_ingest_batcher().close()  # commit queued points,
+    await get_audit_sink().close()  # then their audit entries
     await DatabaseManager.disconnect()
+    shutdown_analysis_pool()
     logger.info("Cleanup complete")
 
 
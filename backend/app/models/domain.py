@@ -371,6 +371,9 @@ class DailyInsight:
     data_completeness: float  # 0-1
     calculation_confidence: float  # 0-1
     
+    # Hash of date, totals and top location (reproducibility check)
+    calculation_hash: str = ""
+    
     def to_summary_dict(self) -> dict:
         """Create summary for dashboard display."""
         return {
@@ -3,7 +3,7 @@ PICAM MongoDB Document Models (Beanie ODM)
 """
 
 from beanie import Document, Indexed
-from pydantic import Field
+from pydantic import BaseModel, Field
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from enum import Enum
@@ -63,6 +63,70 @@ class OperationalDataPoint(Document):
         use_state_management = True
 
 
+# Identity of a data point for idempotent ingestion: a replayed point
+# (same location, timestamp and source) is stored once
+IDEMPOTENCY_KEY = ("location_id", "timestamp", "data_source")
+
+# MongoDB error code of a unique index violation
+DUPLICATE_KEY = 11000
+
+
+class RollupStats(BaseModel):
+    """
+    Sufficient statistics of one measured field within a rollup bucket.
+    Additive, so buckets are maintained with $inc/$min/$max.
+    """
+    
+    count: int = 0  # Non-null observations
+    zero_count: int = 0  # Observations equal to zero ("not measured" for durations)
+    sum: float = 0.0
+    sumsq: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class HourlyRollup(Document):
+    """
+    Per-location, per-hour (UTC) rollup of operational data.
+    Maintained at ingest time; rebuildable from operational_data.
+    """
+    
+    location_id: str
+    location_type: str
+    date: date
+    hour: int
+    
+    data_points: int = 0
+    stats: Dict[str, RollupStats] = Field(default_factory=dict)
+    # Duration field -> accuracy key (see rollups.accuracy_key) -> QuantileSketch
+    quantiles: Dict[str, Dict[str, Dict[str, Any]]] = Field(default_factory=dict)
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "rollups_hourly"
+
+
+class DailyRollup(Document):
+    """
+    Per-location, per-day rollup of operational data.
+    Same statistics as HourlyRollup, one bucket per day.
+    """
+    
+    location_id: str
+    location_type: str
+    date: date
+    
+    data_points: int = 0
+    stats: Dict[str, RollupStats] = Field(default_factory=dict)
+    loss: Dict[str, float] = Field(default_factory=dict)  # Capacity-free LossComponents sums
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "rollups_daily"
+
+
 class DailyInsight(Document):
     """
     Daily aggregated insights with top loss point.
@@ -101,6 +165,10 @@ class DailyInsight(Document):
     calculation_hash: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Set when points for the day were ingested after generation;
+    # the next request regenerates the insight
+    is_stale: bool = False
+    
     class Settings:
         name = "daily_insights"
 
@@ -188,6 +256,28 @@ class ActionRecommendation(Document):
         name = "action_recommendations"
 
 
+class LocationRecord(Document):
+    """
+    Registry entry for an operational location.
+    Registered when its first data point is ingested; capacity defaults
+    from the location type and can be changed by an administrator.
+    """
+    
+    location_id: Indexed(str, unique=True)
+    location_type: str
+    
+    # Capacity constraints
+    max_servers: int
+    max_queue_capacity: int
+    
+    first_seen: datetime
+    last_seen: datetime
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "locations"
+
+
 class SystemConfiguration(Document):
     """
     System configuration with audit trail.
@@ -242,6 +332,15 @@ class CalculationAuditLog(Document):
     warnings: List[str] = Field(default_factory=list)
     errors: List[str] = Field(default_factory=list)
     
+    # Group commit (AuditLogSink): each flushed batch is sealed with a
+    # digest over its entries' hashes, chained to the previous batch
+    audit_chain_id: Optional[str] = None
+    batch_sequence: Optional[int] = None
+    batch_index: Optional[int] = None
+    entry_hash: Optional[str] = None
+    batch_digest: Optional[str] = None
+    previous_batch_digest: Optional[str] = None
+    
     class Settings:
         name = "calculation_audit_log"
 
@@ -0,0 +1,102 @@
+"""
+PICAM Historical Backfill
+
+Imports a CSV or Parquet export of operational data in chunks, with
+column-wise validation, bulk inserts and rollup updates
+(see app.services.backfill).
+
+Usage:
+    python -m app.scripts.backfill FILE [--format csv|parquet]
+        [--chunk-size N] [--source NAME] [--rename EXPORT_COL=FIELD ...]
+        [--idempotent]
+
+--idempotent upserts on (location_id, timestamp, source), so an
+interrupted import can be re-run without storing points twice.
+
+Parquet files need pyarrow installed. Daily insights are not generated;
+use POST /api/v1/admin/generate-all-insights afterwards if needed.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database import DatabaseManager
+from app.services.backfill import FILE_FORMATS, backfill_file, detect_format
+
+
+async def run_backfill(args: argparse.Namespace) -> int:
+    """
+    Run the import. Returns a process exit code.
+    """
+    file_format = args.format or detect_format(args.file)
+    if file_format is None:
+        print(f"✗ Cannot tell the format of '{args.file}'; pass --format")
+        return 1
+    rename = dict(pair.split("=", 1) for pair in args.rename)
+    
+    print("=" * 60)
+    print("PICAM Historical Backfill")
+    print("=" * 60)
+    print(f"File: {args.file} ({file_format})")
+    if rename:
+        print(f"Columns: {rename}")
+    print()
+    
+    await DatabaseManager.connect()
+    
+    try:
+        summary = await backfill_file(
+            args.file,
+            file_format,
+            data_source=args.source,
+            chunk_size=args.chunk_size,
+            rename=rename,
+            idempotent=args.idempotent
+        )
+        
+        for chunk in summary["chunks"]:
+            print(
+                f"  chunk {chunk['chunk']}: records {chunk['first_record']}-"
+                f"{chunk['last_record']}, {chunk['inserted']}/{chunk['submitted']} stored"
+                + (f", {chunk['matched']} already present" if chunk["matched"] else "")
+            )
+            for error in chunk["errors"]:
+                print(f"    ✗ {error}")
+        
+        print()
+        print(f"✓ Imported {summary['records_processed']} records")
+        if summary["records_failed"]:
+            print(f"✗ {summary['records_failed']} records failed")
+        
+        return 0 if summary["success"] else 2
+    
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+    
+    finally:
+        await DatabaseManager.disconnect()
+
+
+def main():
+    """Entry point."""
+    parser = argparse.ArgumentParser(description="Import historical operational data")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=FILE_FORMATS)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--source", default="backfill")
+    parser.add_argument("--rename", action="append", default=[], metavar="EXPORT_COL=FIELD")
+    parser.add_argument("--idempotent", action="store_true",
+                        help="Upsert, skipping points already stored")
+    args = parser.parse_args()
+    
+    sys.exit(asyncio.run(run_backfill(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+PICAM Time-Series Migration
+
+Converts the operational data collection from a standard collection into
+a MongoDB time-series collection (see DatabaseManager and the
+USE_TIMESERIES_COLLECTION setting).
+
+Steps:
+1. Rename operational_data to operational_data_legacy
+2. Create operational_data as a time-series collection
+3. Copy the legacy documents over in _id order, in batches
+4. Verify document counts (optionally drop the legacy collection)
+
+Re-running after an interruption copies only the legacy documents whose
+_id is missing from the new collection, including gaps left by failed
+writes of an unordered batch. Stop the API (or ingestion) while
+migrating.
+
+Usage:
+    python -m app.scripts.migrate_timeseries [--batch-size N]
+        [--granularity minutes] [--drop-legacy]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+from app.config import get_settings
+from app.database import timeseries_options
+from app.models.mongodb_models import OperationalDataPoint
+
+LEGACY_SUFFIX = "_legacy"
+
+
+async def missing_documents(target, batch: list) -> list:
+    """
+    Documents of a legacy batch not yet in the target collection.
+    
+    Time-series collections have no _id index, so the lookup is bounded
+    by the batch's timestamp range, which prunes buckets.
+    """
+    timestamps = [doc["timestamp"] for doc in batch]
+    present = await target.find(
+        {
+            "_id": {"$in": [doc["_id"] for doc in batch]},
+            "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)}
+        },
+        {"_id": 1}
+    ).to_list(length=None)
+    present_ids = {doc["_id"] for doc in present}
+    return [doc for doc in batch if doc["_id"] not in present_ids]
+
+
+async def migrate(batch_size: int, granularity: str, drop_legacy: bool) -> int:
+    """
+    Run the migration. Returns a process exit code.
+    """
+    settings = get_settings()
+    name = OperationalDataPoint.Settings.name
+    legacy_name = name + LEGACY_SUFFIX
+    
+    print("=" * 60)
+    print("PICAM Time-Series Migration")
+    print("=" * 60)
+    print(f"Database: {settings.mongodb_database}")
+    print(f"Collection: {name} (granularity: {granularity})")
+    print()
+    
+    client = AsyncIOMotorClient(settings.mongodb_url, serverSelectionTimeoutMS=5000)
+    db = client[settings.mongodb_database]
+    
+    try:
+        collections = {
+            c["name"]: c for c in await db.list_collections().to_list(length=None)
+        }
+        current = collections.get(name)
+        legacy = collections.get(legacy_name)
+        
+        if current and current.get("type") == "timeseries" and not legacy:
+            print(f"✓ '{name}' is already a time-series collection")
+            return 0
+        
+        # 1. Move the standard collection aside
+        if current and current.get("type") != "timeseries":
+            if legacy:
+                print(f"✗ Both '{name}' and '{legacy_name}' exist as standard collections")
+                return 1
+            await db[name].rename(legacy_name)
+            print(f"✓ Renamed '{name}' to '{legacy_name}'")
+            current = None
+        elif not legacy:
+            print(f"✗ Neither '{name}' nor '{legacy_name}' found - nothing to migrate")
+            return 1
+        
+        # 2. Create the time-series collection
+        if current is None:
+            await db.create_collection(name, timeseries=timeseries_options(granularity))
+            print(f"✓ Created time-series collection '{name}'")
+        
+        source = db[legacy_name]
+        target = db[name]
+        
+        # 3. Copy in _id order; after an interruption only missing documents
+        total = await source.count_documents({})
+        copied = await target.count_documents({})
+        resuming = copied > 0
+        print(f"Copying {total - copied} of {total} documents...")
+        
+        failed = 0
+        cursor = source.find({}).sort("_id", 1).batch_size(batch_size)
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            if resuming:
+                batch = await missing_documents(target, batch)
+                if not batch:
+                    continue
+            try:
+                await target.insert_many(batch, ordered=False)
+                copied += len(batch)
+            except BulkWriteError as e:
+                errors = len(e.details.get("writeErrors", []))
+                failed += errors
+                copied += len(batch) - errors
+            print(f"  {copied}/{total}")
+        if failed:
+            print(f"✗ {failed} documents failed to copy; re-run to retry them")
+        
+        # 4. Verify
+        migrated = await target.count_documents({})
+        if migrated != total:
+            print(f"✗ Count mismatch: {migrated} migrated vs {total} legacy documents")
+            return 1
+        print(f"✓ Migrated {migrated} documents")
+        
+        if drop_legacy:
+            await source.drop()
+            print(f"✓ Dropped '{legacy_name}'")
+        else:
+            print(f"  '{legacy_name}' kept; drop it once the new collection is verified")
+        
+        print()
+        print("Set USE_TIMESERIES_COLLECTION=true and restart the API;")
+        print("indexes are created on startup.")
+        return 0
+    
+    finally:
+        client.close()
+
+
+def main():
+    """Entry point."""
+    settings = get_settings()
+    
+    parser = argparse.ArgumentParser(description="Migrate operational data to a time-series collection")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--granularity",
+        choices=["seconds", "minutes", "hours"],
+        default=settings.timeseries_granularity
+    )
+    parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+    
+    sys.exit(asyncio.run(migrate(args.batch_size, args.granularity, args.drop_legacy)))
+
+
+if __name__ == "__main__":
+    main()
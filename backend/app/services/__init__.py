@@ -9,6 +9,10 @@ Services:
 - ROITrackerService: Immutable ROI log management
 - ActionRecommenderService: Daily action recommendations
 - InsightGeneratorService: Daily insight generation
+- LiveMetricsRegistry: Running per-location/day Little's Law metrics
+- FlowDataRepository: Projection-only reads of flow data as NumPy columns
+- RollupService: Hourly/daily per-location rollups maintained at ingest
+- LocationRegistry: Cached location IDs, types and capacities
 """
 
 from app.services.data_ingestion import DataIngestionService
@@ -16,11 +20,32 @@ from app.services.video_processor import VideoProcessorService
 from app.services.roi_tracker import ROITrackerService
 from app.services.action_recommender import ActionRecommenderService
 from app.services.insight_generator import InsightGeneratorService
+from app.services.live_metrics import LiveMetricsRegistry, get_live_metrics_registry
+from app.services.flow_repository import FlowDataRepository, get_flow_repository
+from app.services.rollups import RollupService, get_rollup_service
+from app.services.query_plans import QueryPlanRecorder, get_query_plan_recorder
+from app.services.audit_sink import AuditLogSink, get_audit_sink
+from app.services.ingest_queue import IngestBatcher, get_ingest_batcher
+from app.services.location_registry import LocationRegistry, get_location_registry
 
 __all__ = [
     "DataIngestionService",
     "VideoProcessorService",
     "ROITrackerService",
     "ActionRecommenderService",
-    "InsightGeneratorService"
+    "InsightGeneratorService",
+    "LiveMetricsRegistry",
+    "get_live_metrics_registry",
+    "FlowDataRepository",
+    "get_flow_repository",
+    "RollupService",
+    "get_rollup_service",
+    "QueryPlanRecorder",
+    "get_query_plan_recorder",
+    "AuditLogSink",
+    "get_audit_sink",
+    "IngestBatcher",
+    "get_ingest_batcher",
+    "LocationRegistry",
+    "get_location_registry"
 ]
\ No newline at end of file
@@ -36,6 +36,7 @@ from app.core import (
     EntropyCalculator,
     LossCalculator
 )
+from app.services.flow_repository import get_flow_repository
 from app.utils import now_utc, create_deterministic_hash
 from app.config import get_settings
 
@@ -84,6 +85,7 @@ class ActionRecommenderService:
         self.littles_calc = LittlesLawCalculator()
         self.entropy_calc = EntropyCalculator()
         self.loss_calc = LossCalculator()
+        self.flow_repository = get_flow_repository()
     
     async def generate_daily_recommendation(
         self,
@@ -95,51 +97,30 @@ class ActionRecommenderService:
         
         Focuses on the action with highest ROI.
         """
-        # Get all data for the day
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-        
-        data_points = await OperationalDataPoint.find(query).to_list()
+        # Get all data for the day, as column-backed series per location
+        by_location = await self.flow_repository.fetch_series_by_location(
+            target_date, location_id
+        )
         
-        if len(data_points) < 10:
+        if sum(len(series) for series in by_location.values()) < 10:
             logger.warning(f"Insufficient data for {target_date}")
             return None
         
-        # Group by location
-        by_location: Dict[str, List[FlowMeasurement]] = {}
-        for dp in data_points:
-            m = FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
-            )
-            if dp.location_id not in by_location:
-                by_location[dp.location_id] = []
-            by_location[dp.location_id].append(m)
-        
         # Analyze each location and generate candidates
         all_candidates: List[ActionCandidate] = []
         
-        for loc_id, measurements in by_location.items():
+        for loc_id, series in by_location.items():
             # Calculate metrics
-            littles_result = self.littles_calc.calculate(measurements)
-            entropy = self.entropy_calc.calculate_entropy(measurements, loc_id)
+            littles_result = self.littles_calc.calculate(series)
+            entropy = self.entropy_calc.calculate_entropy(series, loc_id)
             loss = self.loss_calc.calculate_total_loss(
-                measurements=measurements,
+                measurements=series,
                 littles_result=littles_result,
                 entropy=entropy,
                 target_date=target_date
             )
             
-            patterns = self.entropy_calc.analyze_patterns(measurements)
+            patterns = self.entropy_calc.analyze_patterns(series)
             
             # Generate candidates for this location
             candidates = self._generate_candidates(
@@ -0,0 +1,290 @@
+"""
+PICAM Audit Log Sink
+
+Group commit for CalculationAuditLog entries. Instead of one insert per
+audited operation (doubling the round trips of every ingest), entries
+are buffered in memory and written with insert_many once
+AUDIT_BATCH_MAX_SIZE entries are pending or AUDIT_FLUSH_INTERVAL_MS has
+passed. The FastAPI lifespan starts the sink and flushes it on shutdown;
+when the sink is not running (scripts, tests) entries are written
+through immediately.
+
+Tamper evidence: every flushed batch is sealed with a digest over the
+hashes of its entries, chained to the previous batch's digest - the same
+construction as the ROI log's entry chain, one link per batch. Each
+process writes its own chain (audit_chain_id), so several API workers
+never fork a chain; verify_batches checks one.
+
+A batch is sealed (ids, hashes and digest assigned) before its first
+write attempt, so a failed insert_many is retried with identical
+documents: entries already stored are rejected as duplicate keys and
+the chain stays intact. Sealed batches are never dropped: once
+MAX_UNWRITTEN_BATCHES wait for a retry, submit blocks until the flusher
+has written some (backpressure on the audited operations).
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from app.models.mongodb_models import DUPLICATE_KEY, CalculationAuditLog
+from app.config import get_settings
+from app.utils import create_chain_hash, create_deterministic_hash, to_utc
+
+logger = logging.getLogger(__name__)
+
+GENESIS_DIGEST = "genesis"
+
+# Sealed batches awaiting a retry before submit applies backpressure
+MAX_UNWRITTEN_BATCHES = 100
+
+
+def _stored_timestamp(ts: datetime) -> str:
+    """Timestamp as it reads back from MongoDB: naive UTC, milliseconds."""
+    ts = to_utc(ts).replace(tzinfo=None)
+    return ts.replace(microsecond=ts.microsecond // 1000 * 1000).isoformat()
+
+
+def entry_hash(entry: Any) -> str:
+    """Hash of an audit entry's content (document or stored dict)."""
+    get = entry.get if isinstance(entry, dict) else lambda name: getattr(entry, name)
+    return create_deterministic_hash({
+        "calculation_id": get("calculation_id"),
+        "calculation_type": get("calculation_type"),
+        "timestamp": _stored_timestamp(get("timestamp")),
+        "input_data": get("input_data"),
+        "input_hash": get("input_hash"),
+        "output_data": get("output_data"),
+        "output_hash": get("output_hash")
+    })
+
+
+def batch_digest(
+    chain_id: str,
+    sequence: int,
+    entry_hashes: Sequence[str],
+    previous_digest: str
+) -> str:
+    """Digest sealing one batch, chained to the previous batch's digest."""
+    return create_chain_hash(
+        {"chain_id": chain_id, "sequence": sequence, "entries": list(entry_hashes)},
+        previous_digest
+    )
+
+
+def verify_batches(entries: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Verify stored entries of one chain, from its first batch onwards.
+    
+    Checks every entry hash against its content, every batch digest
+    against its entries, and that each batch links to the previous one.
+    """
+    batches: Dict[int, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        batches.setdefault(entry["batch_sequence"], []).append(entry)
+    
+    previous = GENESIS_DIGEST
+    for expected, sequence in enumerate(sorted(batches), start=1):
+        batch = sorted(batches[sequence], key=lambda e: e["batch_index"])
+        problem = None
+        if sequence != expected:
+            problem = f"batch {expected} missing"
+        elif [e["batch_index"] for e in batch] != list(range(len(batch))):
+            problem = "entries missing"
+        elif any(e["previous_batch_digest"] != previous for e in batch):
+            problem = "broken link to previous batch"
+        else:
+            hashes = [entry_hash(e) for e in batch]
+            if hashes != [e["entry_hash"] for e in batch]:
+                problem = "entry content changed"
+            elif any(
+                e["batch_digest"] != batch_digest(e["audit_chain_id"], sequence, hashes, previous)
+                for e in batch
+            ):
+                problem = "batch digest mismatch"
+        if problem:
+            return {"valid": False, "batches_verified": expected - 1,
+                    "failed_batch": sequence, "reason": problem}
+        previous = batch[0]["batch_digest"]
+    
+    return {"valid": True, "batches_verified": len(batches)}
+
+
+class AuditLogSink:
+    """
+    Buffers audit log entries and writes them in hash-chained batches.
+    """
+    
+    def __init__(
+        self,
+        max_batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[int] = None
+    ):
+        settings = get_settings()
+        self.max_batch_size = max_batch_size or settings.audit_batch_max_size
+        self.flush_interval = (flush_interval_ms or settings.audit_flush_interval_ms) / 1000
+        self.chain_id = uuid.uuid4().hex
+        
+        self._pending: List[CalculationAuditLog] = []
+        self._unwritten: Deque[List[CalculationAuditLog]] = deque()
+        self._sequence = 0
+        self._previous_digest = GENESIS_DIGEST
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    async def start(self) -> None:
+        """Start the background flusher."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Audit sink started (chain {self.chain_id}, batch {self.max_batch_size}, "
+                f"interval {self.flush_interval * 1000:.0f} ms)"
+            )
+    
+    async def close(self) -> None:
+        """Stop the flusher and write everything still buffered."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        written = await self.flush()
+        if self._pending or self._unwritten:
+            logger.error(
+                f"Audit sink closed with {self.buffered} entries not written"
+            )
+        else:
+            logger.info(f"Audit sink closed ({written} entries flushed)")
+    
+    @property
+    def buffered(self) -> int:
+        return len(self._pending) + sum(len(b) for b in self._unwritten)
+    
+    async def submit(self, entry: CalculationAuditLog) -> None:
+        """
+        Queue an entry. Written through when the sink is not running.
+        
+        While MAX_UNWRITTEN_BATCHES sealed batches are waiting for a
+        retry, waits until the flusher has written some.
+        """
+        while self._task is not None and len(self._unwritten) >= MAX_UNWRITTEN_BATCHES:
+            self._room.clear()
+            self._wake.set()
+            await self._room.wait()
+        self._pending.append(entry)
+        if self._task is None:
+            await self.flush()
+        elif len(self._pending) >= self.max_batch_size:
+            self._wake.set()
+    
+    async def flush(self) -> int:
+        """Seal pending entries into batches and write them. Returns entries written."""
+        async with self._lock:
+            while self._pending:
+                entries = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                self._unwritten.append(self._seal(entries))
+            
+            written = 0
+            while self._unwritten:
+                batch = self._unwritten[0]
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    logger.warning(f"Audit batch {batch[0].batch_sequence} write failed: {e}")
+                    break
+                self._unwritten.popleft()
+                written += len(batch)
+            
+            if len(self._unwritten) < MAX_UNWRITTEN_BATCHES:
+                self._room.set()
+            else:
+                logger.error(
+                    f"Audit sink holding {len(self._unwritten)} unwritten batches; "
+                    f"audited operations wait until they are written"
+                )
+            return written
+    
+    def _seal(self, entries: List[CalculationAuditLog]) -> List[CalculationAuditLog]:
+        self._sequence += 1
+        hashes = [entry_hash(e) for e in entries]
+        digest = batch_digest(self.chain_id, self._sequence, hashes, self._previous_digest)
+        
+        for index, (entry, hash_value) in enumerate(zip(entries, hashes)):
+            entry.id = PydanticObjectId()
+            entry.audit_chain_id = self.chain_id
+            entry.batch_sequence = self._sequence
+            entry.batch_index = index
+            entry.entry_hash = hash_value
+            entry.batch_digest = digest
+            entry.previous_batch_digest = self._previous_digest
+        
+        self._previous_digest = digest
+        return entries
+    
+    @staticmethod
+    async def _write(batch: List[CalculationAuditLog]) -> None:
+        try:
+            await CalculationAuditLog.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Entries stored by an earlier, partly failed attempt
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+    
+    async def _run(self) -> None:
+        # close() clears _task before cancelling; wait_for can swallow a
+        # cancellation that races with the wake event
+        while self._task is not None:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+    
+    async def verify_chain(self, chain_id: Optional[str] = None) -> Dict[str, Any]:
+        """Verify a stored chain (default: this process's chain)."""
+        chain_id = chain_id or self.chain_id
+        cursor = CalculationAuditLog.get_motor_collection().find(
+            {"audit_chain_id": chain_id}
+        ).sort([("batch_sequence", 1), ("batch_index", 1)])
+        entries = await cursor.to_list(length=None)
+        return {"chain_id": chain_id, **verify_batches(entries)}
+    
+    async def verify_all_chains(self) -> List[Dict[str, Any]]:
+        """Verify every stored chain (one per process that wrote entries)."""
+        chain_ids = await CalculationAuditLog.get_motor_collection().distinct(
+            "audit_chain_id", {"audit_chain_id": {"$ne": None}}
+        )
+        return [await self.verify_chain(chain_id) for chain_id in sorted(chain_ids)]
+
+
+# Service instance factory
+_audit_sink: Optional[AuditLogSink] = None
+
+
+def get_audit_sink() -> AuditLogSink:
+    """Get or create the audit log sink."""
+    global _audit_sink
+    if _audit_sink is None:
+        _audit_sink = AuditLogSink()
+    return _audit_sink
@@ -0,0 +1,155 @@
+"""
+PICAM Historical Backfill
+
+Imports CSV or Parquet exports of operational data (PMS/POS exports when
+onboarding a hotel) through the bulk ingestion path.
+
+Files are read in chunks of rows with pandas (CSV) or pyarrow (Parquet),
+each chunk is validated and converted column-wise, inserted with one
+unordered insert_many and folded into the rollups before the next chunk
+is read, so millions of rows import in constant memory.
+
+Columns use the OperationalDataInput field names; rename maps export
+column names onto them. Parquet support needs pyarrow, which is
+optional.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import asdict
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, Optional, Union
+
+import pandas as pd
+
+from app.services.bulk_ingestion import RecordBatch
+from app.services.data_ingestion import get_ingestion_service
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logger.warning("pyarrow not available - Parquet backfill disabled")
+
+FILE_FORMATS = ("csv", "parquet")
+
+# Read as text so IDs like "0042" keep their leading zeros
+_TEXT_COLUMNS = ("location_id", "location_type")
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """File format from a file name's extension, if known."""
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension in ("parquet", "pq"):
+        return "parquet"
+    if extension in ("csv", "txt"):
+        return "csv"
+    return None
+
+
+def _read_chunks(
+    source: Union[str, BinaryIO],
+    file_format: str,
+    chunk_size: int,
+    rename: Dict[str, str]
+) -> Iterator[pd.DataFrame]:
+    if file_format == "csv":
+        text = {
+            column: str for column in _TEXT_COLUMNS + tuple(
+                export for export, name in rename.items() if name in _TEXT_COLUMNS
+            )
+        }
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=text)
+    elif file_format == "parquet":
+        if not PYARROW_AVAILABLE:
+            raise ValueError("Parquet import requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file format '{file_format}'")
+
+
+async def iter_file_batches(
+    source: Union[str, BinaryIO],
+    file_format: str,
+    chunk_size: int,
+    rename: Optional[Dict[str, str]] = None
+) -> AsyncIterator[RecordBatch]:
+    """
+    Record batches of a CSV or Parquet file, chunk_size rows each.
+    
+    File reads and parsing run in a worker thread. Record numbers are
+    data row positions (0 = first row after any CSV header).
+    """
+    chunks = _read_chunks(source, file_format, chunk_size, rename or {})
+    first_record = 0
+    while True:
+        frame = await asyncio.to_thread(next, chunks, None)
+        if frame is None:
+            break
+        if rename:
+            frame = frame.rename(columns=rename)
+        size = len(frame)
+        yield RecordBatch(
+            first_record=first_record,
+            rows=frame,
+            record_numbers=list(range(first_record, first_record + size)),
+            size=size
+        )
+        first_record += size
+
+
+async def backfill_file(
+    source: Union[str, BinaryIO],
+    file_format: str,
+    data_source: str = "backfill",
+    chunk_size: Optional[int] = None,
+    rename: Optional[Dict[str, str]] = None,
+    idempotent: bool = False
+) -> Dict[str, Any]:
+    """
+    Import a CSV or Parquet file of operational data.
+    
+    Args:
+        source: File path or binary file object
+        file_format: "csv" or "parquet"
+        data_source: data_source stored on every imported point
+        chunk_size: Rows per chunk (default BULK_INSERT_CHUNK_SIZE)
+        rename: Export column name -> OperationalDataInput field name
+        idempotent: Upsert, so re-running an interrupted import is safe
+    
+    Returns:
+        Summary with totals and per-chunk reports
+    
+    Raises:
+        ValueError: Unsupported format, pyarrow missing for Parquet, or
+            idempotent with time-series storage
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unsupported file format '{file_format}'")
+    if file_format == "parquet" and not PYARROW_AVAILABLE:
+        raise ValueError("Parquet import requires pyarrow (pip install pyarrow)")
+    
+    service = get_ingestion_service()
+    chunk_size = chunk_size or service.settings.bulk_insert_chunk_size
+    
+    result = await service.ingest_batches(
+        iter_file_batches(source, file_format, chunk_size, rename),
+        source=data_source,
+        operation="backfill",
+        idempotent=idempotent
+    )
+    
+    return {
+        "success": result.success,
+        "format": file_format,
+        "records_processed": result.records_processed,
+        "records_failed": result.records_failed,
+        "inserted": result.inserted,
+        "matched": result.matched,
+        "errors": result.errors,
+        "chunks": [asdict(chunk) for chunk in result.chunks]
+    }
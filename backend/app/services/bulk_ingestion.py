@@ -0,0 +1,355 @@
+"""
+PICAM Bulk Ingestion
+
+Column-wise preparation of large row sets (sensor gateway replays,
+imports) for raw insert_many, without building a Pydantic input model
+and a Beanie document per row.
+
+prepare_bulk_rows applies the same rules as OperationalDataInput and
+DataIngestionService (non-negative integer counts, non-negative
+durations, observation period within bounds, known location type) to
+whole columns at once, and computes arrival/departure rates and
+confidence scores as arrays. Rows that fail are reported with their
+record number; the rest become documents in the stored
+OperationalDataPoint shape.
+
+iter_record_batches parses an NDJSON or CSV request body incrementally
+into bounded batches of rows, so uploads of any size are ingested with
+memory proportional to one batch.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Dict, List, Mapping, Optional, Sequence, Union
+)
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+from app.models.domain import LocationType
+from app.models.mongodb_models import IDEMPOTENCY_KEY
+
+COUNT_COLUMNS = ("arrival_count", "departure_count", "queue_length", "in_service_count")
+
+# Input column -> stored field
+DURATION_COLUMNS = {
+    "avg_service_duration_seconds": "avg_service_duration",
+    "avg_wait_time_seconds": "avg_wait_time"
+}
+
+_LOCATION_TYPES = [t.value for t in LocationType]
+_MAX_LOCATION_ID_LENGTH = 100
+
+STREAM_FORMATS = ("ndjson", "csv")
+MAX_LINE_BYTES = 64 * 1024
+
+
+@dataclass
+class PreparedRows:
+    """Documents ready for insert_many plus the rows that were rejected."""
+    documents: List[Dict[str, Any]]
+    record_numbers: np.ndarray  # input row number of each document
+    errors: List[str]
+
+
+@dataclass
+class ChunkReport:
+    """Outcome of one insert_many (or idempotent bulk_write) chunk."""
+    chunk: int
+    first_record: int
+    last_record: int
+    submitted: int
+    inserted: int = 0
+    matched: int = 0  # idempotent mode: already stored, left unchanged
+    errors: List[str] = field(default_factory=list)
+    
+    @property
+    def failed(self) -> int:
+        return self.submitted - self.inserted - self.matched
+
+
+@dataclass
+class RecordBatch:
+    """A bounded run of consecutive records (parsed rows or a DataFrame)."""
+    first_record: int
+    rows: Union[List[Dict[str, Any]], pd.DataFrame] = field(default_factory=list)
+    record_numbers: List[int] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    size: int = 0
+    
+    @property
+    def last_record(self) -> int:
+        return self.first_record + self.size - 1
+
+
+def to_frame(rows: Union[pd.DataFrame, Sequence[Mapping[str, Any]]]) -> pd.DataFrame:
+    """Input rows as a DataFrame with a 0..n-1 index (= record numbers)."""
+    if isinstance(rows, pd.DataFrame):
+        return rows.reset_index(drop=True)
+    return pd.DataFrame.from_records(list(rows))
+
+
+class _RowChecks:
+    """First failure reason per row."""
+    
+    def __init__(self, size: int):
+        self.reasons = np.full(size, None, dtype=object)
+    
+    def fail(self, mask: np.ndarray, reason: str) -> None:
+        mask = np.asarray(mask, dtype=bool) & (self.reasons == None)  # noqa: E711
+        self.reasons[mask] = reason
+    
+    @property
+    def valid(self) -> np.ndarray:
+        return self.reasons == None  # noqa: E711
+
+
+def _column(frame: pd.DataFrame, name: str) -> pd.Series:
+    if name in frame:
+        return frame[name]
+    return pd.Series(np.nan, index=frame.index, dtype=object)
+
+
+def _numeric(
+    frame: pd.DataFrame,
+    name: str,
+    checks: _RowChecks
+) -> pd.Series:
+    """Column as float; values that are present but not numbers fail the row."""
+    raw = _column(frame, name)
+    values = pd.to_numeric(raw, errors="coerce").astype(np.float64)
+    checks.fail(values.isna() & raw.notna(), f"{name} is not a number")
+    return values
+
+
+def prepare_bulk_rows(
+    frame: pd.DataFrame,
+    source: str,
+    created_at: datetime,
+    min_observation_period: float = 60,
+    max_observation_period: float = 3600,
+    record_numbers: Optional[Sequence[int]] = None
+) -> PreparedRows:
+    """
+    Validate input rows column by column and build raw documents.
+    
+    Missing counts default to 0, missing observation periods to 300 s
+    and missing durations to None, as in OperationalDataInput. Stored
+    timestamps are naive UTC (naive input is taken as UTC) and dates are
+    midnight datetimes, the same BSON Beanie writes.
+    
+    record_numbers gives the number reported for each input row
+    (default: its position).
+    """
+    checks = _RowChecks(len(frame))
+    numbers = (
+        np.arange(len(frame)) if record_numbers is None
+        else np.asarray(record_numbers, dtype=np.int64)
+    )
+    
+    timestamps = pd.to_datetime(
+        _column(frame, "timestamp"), utc=True, errors="coerce", format="ISO8601"
+    )
+    checks.fail(timestamps.isna(), "Invalid timestamp")
+    
+    location_ids = _column(frame, "location_id").astype(object)
+    id_lengths = location_ids.map(lambda v: len(v) if isinstance(v, str) else 0)
+    checks.fail(
+        (id_lengths < 1) | (id_lengths > _MAX_LOCATION_ID_LENGTH),
+        "Invalid location_id"
+    )
+    
+    location_types = _column(frame, "location_type").astype(object)
+    checks.fail(~location_types.isin(_LOCATION_TYPES), "Invalid location_type")
+    
+    counts = {}
+    for name in COUNT_COLUMNS:
+        values = _numeric(frame, name, checks).fillna(0)
+        checks.fail((values < 0) | (values % 1 != 0), f"{name} must be a non-negative integer")
+        counts[name] = values
+    
+    durations = {}
+    for name, stored in DURATION_COLUMNS.items():
+        values = _numeric(frame, name, checks)
+        checks.fail(values < 0, f"{name} must be non-negative")
+        durations[stored] = values
+    
+    periods = _numeric(frame, "observation_period_seconds", checks).fillna(300)
+    checks.fail(
+        (periods < min_observation_period) | (periods > max_observation_period),
+        "Invalid observation period"
+    )
+    
+    valid = checks.valid
+    errors = [
+        f"Record {numbers[i]}: {checks.reasons[i]}" for i in np.flatnonzero(~valid)
+    ]
+    if not valid.any():
+        return PreparedRows([], numbers[valid], errors)
+    
+    # Derived columns, computed on the valid rows only
+    period = periods.to_numpy()[valid]
+    arrivals = counts["arrival_count"].to_numpy()[valid]
+    departures = counts["departure_count"].to_numpy()[valid]
+    service = durations["avg_service_duration"].to_numpy()[valid]
+    wait = durations["avg_wait_time"].to_numpy()[valid]
+    
+    confidence = (
+        1.0
+        - 0.1 * np.isnan(service)
+        - 0.1 * np.isnan(wait)
+        - 0.2 * (departures > arrivals * 2)
+    ).clip(min=0.0)
+    
+    utc = timestamps[valid].dt.tz_localize(None)
+    columns = {
+        "timestamp": utc.to_numpy(dtype="datetime64[us]").astype(object),
+        "date": utc.dt.normalize().to_numpy(dtype="datetime64[us]").astype(object),
+        "location_id": location_ids.to_numpy()[valid],
+        "location_type": location_types.to_numpy()[valid],
+        **{name: values.to_numpy()[valid].astype(np.int64).tolist() for name, values in counts.items()},
+        "avg_service_duration": np.where(np.isnan(service), None, service),
+        "avg_wait_time": np.where(np.isnan(wait), None, wait),
+        "observation_period_seconds": period,
+        "arrival_rate": arrivals / period,
+        "departure_rate": departures / period,
+        "confidence_score": confidence
+    }
+    columns = {
+        name: values if isinstance(values, list) else values.tolist()
+        for name, values in columns.items()
+    }
+    
+    names = list(columns)
+    documents = [
+        {**dict(zip(names, row)), "data_source": source, "created_at": created_at}
+        for row in zip(*columns.values())
+    ]
+    return PreparedRows(documents, numbers[valid], errors)
+
+
+def upsert_operation(document: Dict[str, Any]) -> UpdateOne:
+    """
+    Idempotent write of a prepared document.
+    
+    Inserts the point unless one with the same IDEMPOTENCY_KEY exists;
+    an existing point is never changed ($setOnInsert only).
+    """
+    return UpdateOne(
+        {name: document[name] for name in IDEMPOTENCY_KEY},
+        {"$setOnInsert": document},
+        upsert=True
+    )
+
+
+class _LineError(str):
+    """A line that could not be read (stands in for the record)."""
+
+
+_LINE_TOO_LONG = _LineError(f"line longer than {MAX_LINE_BYTES} bytes")
+
+
+def _decode(line: bytes) -> str:
+    if len(line) > MAX_LINE_BYTES:
+        return _LINE_TOO_LONG
+    try:
+        return bytes(line).decode("utf-8").rstrip("\r").lstrip("\ufeff")
+    except UnicodeDecodeError:
+        return _LineError("not valid UTF-8")
+
+
+async def _iter_lines(body: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Lines of a byte stream; overlong lines are dropped as _LineError."""
+    pending = bytearray()
+    overflow = False
+    async for chunk in body:
+        pending.extend(chunk)
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end < 0:
+                break
+            line = pending[start:end]
+            start = end + 1
+            if overflow:
+                overflow = False
+                yield _LINE_TOO_LONG
+            else:
+                yield _decode(line)
+        del pending[:start]
+        if len(pending) > MAX_LINE_BYTES:
+            # Keep reading to the end of the line without buffering it
+            overflow = True
+            pending.clear()
+    if overflow:
+        yield _LINE_TOO_LONG
+    elif pending:
+        yield _decode(pending)
+
+
+def _parse_ndjson(line: str) -> Dict[str, Any]:
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON ({e.msg})")
+    if not isinstance(row, dict):
+        raise ValueError("not a JSON object")
+    return row
+
+
+def _parse_csv(line: str, header: List[str]) -> Dict[str, Any]:
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} fields, got {len(values)}")
+    # Empty cells are missing values, as absent JSON keys
+    return {name: value for name, value in zip(header, values) if value != ""}
+
+
+async def iter_record_batches(
+    body: AsyncIterable[bytes],
+    data_format: str,
+    batch_size: int
+) -> AsyncIterator[RecordBatch]:
+    """
+    Parse an NDJSON or CSV byte stream into batches of batch_size records.
+    
+    One record per line; blank lines are skipped and a CSV body starts
+    with a header line. Records that cannot be parsed keep their record
+    number and are reported in the batch's errors. Raises ValueError for
+    an unknown format or an unreadable CSV header.
+    """
+    if data_format not in STREAM_FORMATS:
+        raise ValueError(f"Unsupported format '{data_format}'")
+    
+    header: Optional[List[str]] = None
+    batch = RecordBatch(first_record=0)
+    async for line in _iter_lines(body):
+        if not isinstance(line, _LineError) and not line.strip():
+            continue
+        if data_format == "csv" and header is None:
+            if isinstance(line, _LineError):
+                raise ValueError(f"Unreadable CSV header: {line}")
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+        
+        number = batch.first_record + batch.size
+        batch.size += 1
+        try:
+            if isinstance(line, _LineError):
+                raise ValueError(line)
+            row = _parse_csv(line, header) if header is not None else _parse_ndjson(line)
+            batch.rows.append(row)
+            batch.record_numbers.append(number)
+        except ValueError as e:
+            batch.errors.append(f"Record {number}: {e}")
+        
+        if batch.size == batch_size:
+            yield batch
+            batch = RecordBatch(first_record=number + 1)
+    
+    if batch.size:
+        yield batch
@@ -13,22 +13,48 @@ No personal data, no individual tracking.
 
 import logging
 from datetime import datetime, date, timedelta
-from typing import List, Optional, Dict, Any, Tuple
-from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Tuple, Sequence, Mapping, Union, AsyncIterable
+from dataclasses import dataclass, field
 import asyncio
 
+import pandas as pd
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
 from app.models.mongodb_models import (
     OperationalDataPoint,
     CalculationAuditLog,
-    SystemConfiguration
+    SystemConfiguration,
+    DUPLICATE_KEY
 )
 from app.models.domain import FlowMeasurement, LocationType
 from app.models.schemas import OperationalDataInput, BatchOperationalDataInput
+from app.core.flow_series import FlowSeries
+from app.services.flow_repository import get_flow_repository
+from app.services.live_metrics import get_live_metrics_registry
+from app.services.rollups import get_rollup_service
+from app.services.location_registry import get_location_registry
+from app.services.audit_sink import get_audit_sink
+from app.services.data_quality import quality_pipeline, summarize_quality
+from app.services.query_plans import get_query_plan_recorder
+from app.services.ingest_queue import get_ingest_batcher, mark_insights_stale
+from app.services.bulk_ingestion import (
+    ChunkReport,
+    RecordBatch,
+    iter_record_batches,
+    prepare_bulk_rows,
+    to_frame,
+    upsert_operation
+)
 from app.utils import now_utc, to_utc, create_deterministic_hash, get_date_range
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Error messages kept in a streamed upload's result, in total and per chunk
+MAX_STREAM_ERRORS = 100
+MAX_CHUNK_ERRORS = 10
+
 
 @dataclass
 class IngestionResult:
@@ -40,6 +66,25 @@ class IngestionResult:
     data_point_ids: List[str]
 
 
+@dataclass
+class BulkIngestionResult(IngestionResult):
+    """
+    Result of a bulk ingestion, with the outcome of every insert chunk.
+    
+    records_processed counts accepted records: newly inserted plus, in
+    idempotent mode, those matched as already stored.
+    """
+    chunks: List[ChunkReport] = field(default_factory=list)
+    
+    @property
+    def inserted(self) -> int:
+        return sum(c.inserted for c in self.chunks)
+    
+    @property
+    def matched(self) -> int:
+        return sum(c.matched for c in self.chunks)
+
+
 @dataclass
 class DataQualityReport:
     """Report on data quality for a period."""
@@ -49,6 +94,10 @@ class DataQualityReport:
     completeness_score: float  # 0-1
     consistency_score: float  # 0-1
     issues: List[str]
+    location_days: List[Dict[str, Any]] = field(default_factory=list)
+    gaps: List[Dict[str, Any]] = field(default_factory=list)  # largest first
+    duplicate_timestamps: List[Dict[str, Any]] = field(default_factory=list)
+    consistency_violations: Dict[str, int] = field(default_factory=dict)
 
 
 class DataIngestionService:
@@ -67,6 +116,12 @@ class DataIngestionService:
         self.settings = get_settings()
         self.min_observation_period = 60  # Minimum 1 minute
         self.max_observation_period = 3600  # Maximum 1 hour
+        self.live_metrics = get_live_metrics_registry()
+        self.flow_repository = get_flow_repository()
+        self.rollups = get_rollup_service()
+        self.locations = get_location_registry()
+        self.audit_sink = get_audit_sink()
+        self.ingest_batcher = get_ingest_batcher()
     
     async def ingest_single(
         self,
@@ -118,7 +173,8 @@ class DataIngestionService:
                 created_at=now_utc()
             )
             
-            await doc.insert()
+            # Micro-batched insert; returns once the batch has committed
+            await self.ingest_batcher.submit(doc)
             
             # Create audit log
             await self._create_audit_log(
@@ -151,7 +207,8 @@ class DataIngestionService:
     async def ingest_batch(
         self,
         data: BatchOperationalDataInput,
-        source: str = "api_batch"
+        source: str = "api_batch",
+        idempotent: bool = False
     ) -> IngestionResult:
         """
         Ingest multiple operational data points in batch.
@@ -159,11 +216,21 @@ class DataIngestionService:
         Args:
             data: Batch of validated input data
             source: Data source identifier
+            idempotent: Upsert through ingest_bulk so a retried batch
+                stores nothing twice
             
         Returns:
             IngestionResult with status and IDs
         """
+        if idempotent:
+            return await self.ingest_bulk(
+                [dp.model_dump(mode="json") for dp in data.data_points],
+                source=source,
+                idempotent=True
+            )
+        
         docs = []
+        records = []  # input record number of each document
         errors = []
         
         for i, dp in enumerate(data.data_points):
@@ -194,13 +261,45 @@ class DataIngestionService:
                     created_at=now_utc()
                 )
                 docs.append(doc)
+                records.append(i)
                 
             except Exception as e:
                 errors.append(f"Record {i}: {str(e)}")
         
         if docs:
+            # Ids are assigned up front so a partly failed unordered insert
+            # still identifies the stored documents (e.g. a retried batch
+            # rejected on the idempotency index for its earlier points)
+            for doc in docs:
+                doc.id = PydanticObjectId()
+            failed: Dict[int, str] = {}
             try:
-                await OperationalDataPoint.insert_many(docs)
+                await OperationalDataPoint.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                failed = {
+                    error["index"]: error.get("errmsg", "write error")
+                    for error in e.details.get("writeErrors", [])
+                }
+            except Exception as e:
+                errors.append(f"Batch insert failed: {str(e)}")
+                return IngestionResult(
+                    success=False,
+                    records_processed=0,
+                    records_failed=len(data.data_points),
+                    errors=errors,
+                    data_point_ids=[]
+                )
+            
+            for index, message in sorted(failed.items()):
+                errors.append(f"Record {records[index]}: {message}")
+            docs = [doc for index, doc in enumerate(docs) if index not in failed]
+        
+        if docs:
+            try:
+                self.live_metrics.record_many(docs)
+                await self.rollups.record_many(docs)
+                await self.locations.observe(docs)
+                await mark_insights_stale(doc.date for doc in docs)
                 
                 # Create audit log for batch
                 await self._create_audit_log(
@@ -213,14 +312,8 @@ class DataIngestionService:
                 logger.info(f"Batch ingested {len(docs)} records")
                 
             except Exception as e:
-                errors.append(f"Batch insert failed: {str(e)}")
-                return IngestionResult(
-                    success=False,
-                    records_processed=0,
-                    records_failed=len(data.data_points),
-                    errors=errors,
-                    data_point_ids=[]
-                )
+                # The points are stored; only derived state lags behind
+                logger.error(f"Batch post-insert update failed: {e}")
         
         return IngestionResult(
             success=len(errors) == 0,
@@ -230,6 +323,263 @@ class DataIngestionService:
             data_point_ids=[str(doc.id) for doc in docs]
         )
     
+    async def ingest_bulk(
+        self,
+        rows: Union[pd.DataFrame, Sequence[Mapping[str, Any]]],
+        source: str = "bulk",
+        chunk_size: Optional[int] = None,
+        idempotent: bool = False
+    ) -> BulkIngestionResult:
+        """
+        Ingest a large row set without per-row model construction.
+        
+        Rows use the OperationalDataInput field names. They are validated
+        and converted column-wise, then written with unordered raw
+        insert_many calls of chunk_size documents (default
+        BULK_INSERT_CHUNK_SIZE). A failing chunk or document does not stop
+        the others; failures are reported per chunk with record numbers.
+        
+        With idempotent=True each document is upserted on IDEMPOTENCY_KEY
+        instead, so replaying a batch (client retry, re-run backfill)
+        stores nothing twice; replayed points are counted as matched.
+        
+        Args:
+            rows: DataFrame or sequence of row mappings
+            source: Data source identifier
+            chunk_size: Documents per insert_many
+            idempotent: Upsert instead of insert
+            
+        Returns:
+            BulkIngestionResult with per-chunk reports
+            
+        Raises:
+            ValueError: idempotent with time-series storage
+        """
+        self._check_idempotent(idempotent)
+        chunk_size = chunk_size or self.settings.bulk_insert_chunk_size
+        prepared = prepare_bulk_rows(
+            to_frame(rows),
+            source=source,
+            created_at=now_utc(),
+            min_observation_period=self.min_observation_period,
+            max_observation_period=self.max_observation_period
+        )
+        documents, record_numbers = prepared.documents, prepared.record_numbers
+        
+        chunks: List[ChunkReport] = []
+        stored_ids: List[str] = []
+        
+        for number, start in enumerate(range(0, len(documents), chunk_size)):
+            report, stored = await self._insert_chunk(
+                number,
+                documents[start:start + chunk_size],
+                record_numbers[start:start + chunk_size],
+                idempotent=idempotent
+            )
+            chunks.append(report)
+            stored_ids.extend(str(doc["_id"]) for doc in stored)
+        
+        errors = prepared.errors + [e for report in chunks for e in report.errors]
+        failed = len(prepared.errors) + sum(r.failed for r in chunks)
+        accepted = sum(r.inserted + r.matched for r in chunks)
+        
+        if stored_ids:
+            await self._create_audit_log(
+                operation="ingest_bulk",
+                data_point_id=f"bulk_{len(stored_ids)}",
+                location_id="multiple",
+                source=source
+            )
+        logger.info(
+            f"Bulk ingested {len(stored_ids)} records in {len(chunks)} chunks "
+            f"({failed} failed)"
+        )
+        
+        return BulkIngestionResult(
+            success=failed == 0,
+            records_processed=accepted,
+            records_failed=failed,
+            errors=errors,
+            data_point_ids=stored_ids,
+            chunks=chunks
+        )
+    
+    async def ingest_stream(
+        self,
+        body: AsyncIterable[bytes],
+        data_format: str,
+        source: str = "stream",
+        chunk_size: Optional[int] = None,
+        idempotent: bool = False
+    ) -> BulkIngestionResult:
+        """
+        Ingest an NDJSON or CSV upload as it arrives.
+        
+        The body is parsed into batches of chunk_size records and passed
+        to ingest_batches, so memory use is bounded by one batch and a
+        slow database slows the upload instead of buffering it.
+        
+        Raises:
+            ValueError: Unknown format, unreadable CSV header, or
+                idempotent with time-series storage
+        """
+        self._check_idempotent(idempotent)
+        chunk_size = chunk_size or self.settings.bulk_insert_chunk_size
+        return await self.ingest_batches(
+            iter_record_batches(body, data_format, chunk_size),
+            source=source,
+            operation="ingest_stream",
+            idempotent=idempotent
+        )
+    
+    async def ingest_batches(
+        self,
+        batches: AsyncIterable[RecordBatch],
+        source: str,
+        operation: str = "ingest_batches",
+        idempotent: bool = False
+    ) -> BulkIngestionResult:
+        """
+        Ingest record batches one insert chunk at a time.
+        
+        Each batch is validated and inserted before the next is pulled;
+        callers bound the batch size. Returns a summary per batch;
+        inserted ids are not collected and at most MAX_STREAM_ERRORS
+        error messages (MAX_CHUNK_ERRORS per chunk) are kept;
+        records_failed counts all failures. idempotent as in ingest_bulk.
+        """
+        self._check_idempotent(idempotent)
+        created_at = now_utc()
+        chunks: List[ChunkReport] = []
+        errors: List[str] = []
+        processed = 0
+        failed = 0
+        
+        async for batch in batches:
+            prepared = prepare_bulk_rows(
+                to_frame(batch.rows),
+                source=source,
+                created_at=created_at,
+                min_observation_period=self.min_observation_period,
+                max_observation_period=self.max_observation_period,
+                record_numbers=batch.record_numbers
+            )
+            if prepared.documents:
+                report, _ = await self._insert_chunk(
+                    len(chunks), prepared.documents, prepared.record_numbers,
+                    idempotent=idempotent
+                )
+            else:
+                report = ChunkReport(chunk=len(chunks), first_record=0, last_record=0, submitted=0)
+            
+            # Report the batch as the span of records read, parse and
+            # validation rejects included
+            report.first_record = batch.first_record
+            report.last_record = batch.last_record
+            report.submitted = batch.size
+            report.errors = batch.errors + prepared.errors + report.errors
+            
+            chunks.append(report)
+            processed += report.inserted + report.matched
+            failed += report.failed
+            errors.extend(report.errors[:MAX_STREAM_ERRORS - len(errors)])
+            report.errors = report.errors[:MAX_CHUNK_ERRORS]
+        
+        if processed:
+            await self._create_audit_log(
+                operation=operation,
+                data_point_id=f"{operation}_{processed}",
+                location_id="multiple",
+                source=source
+            )
+        logger.info(
+            f"{operation}: ingested {processed} records in {len(chunks)} chunks "
+            f"({failed} failed)"
+        )
+        
+        return BulkIngestionResult(
+            success=failed == 0,
+            records_processed=processed,
+            records_failed=failed,
+            errors=errors,
+            data_point_ids=[],
+            chunks=chunks
+        )
+    
+    def _check_idempotent(self, idempotent: bool) -> None:
+        if idempotent and self.settings.use_timeseries_collection:
+            raise ValueError(
+                "Idempotent ingestion needs the unique idempotency index, which "
+                "time-series collections do not support"
+            )
+    
+    async def _insert_chunk(
+        self,
+        number: int,
+        chunk: List[Dict[str, Any]],
+        records: Sequence[int],
+        idempotent: bool = False
+    ) -> Tuple[ChunkReport, List[Dict[str, Any]]]:
+        """
+        Write one chunk of raw documents.
+        
+        Plain mode inserts with an unordered insert_many. Idempotent mode
+        sends an unordered bulk_write of $setOnInsert upserts keyed on
+        IDEMPOTENCY_KEY, so points already stored are matched and left
+        unchanged. Only newly stored documents update live metrics,
+        rollups and the location registry and mark their day's insight
+        stale. Returns the chunk report and the newly stored documents.
+        """
+        report = ChunkReport(
+            chunk=number,
+            first_record=int(records[0]),
+            last_record=int(records[-1]),
+            submitted=len(chunk)
+        )
+        collection = OperationalDataPoint.get_motor_collection()
+        upserted: Dict[int, Any] = {}
+        write_errors: List[Dict[str, Any]] = []
+        try:
+            if idempotent:
+                result = await collection.bulk_write(
+                    [upsert_operation(doc) for doc in chunk], ordered=False
+                )
+                upserted = result.upserted_ids
+                report.matched = result.matched_count
+            else:
+                await collection.insert_many(chunk, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+            report.matched = e.details.get("nMatched", 0)
+        except Exception as e:
+            report.errors = [f"Chunk {number} insert failed: {str(e)}"]
+            return report, []
+        
+        failed = set()
+        for error in write_errors:
+            if idempotent and error.get("code") == DUPLICATE_KEY:
+                # A concurrent replay stored the same point first
+                report.matched += 1
+                continue
+            failed.add(error["index"])
+            report.errors.append(
+                f"Record {records[error['index']]}: {error.get('errmsg', 'write error')}"
+            )
+        
+        if idempotent:
+            stored = [dict(chunk[index], _id=_id) for index, _id in sorted(upserted.items())]
+        else:
+            stored = [doc for index, doc in enumerate(chunk) if index not in failed]
+        
+        report.inserted = len(stored)
+        if stored:
+            self.live_metrics.record_documents(stored)
+            await self.rollups.record_points(stored)
+            await self.locations.observe(stored)
+            await mark_insights_stale(doc["date"] for doc in stored)
+        return report, stored
+    
     async def ingest_from_video_count(
         self,
         location_id: str,
@@ -264,7 +614,7 @@ class DataIngestionService:
                 created_at=now_utc()
             )
             
-            await doc.insert()
+            await self.ingest_batcher.submit(doc)
             
             return IngestionResult(
                 success=True,
@@ -297,64 +647,30 @@ class DataIngestionService:
             location_id: Optional location filter
             
         Returns:
-            List of FlowMeasurement domain objects
+            List of FlowMeasurement domain objects, ordered by timestamp
         """
-        query = {"date": target_date}
-        if location_id:
-            query["location_id"] = location_id
-        
-        data_points = await OperationalDataPoint.find(query).sort("timestamp").to_list()
-        
-        measurements = []
-        for dp in data_points:
-            m = FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
-            )
-            measurements.append(m)
+        by_location = await self.flow_repository.fetch_series_by_location(
+            target_date, location_id
+        )
+        
+        measurements = [
+            m for series in by_location.values() for m in series.to_measurements()
+        ]
+        measurements.sort(key=lambda m: m.timestamp)
         
         return measurements
     
     async def get_data_grouped_by_location(
         self,
         target_date: date
-    ) -> Dict[str, List[FlowMeasurement]]:
+    ) -> Dict[str, FlowSeries]:
         """
         Retrieve data grouped by location for daily analysis.
-        """
-        data_points = await OperationalDataPoint.find(
-            {"date": target_date}
-        ).sort("timestamp").to_list()
-        
-        grouped: Dict[str, List[FlowMeasurement]] = {}
-        
-        for dp in data_points:
-            m = FlowMeasurement(
-                timestamp=dp.timestamp,
-                location_id=dp.location_id,
-                location_type=LocationType(dp.location_type),
-                arrival_count=dp.arrival_count,
-                departure_count=dp.departure_count,
-                queue_length=dp.queue_length,
-                in_service_count=dp.in_service_count,
-                avg_service_duration=dp.avg_service_duration,
-                avg_wait_time=dp.avg_wait_time,
-                observation_period_seconds=dp.observation_period_seconds
-            )
-            
-            if dp.location_id not in grouped:
-                grouped[dp.location_id] = []
-            grouped[dp.location_id].append(m)
         
-        return grouped
+        Read through the projection-only repository, so each location
+        comes back as a column-backed FlowSeries.
+        """
+        return await self.flow_repository.fetch_series_by_location(target_date)
     
     async def check_data_quality(
         self,
@@ -364,16 +680,17 @@ class DataIngestionService:
     ) -> DataQualityReport:
         """
         Generate data quality report for a period.
-        """
-        query = {
-            "date": {"$gte": start_date, "$lte": end_date}
-        }
-        if location_id:
-            query["location_id"] = location_id
         
-        data_points = await OperationalDataPoint.find(query).to_list()
+        Runs the data_quality scan aggregation: counts, per-location-day
+        completeness, gaps, duplicate timestamps and consistency
+        violations are computed server-side, no points are transferred.
+        """
+        pipeline = quality_pipeline(start_date, end_date, location_id)
+        collection = OperationalDataPoint.get_motor_collection()
+        await get_query_plan_recorder().record_aggregate("data_quality.scan", collection, pipeline)
+        facets = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
         
-        if not data_points:
+        if not facets or not facets[0]["days"]:
             return DataQualityReport(
                 start_date=start_date,
                 end_date=end_date,
@@ -383,43 +700,38 @@ class DataIngestionService:
                 issues=["No data found for period"]
             )
         
+        scan = summarize_quality(facets[0], start_date, end_date)
         issues = []
         
-        # Check completeness
-        days = (end_date - start_date).days + 1
-        expected_records_per_day = 288  # 5-min intervals
-        expected_total = days * expected_records_per_day
-        completeness = min(1.0, len(data_points) / expected_total)
-        
-        if completeness < 0.5:
-            issues.append(f"Low data completeness: {completeness:.1%}")
-        
-        # Check consistency
-        consistency_issues = 0
-        for dp in data_points:
-            # Check for logical issues
-            if dp.departure_count > dp.arrival_count * 2:
-                consistency_issues += 1
-            if dp.queue_length < 0 or dp.in_service_count < 0:
-                consistency_issues += 1
+        if scan.completeness < 0.5:
+            issues.append(f"Low data completeness: {scan.completeness:.1%}")
         
-        consistency = 1.0 - (consistency_issues / len(data_points))
+        consistency_issues = sum(scan.violations.values())
+        consistency = 1.0 - (consistency_issues / scan.total_records)
         
         if consistency < 0.9:
             issues.append(f"Data consistency issues found: {consistency_issues} records")
+        if scan.gaps:
+            issues.append(f"{len(scan.gaps)} gaps of one or more missing intervals")
+        if scan.total_duplicates:
+            issues.append(f"{scan.total_duplicates} duplicate records (same location and timestamp)")
         
         return DataQualityReport(
             start_date=start_date,
             end_date=end_date,
-            total_records=len(data_points),
-            completeness_score=round(completeness, 4),
+            total_records=scan.total_records,
+            completeness_score=round(scan.completeness, 4),
             consistency_score=round(consistency, 4),
-            issues=issues
+            issues=issues,
+            location_days=scan.location_days,
+            gaps=scan.gaps,
+            duplicate_timestamps=scan.duplicates,
+            consistency_violations=scan.violations
         )
     
     async def get_locations(self) -> List[str]:
-        """Get all unique location IDs."""
-        return await OperationalDataPoint.distinct("location_id")
+        """Get all unique location IDs (from the location registry cache)."""
+        return await self.locations.location_ids()
     
     async def get_date_range_with_data(self) -> Tuple[Optional[date], Optional[date]]:
         """Get the date range that has data."""
@@ -467,7 +779,12 @@ class DataIngestionService:
         location_id: str,
         source: str
     ) -> None:
-        """Create audit log entry for data operation."""
+        """
+        Queue an audit log entry for a data operation.
+        
+        Entries are group-committed by the audit sink, so this costs no
+        extra database round trip on the ingest path.
+        """
         try:
             log_entry = CalculationAuditLog(
                 calculation_id=f"ingest_{data_point_id}",
@@ -491,7 +808,7 @@ class DataIngestionService:
                 is_deterministic=True,
                 is_reproducible=True
             )
-            await log_entry.insert()
+            await self.audit_sink.submit(log_entry)
         except Exception as e:
             logger.warning(f"Failed to create audit log: {e}")
 
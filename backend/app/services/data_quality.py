@@ -0,0 +1,222 @@
+"""
+PICAM Data Quality Scanner
+
+Data quality of operational data computed inside MongoDB. One
+aggregation with a $facet over the matched points returns:
+
+- days: per location and day, records, distinct intervals, seconds
+  covered by observation periods and consistency violations
+- duplicates: (location, timestamp) pairs stored more than once
+- gaps: missing intervals between consecutive points of a location,
+  found with $setWindowFields / $shift
+
+Only these summaries leave the server; summarize_quality turns them into
+per-location-day completeness (covered seconds / seconds in the day, so
+any observation period and any number of locations is handled) and adds
+the gaps before a location's first and after its last point.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.utils import now_utc, to_stored_date, from_stored_date
+
+# Entries kept in the gap and duplicate lists (largest gaps first)
+MAX_LISTED = 100
+
+# Consistency checks: name -> condition on a stored point
+CONSISTENCY_CHECKS = {
+    "departures_exceed_arrivals": {
+        "$gt": ["$departure_count", {"$multiply": [2, "$arrival_count"]}]
+    },
+    "negative_counts": {
+        "$or": [{"$lt": ["$queue_length", 0]}, {"$lt": ["$in_service_count", 0]}]
+    }
+}
+
+
+@dataclass
+class QualityScan:
+    """Summaries of a quality scan, ready for a DataQualityReport."""
+    total_records: int
+    completeness: float
+    violations: Dict[str, int]
+    location_days: List[Dict[str, Any]] = field(default_factory=list)
+    gaps: List[Dict[str, Any]] = field(default_factory=list)
+    duplicates: List[Dict[str, Any]] = field(default_factory=list)
+    total_duplicates: int = 0
+
+
+def quality_pipeline(
+    start_date: date,
+    end_date: date,
+    location_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Aggregation returning one document with the days/duplicates/gaps facets."""
+    match: Dict[str, Any] = {
+        "date": {"$gte": to_stored_date(start_date), "$lte": to_stored_date(end_date)}
+    }
+    if location_id:
+        match["location_id"] = location_id
+    
+    per_timestamp = {"$group": {
+        "_id": {"location_id": "$location_id", "timestamp": "$timestamp"},
+        "date": {"$first": "$date"},
+        "records": {"$sum": 1},
+        "period": {"$max": "$observation_period_seconds"},
+        **{
+            name: {"$sum": {"$cond": [condition, 1, 0]}}
+            for name, condition in CONSISTENCY_CHECKS.items()
+        }
+    }}
+    
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "location_id": 1,
+            "timestamp": 1,
+            "date": 1,
+            "observation_period_seconds": 1,
+            "arrival_count": 1,
+            "departure_count": 1,
+            "queue_length": 1,
+            "in_service_count": 1
+        }},
+        {"$facet": {
+            "days": [
+                per_timestamp,
+                {"$group": {
+                    "_id": {"location_id": "$_id.location_id", "date": "$date"},
+                    "records": {"$sum": "$records"},
+                    "intervals": {"$sum": 1},
+                    "duplicates": {"$sum": {"$subtract": ["$records", 1]}},
+                    "covered_seconds": {"$sum": "$period"},
+                    "first": {"$min": "$_id.timestamp"},
+                    "end": {"$max": {"$add": ["$_id.timestamp", {"$multiply": ["$period", 1000]}]}},
+                    **{name: {"$sum": f"${name}"} for name in CONSISTENCY_CHECKS}
+                }},
+                {"$sort": {"_id.location_id": 1, "_id.date": 1}}
+            ],
+            "duplicates": [
+                per_timestamp,
+                {"$match": {"records": {"$gt": 1}}},
+                {"$sort": {"_id.location_id": 1, "_id.timestamp": 1}},
+                {"$limit": MAX_LISTED},
+                {"$project": {
+                    "_id": 0,
+                    "location_id": "$_id.location_id",
+                    "timestamp": "$_id.timestamp",
+                    "records": 1
+                }}
+            ],
+            "gaps": [
+                {"$setWindowFields": {
+                    "partitionBy": "$location_id",
+                    "sortBy": {"timestamp": 1},
+                    "output": {
+                        "previous": {"$shift": {"output": "$timestamp", "by": -1}},
+                        "period": {"$shift": {"output": "$observation_period_seconds", "by": -1}}
+                    }
+                }},
+                {"$match": {"previous": {"$ne": None}}},
+                {"$project": {
+                    "_id": 0,
+                    "location_id": 1,
+                    "period": 1,
+                    "start": {"$add": ["$previous", {"$multiply": ["$period", 1000]}]},
+                    "end": "$timestamp"
+                }},
+                {"$set": {"missing_seconds": {"$divide": [{"$subtract": ["$end", "$start"]}, 1000]}}},
+                # At least one whole interval missing
+                {"$match": {"$expr": {"$gte": ["$missing_seconds", "$period"]}}},
+                {"$sort": {"missing_seconds": -1}},
+                {"$limit": MAX_LISTED}
+            ]
+        }}
+    ]
+
+
+def _gap(location_id: str, start: datetime, end: datetime, period: float) -> Dict[str, Any]:
+    missing = (end - start).total_seconds()
+    return {
+        "location_id": location_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "missing_seconds": missing,
+        "missing_intervals": round(missing / period) if period else None
+    }
+
+
+def summarize_quality(
+    facets: Dict[str, List[Dict[str, Any]]],
+    start_date: date,
+    end_date: date,
+    now: Optional[datetime] = None
+) -> QualityScan:
+    """
+    Turn the facets of quality_pipeline into a QualityScan.
+    
+    Every location with data in the period gets a row for each day; a
+    day's expected coverage ends at now, so today is judged on the hours
+    elapsed and future days are left out.
+    """
+    now = now or now_utc().replace(tzinfo=None)
+    range_start = to_stored_date(start_date)
+    range_end = min(to_stored_date(end_date) + timedelta(days=1), now)
+    
+    rows = {(r["_id"]["location_id"], from_stored_date(r["_id"]["date"])): r for r in facets["days"]}
+    locations = sorted({location for location, _ in rows})
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    
+    location_days = []
+    completeness_sum = 0.0
+    gaps = []
+    for location in locations:
+        for day in days:
+            day_start = to_stored_date(day)
+            expected = (min(day_start + timedelta(days=1), range_end) - day_start).total_seconds()
+            if expected <= 0:
+                continue
+            row = rows.get((location, day), {})
+            completeness = min(1.0, row.get("covered_seconds", 0) / expected)
+            completeness_sum += completeness
+            location_days.append({
+                "location_id": location,
+                "date": day.isoformat(),
+                "records": row.get("records", 0),
+                "intervals": row.get("intervals", 0),
+                "duplicates": row.get("duplicates", 0),
+                "violations": sum(row.get(name, 0) for name in CONSISTENCY_CHECKS),
+                "completeness": round(completeness, 4)
+            })
+        
+        # Gaps before the first and after the last point in the period
+        stored = [r for (l, _), r in rows.items() if l == location]
+        period = sum(r["covered_seconds"] for r in stored) / sum(r["intervals"] for r in stored)
+        first = min(r["first"] for r in stored)
+        end = max(r["end"] for r in stored)
+        if (first - range_start).total_seconds() >= period:
+            gaps.append(_gap(location, range_start, first, period))
+        if (range_end - end).total_seconds() >= period:
+            gaps.append(_gap(location, end, range_end, period))
+    
+    gaps.extend(
+        _gap(g["location_id"], g["start"], g["end"], g["period"]) for g in facets["gaps"]
+    )
+    gaps.sort(key=lambda g: -g["missing_seconds"])
+    
+    return QualityScan(
+        total_records=sum(r["records"] for r in rows.values()),
+        completeness=completeness_sum / len(location_days) if location_days else 0.0,
+        violations={
+            name: sum(r[name] for r in rows.values()) for name in CONSISTENCY_CHECKS
+        },
+        location_days=location_days,
+        gaps=gaps[:MAX_LISTED],
+        duplicates=[
+            {**d, "timestamp": d["timestamp"].isoformat()} for d in facets["duplicates"]
+        ],
+        total_duplicates=sum(r["duplicates"] for r in rows.values())
+    )
@@ -0,0 +1,316 @@
+"""
+PICAM Flow Data Repository
+
+Read-only access to operational data for the physics calculations.
+
+Analysis only needs a handful of numeric fields per data point, so
+instead of hydrating full Beanie documents (Pydantic validation plus a
+state-management snapshot per document) the repository issues a raw,
+projected Motor query, reads the cursor in batches and copies each batch
+straight into preallocated NumPy columns that become FlowSeries.
+
+Dashboard totals that need no physics are computed by MongoDB
+aggregation pipelines, so only the aggregate rows cross the wire.
+
+Reads follow the (date, location_id, timestamp) index order, so MongoDB
+never sorts in memory; in debug mode every read is also explained into
+the query plan recorder.
+"""
+
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.mongodb_models import OperationalDataPoint
+from app.core.flow_series import FlowSeries
+from app.services.query_plans import get_query_plan_recorder
+from app.utils import to_stored_date
+
+logger = logging.getLogger(__name__)
+
+# Index order of (date, location_id, timestamp) for a day's points
+FLOW_SORT = [("location_id", 1), ("timestamp", 1)]
+
+# Only the fields the physics calculations read
+FLOW_PROJECTION: Dict[str, int] = {
+    "_id": 0,
+    "timestamp": 1,
+    "location_id": 1,
+    "location_type": 1,
+    "arrival_count": 1,
+    "departure_count": 1,
+    "queue_length": 1,
+    "in_service_count": 1,
+    "avg_service_duration": 1,
+    "avg_wait_time": 1,
+    "observation_period_seconds": 1
+}
+
+
+def _measured(field_path: str) -> Dict[str, Any]:
+    """Aggregation expression: the value if positive, else null ($avg/$max skip nulls)."""
+    return {"$cond": [{"$gt": [field_path, 0]}, field_path, None]}
+
+
+# ρ = λ/μ per point, capped at 200% for display; null where μ is not positive
+_UTILIZATION: Dict[str, Any] = {
+    "$cond": [
+        {"$and": [{"$gt": ["$departure_rate", 0]}, {"$isNumber": "$arrival_rate"}]},
+        {"$min": [{"$divide": ["$arrival_rate", "$departure_rate"]}, 2.0]},
+        None
+    ]
+}
+
+_INT_FIELDS = ("arrival_count", "departure_count", "queue_length", "in_service_count")
+_OPTIONAL_FIELDS = ("avg_service_duration", "avg_wait_time")
+
+
+class _FlowColumns:
+    """Growable column buffers filled batch by batch from raw documents."""
+    
+    def __init__(self, capacity: int):
+        self.size = 0
+        self.tz = None
+        self.location_codes: Dict[str, int] = {}
+        self.location_types: Dict[str, str] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self._allocate(capacity)
+    
+    def _allocate(self, capacity: int) -> None:
+        new = {
+            "timestamp": np.empty(capacity, dtype="datetime64[us]"),
+            "location": np.empty(capacity, dtype=np.int64),
+            "observation_period_seconds": np.empty(capacity, dtype=np.float64),
+            **{f: np.empty(capacity, dtype=np.int64) for f in _INT_FIELDS},
+            **{f: np.empty(capacity, dtype=np.float64) for f in _OPTIONAL_FIELDS}
+        }
+        for name, column in self.columns.items():
+            new[name][:self.size] = column[:self.size]
+        self.columns = new
+    
+    def extend(self, docs: List[Dict[str, Any]]) -> None:
+        start, end = self.size, self.size + len(docs)
+        capacity = len(self.columns["timestamp"])
+        if end > capacity:
+            self._allocate(max(end, 2 * capacity))
+        
+        cols = self.columns
+        cols["timestamp"][start:end] = [self._wall_clock(d["timestamp"]) for d in docs]
+        cols["location"][start:end] = [self._location_code(d) for d in docs]
+        cols["observation_period_seconds"][start:end] = [
+            d.get("observation_period_seconds", 300) for d in docs
+        ]
+        for f in _INT_FIELDS:
+            cols[f][start:end] = [d.get(f, 0) for d in docs]
+        for f in _OPTIONAL_FIELDS:
+            # Missing durations are NaN, as FlowSeries expects
+            cols[f][start:end] = [
+                np.nan if d.get(f) is None else d[f] for d in docs
+            ]
+        self.size = end
+    
+    def _wall_clock(self, ts: datetime) -> datetime:
+        # Mongo stores UTC; tz-aware clients return UTC datetimes
+        if ts.tzinfo is not None:
+            self.tz = timezone.utc
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        return ts
+    
+    def _location_code(self, doc: Dict[str, Any]) -> int:
+        location_id = doc["location_id"]
+        code = self.location_codes.get(location_id)
+        if code is None:
+            code = self.location_codes[location_id] = len(self.location_codes)
+            self.location_types[location_id] = doc["location_type"]
+        return code
+    
+    def sort_by_timestamp(self) -> None:
+        """Reorder rows by timestamp; stable, so ties keep location order."""
+        order = np.argsort(self.columns["timestamp"][:self.size], kind="stable")
+        for name, column in self.columns.items():
+            column[:self.size] = column[:self.size][order]
+    
+    def to_series(
+        self,
+        mask: Optional[np.ndarray] = None,
+        location_id: Optional[str] = None
+    ) -> FlowSeries:
+        """Series over the selected rows; metadata from the first row's location."""
+        if location_id is None:
+            first = self.columns["location"][0]
+            location_id = next(
+                loc for loc, code in self.location_codes.items() if code == first
+            )
+        cols = {name: column[:self.size] for name, column in self.columns.items()}
+        if mask is not None:
+            cols = {name: column[mask] for name, column in cols.items()}
+        
+        return FlowSeries.from_columns(
+            location_id=location_id,
+            location_type=self.location_types[location_id],
+            timestamps=cols["timestamp"],
+            arrival_count=cols["arrival_count"],
+            departure_count=cols["departure_count"],
+            queue_length=cols["queue_length"],
+            in_service_count=cols["in_service_count"],
+            avg_service_duration=cols["avg_service_duration"],
+            avg_wait_time=cols["avg_wait_time"],
+            observation_period_seconds=cols["observation_period_seconds"],
+            tz=self.tz
+        )
+    
+    def split_by_location(self) -> Dict[str, FlowSeries]:
+        """One series per location, keeping row order."""
+        codes = self.columns["location"][:self.size]
+        return {
+            location_id: self.to_series(codes == code, location_id)
+            for location_id, code in self.location_codes.items()
+        }
+
+
+class FlowDataRepository:
+    """
+    Projection-only reader for operational data.
+    
+    Series are sorted by timestamp. Nothing here writes, so no document
+    state is tracked.
+    """
+    
+    def __init__(self, batch_size: int = 2000):
+        self.batch_size = batch_size
+    
+    async def fetch_series(
+        self,
+        target_date: date,
+        location_id: Optional[str] = None
+    ) -> Optional[FlowSeries]:
+        """
+        All matching points of a day as one series.
+        
+        Without a location filter, points of every location are combined
+        and location metadata is taken from the earliest point. Returns
+        None when there is no data.
+        """
+        columns = await self._fetch(target_date, location_id)
+        if not columns.size:
+            return None
+        columns.sort_by_timestamp()
+        return columns.to_series()
+    
+    async def fetch_series_by_location(
+        self,
+        target_date: date,
+        location_id: Optional[str] = None
+    ) -> Dict[str, FlowSeries]:
+        """A day's points as one series per location."""
+        columns = await self._fetch(target_date, location_id)
+        return columns.split_by_location() if columns.size else {}
+    
+    async def _fetch(
+        self,
+        target_date: date,
+        location_id: Optional[str]
+    ) -> _FlowColumns:
+        query = self.build_query(target_date, location_id)
+        collection = OperationalDataPoint.get_motor_collection()
+        await get_query_plan_recorder().record_find(
+            "flow_repository.fetch", collection, query, FLOW_PROJECTION, FLOW_SORT
+        )
+        
+        cursor = collection.find(
+            query, FLOW_PROJECTION
+        ).sort(FLOW_SORT).batch_size(self.batch_size)
+        
+        columns = _FlowColumns(self.batch_size)
+        while True:
+            batch = await cursor.to_list(length=self.batch_size)
+            if not batch:
+                break
+            columns.extend(batch)
+        
+        logger.debug(f"Fetched {columns.size} flow points for {target_date}")
+        return columns
+    
+    async def summarize_day(
+        self,
+        target_date: date,
+        location_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Day totals computed by MongoDB in a single $group.
+        
+        Zero or missing wait/service durations are treated as not
+        measured; utilization (λ/μ, capped at 2) only where μ > 0.
+        Returns None when there is no data.
+        """
+        pipeline = [
+            {"$match": self.build_query(target_date, location_id)},
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "total_arrivals": {"$sum": "$arrival_count"},
+                "total_departures": {"$sum": "$departure_count"},
+                "avg_queue": {"$avg": "$queue_length"},
+                "max_queue": {"$max": "$queue_length"},
+                "avg_wait": {"$avg": _measured("$avg_wait_time")},
+                "max_wait": {"$max": _measured("$avg_wait_time")},
+                "avg_service": {"$avg": _measured("$avg_service_duration")},
+                "avg_util": {"$avg": _UTILIZATION},
+                "peak_util": {"$max": _UTILIZATION}
+            }}
+        ]
+        rows = await self._aggregate("flow_repository.summarize_day", pipeline)
+        return rows[0] if rows else None
+    
+    async def hourly_breakdown(
+        self,
+        target_date: date,
+        location_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Per-hour (UTC) arrivals, mean queue and mean measured wait, by hour."""
+        pipeline = [
+            {"$match": self.build_query(target_date, location_id)},
+            {"$group": {
+                "_id": {"$hour": "$timestamp"},
+                "arrivals": {"$sum": "$arrival_count"},
+                "avg_queue": {"$avg": "$queue_length"},
+                "avg_wait": {"$avg": _measured("$avg_wait_time")}
+            }},
+            {"$sort": {"_id": 1}}
+        ]
+        return await self._aggregate("flow_repository.hourly_breakdown", pipeline)
+    
+    async def _aggregate(
+        self,
+        name: str,
+        pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        collection = OperationalDataPoint.get_motor_collection()
+        await get_query_plan_recorder().record_aggregate(name, collection, pipeline)
+        cursor = collection.aggregate(pipeline)
+        return await cursor.to_list(length=None)
+    
+    @staticmethod
+    def build_query(
+        target_date: date,
+        location_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Raw query; dates are stored by Beanie as midnight datetimes."""
+        query: Dict[str, Any] = {"date": to_stored_date(target_date)}
+        if location_id:
+            query["location_id"] = location_id
+        return query
+
+
+# Service instance factory
+_flow_repository: Optional[FlowDataRepository] = None
+
+
+def get_flow_repository() -> FlowDataRepository:
+    """Get or create the flow data repository."""
+    global _flow_repository
+    if _flow_repository is None:
+        _flow_repository = FlowDataRepository()
+    return _flow_repository
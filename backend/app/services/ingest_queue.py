@@ -0,0 +1,176 @@
+"""
+PICAM Ingest Batcher
+
+Write-behind micro-batching for single-point ingestion. Sensors post one
+point per request; instead of one insert round trip per request,
+concurrent ingest_single / ingest_from_video_count calls are coalesced
+into one unordered insert_many of up to INGEST_BATCH_MAX_SIZE points,
+sent when the batch is full or INGEST_BATCH_LINGER_MS after its first
+point arrived.
+
+Each caller still waits for its own acknowledgement: submit returns the
+point's id once the batch has committed (and live metrics, rollups, the
+location registry and insight staleness have been updated), or raises if
+that point's write failed. Ids are assigned before the insert, so a
+partly failed batch acknowledges exactly the points that were stored. A
+failing update of derived state is logged and never keeps a caller
+waiting: the points are stored, and the derived state can be rebuilt.
+"""
+
+import asyncio
+import inspect
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from app.models.mongodb_models import DailyInsight, OperationalDataPoint
+from app.services.live_metrics import get_live_metrics_registry
+from app.services.rollups import get_rollup_service
+from app.services.location_registry import get_location_registry
+from app.config import get_settings
+from app.utils import to_stored_date
+
+logger = logging.getLogger(__name__)
+
+_Pending = Tuple[OperationalDataPoint, asyncio.Future]
+
+
+async def mark_insights_stale(days: Iterable[Union[date, datetime]]) -> None:
+    """Flag generated insights of days that received new points."""
+    stored_days = sorted({to_stored_date(d) for d in days})
+    try:
+        await DailyInsight.get_motor_collection().update_many(
+            {"date": {"$in": stored_days}, "is_stale": {"$ne": True}},
+            {"$set": {"is_stale": True}}
+        )
+    except Exception as e:
+        logger.warning(f"Could not mark insights stale: {e}")
+
+
+class IngestBatcher:
+    """
+    Coalesces single-point inserts into insert_many micro-batches.
+    """
+    
+    def __init__(
+        self,
+        max_batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None
+    ):
+        settings = get_settings()
+        self.max_batch_size = max_batch_size or settings.ingest_batch_max_size
+        self.linger = (settings.ingest_batch_linger_ms if linger_ms is None else linger_ms) / 1000
+        self.live_metrics = get_live_metrics_registry()
+        self.rollups = get_rollup_service()
+        self.locations = get_location_registry()
+        
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._commits: Set[asyncio.Task] = set()
+    
+    async def submit(self, doc: OperationalDataPoint) -> str:
+        """
+        Queue a point and wait until its batch has committed.
+        
+        Returns:
+            The stored point's id
+        
+        Raises:
+            RuntimeError: The point could not be stored
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._linger())
+        
+        return await future
+    
+    async def close(self) -> None:
+        """Commit everything queued and wait for in-flight batches."""
+        self._dispatch()
+        if self._commits:
+            await asyncio.gather(*self._commits, return_exceptions=True)
+    
+    async def _linger(self) -> None:
+        await asyncio.sleep(self.linger)
+        self._timer = None
+        self._dispatch()
+    
+    def _dispatch(self) -> None:
+        """Hand the queued points to a commit task."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._commit(batch))
+        self._commits.add(task)
+        task.add_done_callback(self._commits.discard)
+    
+    async def _commit(self, batch: List[_Pending]) -> None:
+        docs = [doc for doc, _ in batch]
+        for doc in docs:
+            if doc.id is None:
+                doc.id = PydanticObjectId()
+        
+        failed: Dict[int, str] = {}
+        try:
+            await OperationalDataPoint.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {
+                error["index"]: error.get("errmsg", "write error")
+                for error in e.details.get("writeErrors", [])
+            }
+        except Exception as e:
+            failed = {index: str(e) for index in range(len(docs))}
+        
+        stored = [doc for index, doc in enumerate(docs) if index not in failed]
+        if failed:
+            logger.error(f"Ingest batch: {len(failed)} of {len(docs)} points not stored")
+        
+        try:
+            if stored:
+                await self._update_derived(stored)
+        finally:
+            for index, (doc, future) in enumerate(batch):
+                if future.done():  # caller went away; the point is stored regardless
+                    continue
+                if index in failed:
+                    future.set_exception(RuntimeError(f"Insert failed: {failed[index]}"))
+                else:
+                    future.set_result(str(doc.id))
+    
+    async def _update_derived(self, stored: List[OperationalDataPoint]) -> None:
+        """Apply stored points to derived state; each failure is only logged."""
+        updates = (
+            ("live metrics", self.live_metrics.record_many),
+            ("rollups", self.rollups.record_many),
+            ("location registry", self.locations.observe),
+            ("insight staleness", lambda docs: mark_insights_stale(doc.date for doc in docs))
+        )
+        for name, update in updates:
+            try:
+                result = update(stored)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Ingest batch: {name} update failed for {len(stored)} points: {e}")
+
+
+# Service instance factory
+_ingest_batcher: Optional[IngestBatcher] = None
+
+
+def get_ingest_batcher() -> IngestBatcher:
+    """Get or create the ingest batcher."""
+    global _ingest_batcher
+    if _ingest_batcher is None:
+        _ingest_batcher = IngestBatcher()
+    return _ingest_batcher
@@ -10,6 +10,7 @@ Each daily insight includes:
 - Trend analysis
 """
 
+import asyncio
 import logging
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any
@@ -22,13 +23,13 @@ from app.models.mongodb_models import (
 )
 from app.models.domain import (
     DailyInsight,
-    FlowMeasurement,
-    LocationType,
-    CapacityConstraint
+    FlowMeasurement
 )
 from app.core import get_physics_engine
 from app.services.data_ingestion import get_ingestion_service
 from app.services.action_recommender import get_action_recommender
+from app.services.live_metrics import get_live_metrics_registry
+from app.services.location_registry import get_location_registry
 from app.utils import now_utc, create_deterministic_hash
 from app.config import get_settings
 
@@ -48,6 +49,8 @@ class InsightGeneratorService:
         self.physics_engine = get_physics_engine()
         self.data_service = get_ingestion_service()
         self.recommender = get_action_recommender()
+        self.live_metrics = get_live_metrics_registry()
+        self.locations = get_location_registry()
     
     async def generate_daily_insight(
         self,
@@ -64,10 +67,10 @@ class InsightGeneratorService:
         Returns:
             Daily insight data
         """
-        # Check if already exists
+        # Check if already exists (and no data arrived since)
         if not force_regenerate:
             existing = await DailyInsightDoc.find_one({"date": target_date})
-            if existing:
+            if existing and not existing.is_stale:
                 return self._format_insight(existing)
         
         # Get data grouped by location
@@ -83,13 +86,25 @@ class InsightGeneratorService:
             }
         
         # Build capacity constraints
-        capacities = self._build_capacities(data_by_location.keys())
-        
-        # Use physics engine for complete analysis
-        daily_insight = self.physics_engine.analyze_day(
+        capacities = await self.locations.capacities(data_by_location.keys())
+        
+        # Entropy sketches already maintained by ingestion (the engine only
+        # uses one when it covers exactly the fetched data)
+        entropy_sketches = {}
+        if self.settings.use_entropy_sketches:
+            for location_id in data_by_location:
+                sketch = self.live_metrics.peek_entropy_sketch(location_id, target_date)
+                if sketch is not None:
+                    entropy_sketches[(location_id, target_date)] = sketch
+        
+        # Use physics engine for complete analysis (CPU-bound, keep it
+        # off the event loop)
+        daily_insight = await asyncio.to_thread(
+            self.physics_engine.analyze_day,
             measurements_by_location=data_by_location,
             capacities=capacities,
-            target_date=target_date
+            target_date=target_date,
+            entropy_sketches=entropy_sketches
         )
         
         # Generate recommendation if not already done
@@ -317,38 +332,6 @@ class InsightGeneratorService:
             "failed": failed
         }
     
-    def _build_capacities(
-        self,
-        location_ids: List[str]
-    ) -> Dict[str, CapacityConstraint]:
-        """
-        Build capacity constraints for locations.
-        """
-        capacities = {}
-        
-        for loc_id in location_ids:
-            # Determine type from ID (simple heuristic)
-            if "front_desk" in loc_id.lower():
-                capacities[loc_id] = CapacityConstraint(
-                    location_type=LocationType.FRONT_DESK,
-                    max_servers=self.settings.front_desk_stations,
-                    max_queue_capacity=50
-                )
-            elif "restaurant" in loc_id.lower():
-                capacities[loc_id] = CapacityConstraint(
-                    location_type=LocationType.RESTAURANT,
-                    max_servers=self.settings.restaurant_capacity // 4,
-                    max_queue_capacity=30
-                )
-            else:
-                capacities[loc_id] = CapacityConstraint(
-                    location_type=LocationType.LOBBY,
-                    max_servers=2,
-                    max_queue_capacity=20
-                )
-        
-        return capacities
-    
     async def _store_insight(
         self,
         insight: DailyInsight,
@@ -0,0 +1,249 @@
+"""
+PICAM Live Metrics Service
+
+Keeps running Little's Law accumulators and hourly entropy sketches per
+location and day, updated as data is ingested, so dashboards can read
+current L, λ, W, ρ and variability in O(1) instead of re-reading the
+whole day's data points.
+
+A location/day is seeded from the database the first time it is
+requested; from then on every ingested point updates it directly.
+State is per process - each API worker seeds its own metrics.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.mongodb_models import OperationalDataPoint
+from app.models.domain import FlowMeasurement, LocationType
+from app.core.online_stats import EntropySketch, LittlesLawAccumulator
+from app.config import get_settings
+from app.utils import to_utc, today_utc
+
+logger = logging.getLogger(__name__)
+
+AccumulatorKey = Tuple[str, date]
+
+
+@dataclass
+class LocationDayMetrics:
+    """Running metrics for one location and day."""
+    littles: LittlesLawAccumulator
+    bin_edges: Tuple[float, ...]
+    hourly_entropy: Dict[int, EntropySketch] = field(default_factory=dict)
+    
+    @property
+    def count(self) -> int:
+        return self.littles.count
+    
+    @property
+    def key(self) -> AccumulatorKey:
+        return self.littles.location_id, self.littles.target_date
+    
+    def update(self, measurement: FlowMeasurement) -> None:
+        self.littles.update(measurement)
+        
+        hour = measurement.timestamp.hour
+        sketch = self.hourly_entropy.get(hour)
+        if sketch is None:
+            sketch = self.hourly_entropy[hour] = EntropySketch(
+                bin_edges=self.bin_edges, key=self.key
+            )
+        sketch.update_measurement(measurement)
+    
+    def entropy_sketch(self, hours: Optional[Iterable[int]] = None) -> EntropySketch:
+        """Merged sketch for the whole day or the given hours."""
+        selected = self.hourly_entropy.keys() if hours is None else hours
+        sketch = EntropySketch.merged(
+            [self.hourly_entropy[h] for h in sorted(selected) if h in self.hourly_entropy],
+            bin_edges=self.bin_edges
+        )
+        sketch.key = self.key
+        return sketch
+
+
+class LiveMetricsRegistry:
+    """
+    In-memory registry of LocationDayMetrics keyed by (location, date).
+    
+    Days older than retention_days (relative to the newest day seen) are
+    evicted so the registry stays bounded.
+    """
+    
+    def __init__(
+        self,
+        retention_days: int = 2,
+        bin_edges: Optional[Sequence[float]] = None
+    ):
+        self.retention_days = retention_days
+        self.bin_edges = tuple(bin_edges or get_settings().entropy_bin_edges)
+        self._days: Dict[AccumulatorKey, LocationDayMetrics] = {}
+        self._locks: Dict[AccumulatorKey, asyncio.Lock] = {}
+        # Points ingested while a location/day is being seeded
+        self._pending: Dict[AccumulatorKey, List[Tuple[str, FlowMeasurement]]] = {}
+    
+    def record(self, doc: OperationalDataPoint) -> None:
+        """
+        Apply a newly stored data point.
+        
+        Location/days that were never requested are skipped; they are
+        seeded from the database (including this point) on first read.
+        """
+        key = (doc.location_id, doc.date)
+        metrics = self._days.get(key)
+        if metrics is not None:
+            metrics.update(self._to_measurement(doc))
+        elif key in self._pending:
+            self._pending[key].append((str(doc.id), self._to_measurement(doc)))
+    
+    def record_many(self, docs: List[OperationalDataPoint]) -> None:
+        """Apply a batch of newly stored data points."""
+        for doc in docs:
+            self.record(doc)
+    
+    def record_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """Apply newly stored raw documents (bulk ingestion path)."""
+        for doc in documents:
+            key = (doc["location_id"], doc["date"].date())
+            metrics = self._days.get(key)
+            if metrics is not None:
+                metrics.update(self._document_measurement(doc))
+            elif key in self._pending:
+                self._pending[key].append((str(doc["_id"]), self._document_measurement(doc)))
+    
+    async def get_accumulator(
+        self,
+        location_id: str,
+        target_date: Optional[date] = None
+    ) -> LittlesLawAccumulator:
+        """Get the running Little's Law accumulator, seeding on first use."""
+        metrics = await self.get_day_metrics(location_id, target_date)
+        return metrics.littles
+    
+    async def get_entropy_sketch(
+        self,
+        location_id: str,
+        target_date: Optional[date] = None,
+        hours: Optional[Iterable[int]] = None
+    ) -> EntropySketch:
+        """Merged entropy sketch for a day (or some hours), seeding on first use."""
+        metrics = await self.get_day_metrics(location_id, target_date)
+        return metrics.entropy_sketch(hours)
+    
+    def peek_entropy_sketch(
+        self,
+        location_id: str,
+        target_date: date
+    ) -> Optional[EntropySketch]:
+        """Day's entropy sketch if it is already tracked; never queries."""
+        metrics = self._days.get((location_id, target_date))
+        return metrics.entropy_sketch() if metrics is not None else None
+    
+    async def get_day_metrics(
+        self,
+        location_id: str,
+        target_date: Optional[date] = None
+    ) -> LocationDayMetrics:
+        """Get the running metrics for a location/day, seeding on first use."""
+        key = (location_id, target_date or today_utc())
+        
+        metrics = self._days.get(key)
+        if metrics is not None:
+            return metrics
+        
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            metrics = self._days.get(key)
+            if metrics is None:
+                metrics = await self._seed(key)
+                self._days[key] = metrics
+                self._evict(key[1])
+        
+        self._locks.pop(key, None)
+        return metrics
+    
+    def clear(self) -> None:
+        """Drop all metrics (they are re-seeded on next read)."""
+        self._days.clear()
+    
+    async def _seed(self, key: AccumulatorKey) -> LocationDayMetrics:
+        """Build a location/day's metrics from the data already stored."""
+        location_id, target_date = key
+        metrics = LocationDayMetrics(
+            littles=LittlesLawAccumulator(location_id=location_id, target_date=target_date),
+            bin_edges=self.bin_edges
+        )
+        
+        self._pending[key] = []
+        try:
+            data_points = await OperationalDataPoint.find(
+                {"date": target_date, "location_id": location_id}
+            ).sort("timestamp").to_list()
+            
+            seen = set()
+            for dp in data_points:
+                metrics.update(self._to_measurement(dp))
+                seen.add(str(dp.id))
+            
+            # Points ingested while the query ran may or may not be in it
+            for point_id, measurement in self._pending[key]:
+                if point_id not in seen:
+                    metrics.update(measurement)
+        finally:
+            del self._pending[key]
+        
+        logger.info(
+            f"Seeded live metrics for {location_id} on {target_date} "
+            f"from {metrics.count} data points"
+        )
+        return metrics
+    
+    def _evict(self, newest: date) -> None:
+        cutoff = newest - timedelta(days=self.retention_days)
+        for key in [k for k in self._days if k[1] < cutoff]:
+            del self._days[key]
+    
+    @staticmethod
+    def _to_measurement(doc: OperationalDataPoint) -> FlowMeasurement:
+        return FlowMeasurement(
+            timestamp=to_utc(doc.timestamp),
+            location_id=doc.location_id,
+            location_type=LocationType(doc.location_type),
+            arrival_count=doc.arrival_count,
+            departure_count=doc.departure_count,
+            queue_length=doc.queue_length,
+            in_service_count=doc.in_service_count,
+            avg_service_duration=doc.avg_service_duration,
+            avg_wait_time=doc.avg_wait_time,
+            observation_period_seconds=doc.observation_period_seconds
+        )
+    
+    @staticmethod
+    def _document_measurement(doc: Dict[str, Any]) -> FlowMeasurement:
+        return FlowMeasurement(
+            timestamp=to_utc(doc["timestamp"]),
+            location_id=doc["location_id"],
+            location_type=LocationType(doc["location_type"]),
+            arrival_count=doc["arrival_count"],
+            departure_count=doc["departure_count"],
+            queue_length=doc["queue_length"],
+            in_service_count=doc["in_service_count"],
+            avg_service_duration=doc.get("avg_service_duration"),
+            avg_wait_time=doc.get("avg_wait_time"),
+            observation_period_seconds=doc["observation_period_seconds"]
+        )
+
+
+# Service instance factory
+_live_metrics_registry: Optional[LiveMetricsRegistry] = None
+
+
+def get_live_metrics_registry() -> LiveMetricsRegistry:
+    """Get or create the live metrics registry."""
+    global _live_metrics_registry
+    if _live_metrics_registry is None:
+        _live_metrics_registry = LiveMetricsRegistry()
+    return _live_metrics_registry
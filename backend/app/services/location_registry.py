@@ -0,0 +1,358 @@
+"""
+PICAM Location Registry
+
+Registered locations (ID, type, capacity, first/last seen) are stored
+in the locations collection and mirrored in an in-process cache, so the
+dashboard's location list and the physics capacity lookups are memory
+reads instead of a distinct() over operational data and ID guessing.
+
+Ingestion passes every stored batch to observe(): a location is written
+when its first point arrives, and its last_seen at most once per
+LAST_SEEN_RESOLUTION. The cache is reloaded after
+LOCATION_CACHE_TTL_SECONDS, which picks up locations registered by other
+workers and capacity changes. An empty registry is filled once from
+operational_data on first load.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.models.mongodb_models import LocationRecord, OperationalDataPoint
+from app.models.domain import CapacityConstraint, LocationType
+from app.config import get_settings
+from app.utils import now_utc, to_utc
+
+logger = logging.getLogger(__name__)
+
+# last_seen is persisted when it advanced by at least this much
+LAST_SEEN_RESOLUTION = timedelta(hours=1)
+
+
+def default_capacity(location_type: str) -> Tuple[int, int]:
+    """(max_servers, max_queue_capacity) for a newly registered location."""
+    settings = get_settings()
+    if location_type == LocationType.FRONT_DESK.value:
+        return settings.front_desk_stations, 50
+    if location_type == LocationType.RESTAURANT.value:
+        return max(1, settings.restaurant_capacity // 4), 30
+    return 2, 20
+
+
+def capacity_constraint(
+    location_type: str,
+    max_servers: int,
+    max_queue_capacity: int
+) -> CapacityConstraint:
+    try:
+        constraint_type = LocationType(location_type)
+    except ValueError:
+        constraint_type = LocationType.LOBBY
+    return CapacityConstraint(
+        location_type=constraint_type,
+        max_servers=max_servers,
+        max_queue_capacity=max_queue_capacity
+    )
+
+
+def _guess_type(location_id: str) -> str:
+    """Location type from an unregistered ID (legacy naming heuristic)."""
+    for location_type in (LocationType.FRONT_DESK, LocationType.RESTAURANT):
+        if location_type.value in location_id.lower():
+            return location_type.value
+    return LocationType.LOBBY.value
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    return to_utc(ts).replace(tzinfo=None)
+
+
+@dataclass
+class RegisteredLocation:
+    """Cached registry entry."""
+    location_id: str
+    location_type: str
+    max_servers: int
+    max_queue_capacity: int
+    first_seen: datetime
+    last_seen: datetime
+    
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "RegisteredLocation":
+        return cls(**{name: doc[name] for name in cls.__dataclass_fields__})
+    
+    @property
+    def capacity(self) -> CapacityConstraint:
+        return capacity_constraint(self.location_type, self.max_servers, self.max_queue_capacity)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "location_id": self.location_id,
+            "location_type": self.location_type,
+            "max_servers": self.max_servers,
+            "max_queue_capacity": self.max_queue_capacity,
+            "first_seen": self.first_seen.isoformat(),
+            "last_seen": self.last_seen.isoformat()
+        }
+
+
+class LocationRegistry:
+    """
+    In-process cache of the location registry, updated at ingest.
+    """
+    
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        settings = get_settings()
+        self.ttl = settings.location_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        
+        self._locations: Dict[str, RegisteredLocation] = {}
+        self._persisted_last_seen: Dict[str, datetime] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+    
+    async def _ensure_loaded(self) -> None:
+        if self._fresh():
+            return
+        async with self._lock:
+            if not self._fresh():
+                await self.reload()
+    
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+    
+    async def reload(self) -> None:
+        """Load the registry; an empty one is filled from operational data."""
+        docs = await LocationRecord.get_motor_collection().find(
+            {}, {"_id": 0}
+        ).to_list(length=None)
+        if not docs and self._loaded_at is None:
+            docs = await self._register_existing()
+        
+        # Merge into the cache: observe() may have registered locations or
+        # written last_seen values while the documents were being read
+        for doc in docs:
+            entry = RegisteredLocation.from_document(doc)
+            location_id = entry.location_id
+            persisted = self._persisted_last_seen.get(location_id)
+            if persisted is None or entry.last_seen > persisted:
+                self._persisted_last_seen[location_id] = entry.last_seen
+            cached = self._locations.get(location_id)
+            if cached is not None:
+                # Keep values observed here but not yet persisted
+                entry.first_seen = min(entry.first_seen, cached.first_seen)
+                entry.last_seen = max(entry.last_seen, cached.last_seen)
+            self._locations[location_id] = entry
+        self._loaded_at = time.monotonic()
+    
+    async def _register_existing(self) -> List[Dict[str, Any]]:
+        """Register every location already in operational_data (one aggregation)."""
+        cursor = OperationalDataPoint.get_motor_collection().aggregate([
+            {"$group": {
+                "_id": "$location_id",
+                "location_type": {"$first": "$location_type"},
+                "first_seen": {"$min": "$timestamp"},
+                "last_seen": {"$max": "$timestamp"}
+            }}
+        ], allowDiskUse=True)
+        rows = await cursor.to_list(length=None)
+        docs = []
+        for row in rows:
+            max_servers, max_queue = default_capacity(row["location_type"])
+            docs.append({
+                "location_id": row["_id"],
+                "location_type": row["location_type"],
+                "max_servers": max_servers,
+                "max_queue_capacity": max_queue,
+                "first_seen": row["first_seen"],
+                "last_seen": row["last_seen"]
+            })
+        if docs:
+            await self._write([self._register_operation(doc) for doc in docs])
+            logger.info(f"Location registry initialized with {len(docs)} locations")
+        return docs
+    
+    @staticmethod
+    def _register_operation(doc: Dict[str, Any]) -> UpdateOne:
+        return UpdateOne(
+            {"location_id": doc["location_id"]},
+            {
+                "$setOnInsert": {
+                    "location_type": doc["location_type"],
+                    "max_servers": doc["max_servers"],
+                    "max_queue_capacity": doc["max_queue_capacity"],
+                    "updated_at": now_utc()
+                },
+                "$min": {"first_seen": doc["first_seen"]},
+                "$max": {"last_seen": doc["last_seen"]}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def _write(operations: List[UpdateOne]) -> None:
+        await LocationRecord.get_motor_collection().bulk_write(operations, ordered=False)
+    
+    async def observe(self, points: Iterable[Any]) -> None:
+        """
+        Note stored points (documents or raw dicts). Registers locations
+        seen for the first time; otherwise only updates the cache.
+        """
+        try:
+            await self._ensure_loaded()
+        except Exception as e:
+            logger.error(f"Location registry unavailable: {e}")
+            return
+        
+        new = []
+        seen: Dict[str, None] = {}  # location IDs of this batch, in order
+        backfilled = set()  # first_seen moved earlier
+        for point in points:
+            get = point.get if isinstance(point, dict) else lambda name: getattr(point, name)
+            location_id = get("location_id")
+            timestamp = _naive_utc(get("timestamp"))
+            seen[location_id] = None
+            
+            entry = self._locations.get(location_id)
+            if entry is None:
+                location_type = get("location_type")
+                location_type = getattr(location_type, "value", location_type)
+                self._locations[location_id] = RegisteredLocation(
+                    location_id, location_type, *default_capacity(location_type),
+                    first_seen=timestamp, last_seen=timestamp
+                )
+                new.append(location_id)
+            else:
+                if timestamp < entry.first_seen:
+                    entry.first_seen = timestamp
+                    backfilled.add(location_id)
+                entry.last_seen = max(entry.last_seen, timestamp)
+        
+        # Only the batch's locations can need a write (a failed registration
+        # is retried when the location reports again)
+        operations = []
+        written = []
+        for location_id in seen:
+            entry = self._locations[location_id]
+            persisted = self._persisted_last_seen.get(location_id)
+            if persisted is None:
+                # New, or its registration has not been written yet
+                operations.append(self._register_operation(asdict(entry)))
+            elif location_id in backfilled or entry.last_seen - persisted >= LAST_SEEN_RESOLUTION:
+                operations.append(UpdateOne(
+                    {"location_id": location_id},
+                    {
+                        "$min": {"first_seen": entry.first_seen},
+                        "$max": {"last_seen": entry.last_seen}
+                    }
+                ))
+            else:
+                continue
+            written.append(entry)
+        
+        if not operations:
+            return
+        try:
+            await self._write(operations)
+        except Exception as e:
+            logger.error(f"Location registry update failed: {e}")
+            return
+        for entry in written:
+            self._persisted_last_seen[entry.location_id] = entry.last_seen
+        if new:
+            logger.info(f"Registered new locations: {', '.join(sorted(new))}")
+    
+    async def location_ids(self) -> List[str]:
+        """All registered location IDs, sorted."""
+        await self._ensure_loaded()
+        return sorted(self._locations)
+    
+    async def get_all(self) -> List[RegisteredLocation]:
+        """All registry entries, sorted by location ID."""
+        await self._ensure_loaded()
+        return [self._locations[location_id] for location_id in sorted(self._locations)]
+    
+    async def capacities(self, location_ids: Iterable[str]) -> Dict[str, CapacityConstraint]:
+        """
+        Capacity constraints of locations. Unregistered IDs get the
+        default capacity of the type their name suggests.
+        """
+        await self._ensure_loaded()
+        capacities = {}
+        for location_id in location_ids:
+            entry = self._locations.get(location_id)
+            if entry is not None:
+                capacities[location_id] = entry.capacity
+            else:
+                location_type = _guess_type(location_id)
+                capacities[location_id] = capacity_constraint(
+                    location_type, *default_capacity(location_type)
+                )
+        return capacities
+    
+    async def analysis_capacity(self, location_id: Optional[str]) -> CapacityConstraint:
+        """
+        Capacity for a complete analysis: the requested location's
+        registered capacity, or the default front desk capacity for the
+        data of all locations.
+        """
+        if location_id:
+            return (await self.capacities([location_id]))[location_id]
+        location_type = LocationType.FRONT_DESK.value
+        return capacity_constraint(location_type, *default_capacity(location_type))
+    
+    async def loss_capacity(
+        self,
+        location_id: Optional[str],
+        location_type: str
+    ) -> Optional[CapacityConstraint]:
+        """
+        Capacity for a loss calculation over data of the given type.
+        
+        Only front desk data has one (the registered capacity of the
+        requested location, else the default); for other types idle and
+        overtime costs are not computed.
+        """
+        if location_type != LocationType.FRONT_DESK.value:
+            return None
+        return await self.analysis_capacity(location_id)
+    
+    async def set_capacity(
+        self,
+        location_id: str,
+        max_servers: int,
+        max_queue_capacity: int
+    ) -> Optional[RegisteredLocation]:
+        """Change a registered location's capacity. None if not registered."""
+        result = await LocationRecord.get_motor_collection().update_one(
+            {"location_id": location_id},
+            {"$set": {
+                "max_servers": max_servers,
+                "max_queue_capacity": max_queue_capacity,
+                "updated_at": now_utc()
+            }}
+        )
+        if result.matched_count == 0:
+            return None
+        await self._ensure_loaded()
+        entry = self._locations.get(location_id)
+        if entry is not None:
+            entry.max_servers = max_servers
+            entry.max_queue_capacity = max_queue_capacity
+        return entry
+
+
+# Service instance factory
+_location_registry: Optional[LocationRegistry] = None
+
+
+def get_location_registry() -> LocationRegistry:
+    """Get or create the location registry."""
+    global _location_registry
+    if _location_registry is None:
+        _location_registry = LocationRegistry()
+    return _location_registry
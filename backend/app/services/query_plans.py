@@ -0,0 +1,181 @@
+"""
+PICAM Query Plan Recorder
+
+Debug-mode instrumentation for the repository reads. When DEBUG is on,
+each instrumented query is also run through explain() and a summary of
+the winning plan is kept in a bounded in-memory ring buffer:
+
+- plan stages (IXSCAN, FETCH, SORT, COLLSCAN, ...) and the index used
+- keys/documents examined vs documents returned
+- flags for collection scans and in-memory sorts
+
+The buffer is served by GET /api/v1/admin/query-plans so missing or
+unused indexes show up before a query reaches production. With DEBUG
+off nothing is explained and recording is a no-op.
+"""
+
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.utils import now_utc
+
+logger = logging.getLogger(__name__)
+
+
+def _find_key(document: Any, key: str) -> Optional[Dict[str, Any]]:
+    """First value stored under key anywhere in an explain document."""
+    if isinstance(document, dict):
+        if isinstance(document.get(key), dict):
+            return document[key]
+        children = document.values()
+    elif isinstance(document, list):
+        children = document
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Stage names (root first) and index names of a winning plan tree."""
+    stages: List[str] = []
+    indexes: List[str] = []
+    pending = [plan.get("queryPlan", plan)]  # SBE plans nest the tree
+    while pending:
+        node = pending.pop(0)
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+        pending.extend(node.get("inputStages", []))
+    return stages, indexes
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a find or aggregate explain() result to the plan essentials.
+    
+    For aggregations the planner output sits under the $cursor stage;
+    it is searched for wherever it is.
+    """
+    planner = _find_key(explain, "queryPlanner") or {}
+    stats = _find_key(explain, "executionStats") or {}
+    stages, indexes = _plan_stages(planner.get("winningPlan", {}))
+    
+    returned = stats.get("nReturned", 0)
+    docs_examined = stats.get("totalDocsExamined", 0)
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "collection_scan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "docs_examined": docs_examined,
+        "returned": returned,
+        "examined_per_returned": (
+            round(docs_examined / returned, 2) if returned else None
+        ),
+        "execution_ms": stats.get("executionTimeMillis")
+    }
+
+
+class QueryPlanRecorder:
+    """
+    Ring buffer of explain() summaries, filled only in debug mode.
+    
+    Explaining re-runs the query, so recording roughly doubles the cost
+    of every instrumented read; never enable DEBUG in production.
+    """
+    
+    def __init__(self, capacity: int = 200):
+        self._plans: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+    
+    @property
+    def enabled(self) -> bool:
+        return get_settings().debug
+    
+    async def record_find(
+        self,
+        name: str,
+        collection,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        sort: Optional[Sequence[Tuple[str, int]]] = None
+    ) -> None:
+        """Explain a find on a Motor collection."""
+        if not self.enabled:
+            return
+        try:
+            cursor = collection.find(query, projection)
+            if sort:
+                cursor = cursor.sort(list(sort))
+            explain = await cursor.explain()
+            self._add(name, collection.name, {"filter": query, "sort": sort}, explain)
+        except Exception as e:
+            logger.warning(f"Could not explain {name}: {e}")
+    
+    async def record_aggregate(
+        self,
+        name: str,
+        collection,
+        pipeline: List[Dict[str, Any]]
+    ) -> None:
+        """Explain an aggregation pipeline on a Motor collection."""
+        if not self.enabled:
+            return
+        try:
+            explain = await collection.database.command({
+                "explain": {
+                    "aggregate": collection.name,
+                    "pipeline": pipeline,
+                    "cursor": {}
+                },
+                "verbosity": "executionStats"
+            })
+            self._add(name, collection.name, {"pipeline": pipeline}, explain)
+        except Exception as e:
+            logger.warning(f"Could not explain {name}: {e}")
+    
+    def _add(
+        self,
+        name: str,
+        collection_name: str,
+        shape: Dict[str, Any],
+        explain: Dict[str, Any]
+    ) -> None:
+        summary = summarize_explain(explain)
+        if summary["collection_scan"]:
+            logger.warning(f"{name} on {collection_name} uses a collection scan")
+        self._plans.append({
+            "recorded_at": now_utc().isoformat(),
+            "operation": name,
+            "collection": collection_name,
+            "query": repr(shape),
+            **summary
+        })
+    
+    def get_plans(self) -> List[Dict[str, Any]]:
+        """Recorded summaries, newest first."""
+        return list(reversed(self._plans))
+    
+    def clear(self) -> None:
+        self._plans.clear()
+
+
+# Service instance factory
+_query_plan_recorder: Optional[QueryPlanRecorder] = None
+
+
+def get_query_plan_recorder() -> QueryPlanRecorder:
+    """Get or create the query plan recorder."""
+    global _query_plan_recorder
+    if _query_plan_recorder is None:
+        _query_plan_recorder = QueryPlanRecorder()
+    return _query_plan_recorder
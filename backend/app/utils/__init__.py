@@ -14,6 +14,8 @@ from app.utils.time_utils import (
     today_utc,
     to_utc,
     get_date_range,
+    to_stored_date,
+    from_stored_date,
     get_observation_periods,
     seconds_to_readable,
     get_hour_of_day,
@@ -35,6 +37,8 @@ __all__ = [
     "today_utc",
     "to_utc",
     "get_date_range",
+    "to_stored_date",
+    "from_stored_date",
     "get_observation_periods",
     "seconds_to_readable",
     "get_hour_of_day",
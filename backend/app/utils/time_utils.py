@@ -44,6 +44,16 @@ def get_date_range(
     return start_dt, end_dt
 
 
+def to_stored_date(d: date) -> datetime:
+    """Midnight datetime under which Beanie stores a date (or a datetime's day)."""
+    return datetime(d.year, d.month, d.day)
+
+
+def from_stored_date(value) -> date:
+    """Date of a stored 'date' value (a midnight datetime)."""
+    return value.date() if isinstance(value, datetime) else value
+
+
 def get_observation_periods(
     start_time: datetime,
     end_time: datetime,
@@ -2,18 +2,95 @@
 Tests for PICAM Physics Engine
 """
 
+import contextlib
 import pytest
-from datetime import datetime, date
+import random
+import numpy as np
+from datetime import datetime, date, timedelta, timezone
 from app.core import (
     LittlesLawCalculator,
     EntropyCalculator,
     LossCalculator,
     PhysicsEngine,
-    FinancialParameters
+    FinancialParameters,
+    FlowSeries,
+    MultiServerQueueCalculator
 )
+from app.core.entropy_calculator import OperationalStabilityAnalyzer
 from app.models.domain import FlowMeasurement, LocationType, CapacityConstraint
 
 
+def make_measurements(count=96, seed=7, start=None, location_id="front_desk_main"):
+    """Varied 5-minute measurements with some missing durations."""
+    rng = random.Random(seed)
+    start = start or datetime(2024, 1, 15, 6, 0)
+    return [
+        FlowMeasurement(
+            timestamp=start + timedelta(minutes=5 * i),
+            location_id=location_id,
+            location_type=LocationType.FRONT_DESK,
+            arrival_count=rng.randint(0, 40),
+            departure_count=rng.choice([0, rng.randint(1, 30)]),
+            queue_length=rng.randint(0, 20),
+            in_service_count=rng.randint(0, 3),
+            avg_service_duration=rng.choice([None, rng.uniform(30, 400)]),
+            avg_wait_time=rng.choice([None, 0.0, rng.uniform(0, 2400)]),
+            observation_period_seconds=300
+        )
+        for i in range(count)
+    ]
+
+
+class TestFlowSeries:
+    """Test the columnar flow container."""
+    
+    def test_columns_match_measurements(self):
+        """Columns and derived rates match the per-object properties."""
+        measurements = make_measurements()
+        series = FlowSeries.from_measurements(measurements)
+        
+        assert len(series) == len(measurements)
+        assert series.location_id == "front_desk_main"
+        assert series.arrival_rate.tolist() == [m.arrival_rate for m in measurements]
+        assert series.departure_rate.tolist() == [m.departure_rate for m in measurements]
+        assert series.total_in_system.tolist() == [m.total_in_system for m in measurements]
+        assert series.hours.tolist() == [m.timestamp.hour for m in measurements]
+        assert series.has_wait_time.tolist() == [
+            m.avg_wait_time is not None for m in measurements
+        ]
+    
+    def test_round_trip_preserves_missing_values_and_timezone(self):
+        """Expanding a series gives back the original measurements."""
+        measurements = make_measurements(
+            count=20, start=datetime(2024, 1, 15, 6, 0, tzinfo=timezone.utc)
+        )
+        series = FlowSeries.from_measurements(measurements)
+        
+        assert series.to_measurements() == measurements
+        assert series.last_timestamp == measurements[-1].timestamp
+    
+    def test_calculators_accept_series(self):
+        """Calculators give the same results for lists and series."""
+        measurements = make_measurements()
+        series = FlowSeries.from_measurements(measurements)
+        capacity = CapacityConstraint(
+            location_type=LocationType.FRONT_DESK,
+            max_servers=3,
+            max_queue_capacity=50
+        )
+        
+        littles = LittlesLawCalculator()
+        assert littles.calculate(series, capacity) == littles.calculate(measurements, capacity)
+        assert littles.verify_littles_law(series) == littles.verify_littles_law(measurements)
+        
+        entropy_calc = EntropyCalculator()
+        assert (
+            entropy_calc.calculate_entropy(series, "front_desk_main") ==
+            entropy_calc.calculate_entropy(measurements, "front_desk_main")
+        )
+        assert entropy_calc.analyze_patterns(series) == entropy_calc.analyze_patterns(measurements)
+
+
 class TestLittlesLaw:
     """Test Little's Law calculations."""
     
@@ -96,6 +173,249 @@ class TestLittlesLaw:
         assert result.is_unstable or result.rho > 0.9  # System stressed
 
 
+class TestRunningMoments:
+    """Test Welford running moments."""
+    
+    def test_updates_and_merges_match_numpy(self):
+        """Welford updates and merges agree with batch statistics."""
+        from app.core import RunningMoments
+        
+        values = np.random.default_rng(5).gamma(2.0, 30.0, 500)
+        
+        whole = RunningMoments()
+        parts = [RunningMoments() for _ in range(3)]
+        for i, v in enumerate(values):
+            whole.update(float(v))
+            parts[i % 3].update(float(v))
+        merged = RunningMoments()
+        for part in parts:
+            merged.merge(part)
+        
+        for moments in (whole, merged):
+            assert moments.count == 500
+            assert moments.mean == pytest.approx(np.mean(values), rel=1e-12)
+            assert moments.variance == pytest.approx(np.var(values, ddof=1), rel=1e-10)
+
+
+class TestLittlesLawAccumulator:
+    """Test the streaming Little's Law accumulator."""
+    
+    def test_matches_littles_law_calculator(self):
+        """Streaming result equals the batch Little's Law calculation."""
+        from app.core import LittlesLawAccumulator
+        
+        measurements = make_measurements(count=120)
+        capacity = CapacityConstraint(
+            location_type=LocationType.FRONT_DESK,
+            max_servers=3,
+            max_queue_capacity=50
+        )
+        
+        accumulator = LittlesLawAccumulator("front_desk_main", date(2024, 1, 15))
+        for m in measurements:
+            accumulator.update(m)
+        
+        live = accumulator.result(num_servers=3, confidence_level=0.95)
+        batch = LittlesLawCalculator(confidence_level=0.95).calculate(measurements, capacity)
+        
+        assert live.data_points_used == batch.data_points_used
+        assert live.timestamp == batch.timestamp
+        for name in ("L", "lambda_rate", "W", "L_q", "W_q", "rho",
+                     "confidence_interval_lower", "confidence_interval_upper"):
+            assert getattr(live, name) == pytest.approx(getattr(batch, name), rel=1e-9)
+
+
+class TestEntropySketch:
+    """Test fixed-bin entropy sketches."""
+    
+    def test_hourly_sketches_merge_and_match_batch_cv(self):
+        """Hourly sketches merge into the day; CVs match the batch path."""
+        from app.core import EntropySketch
+        
+        measurements = make_measurements(count=144)
+        calculator = EntropyCalculator()
+        
+        day = EntropySketch()
+        hourly = {}
+        for m in measurements:
+            day.update_measurement(m)
+            hourly.setdefault(m.timestamp.hour, EntropySketch()).update_measurement(m)
+        merged = EntropySketch.merged(list(hourly.values()))
+        
+        assert merged.bin_counts == day.bin_counts
+        assert merged.count == day.count == 144
+        
+        from_sketch = calculator.entropy_from_sketch(merged, "front_desk_main", measurements[-1].timestamp)
+        batch = calculator.calculate_entropy(measurements, "front_desk_main")
+        assert from_sketch.arrival_cv == pytest.approx(batch.arrival_cv, rel=1e-9)
+        assert from_sketch.service_cv == pytest.approx(batch.service_cv, rel=1e-9)
+        assert 0 < from_sketch.entropy_score <= 1
+        
+        patterns = calculator.patterns_from_sketches(hourly)
+        expected = calculator.analyze_patterns(measurements)
+        assert patterns["peak_hours"] == expected["peak_hours"]
+        for hour, stats_ in expected["hourly_stats"].items():
+            assert patterns["hourly_stats"][hour]["count"] == stats_["count"]
+            assert patterns["hourly_stats"][hour]["mean"] == pytest.approx(stats_["mean"])
+            assert patterns["hourly_stats"][hour]["cv"] == pytest.approx(stats_["cv"])
+        
+        with pytest.raises(ValueError):
+            day.merge(EntropySketch(bin_edges=(1, 10, 100)))
+
+
+class TestFlowStatistics:
+    """Test mergeable per-period flow statistics."""
+    
+    @staticmethod
+    def _point(m):
+        """Stored-point fields of a measurement, as rollups receive them."""
+        return {
+            "arrival_count": m.arrival_count,
+            "departure_count": m.departure_count,
+            "queue_length": m.queue_length,
+            "in_service_count": m.in_service_count,
+            "avg_wait_time": m.avg_wait_time,
+            "avg_service_duration": m.avg_service_duration,
+            "arrival_rate": m.arrival_rate,
+            "departure_rate": m.departure_rate
+        }
+    
+    def test_days_merge_like_one_batch(self):
+        """Day summaries merge into range-level Little's Law, CV, CI and loss."""
+        from app.core import FlowStatistics
+        from app.services.rollups import point_values
+        
+        days = [
+            make_measurements(count=100, seed=seed, start=datetime(2024, 1, 15 + d, 6, 0))
+            for d, seed in enumerate((3, 4, 5))
+        ]
+        everything = [m for day in days for m in day]
+        loss_calc = LossCalculator()
+        
+        merged = FlowStatistics("front_desk_main")
+        for day in days:
+            statistics = FlowStatistics("front_desk_main")
+            for m in day:
+                statistics.update(point_values(self._point(m)))
+            statistics.loss = loss_calc.calculate_loss_components(day)
+            merged.merge(statistics)
+        
+        batch = LittlesLawCalculator(confidence_level=0.95).calculate(everything)
+        ranged = merged.littles_law(everything[-1].timestamp, confidence_level=0.95)
+        
+        assert ranged.data_points_used == batch.data_points_used == 300
+        for name in ("L", "lambda_rate", "W", "L_q", "W_q", "rho",
+                     "confidence_interval_lower", "confidence_interval_upper"):
+            assert getattr(ranged, name) == pytest.approx(getattr(batch, name), rel=1e-9)
+        
+        entropy = EntropyCalculator().calculate_entropy(everything, "front_desk_main")
+        assert merged.cv("arrival_count") == pytest.approx(entropy.arrival_cv, rel=1e-9)
+        assert merged.cv("avg_service_duration") == pytest.approx(entropy.service_cv, rel=1e-9)
+        
+        components = loss_calc.calculate_loss_components(everything)
+        assert merged.loss.estimated_walkaways == components.estimated_walkaways
+        assert merged.loss.excess_wait_seconds == pytest.approx(components.excess_wait_seconds, rel=1e-12)
+
+
+class TestQuantileSketch:
+    """Test the relative-error quantile sketch."""
+    
+    def test_relative_accuracy_after_merge(self):
+        """Merged sketches answer percentiles within α of the exact values."""
+        from app.core import QuantileSketch
+        
+        rng = np.random.default_rng(11)
+        values = np.concatenate([rng.lognormal(4.0, 1.0, 3000), np.zeros(200)])
+        
+        parts = [QuantileSketch(relative_accuracy=0.01) for _ in range(4)]
+        for i, v in enumerate(values):
+            parts[i % 4].update(float(v))
+        merged = QuantileSketch.from_dict(parts[0].to_dict())
+        for part in parts[1:]:
+            merged.merge(part)
+        
+        assert merged.count == len(values)
+        for q in (0.0, 0.05, 0.5, 0.9, 0.95, 0.99, 1.0):
+            exact = np.quantile(values, q, method="lower")
+            estimate = merged.quantile(q)
+            assert abs(estimate - exact) <= 0.01 * exact
+        
+        assert QuantileSketch().quantile(0.5) is None
+        with pytest.raises(ValueError):
+            merged.merge(QuantileSketch(relative_accuracy=0.02))
+
+
+class TestMultiServerQueue:
+    """Test the M/M/c (Erlang C) engine."""
+    
+    @staticmethod
+    def _factorial_erlang_c(lambda_rate, mu, c):
+        """Textbook Erlang C via factorials (reference for small c)."""
+        import math
+        a = lambda_rate / mu
+        rho = lambda_rate / (c * mu)
+        last = a ** c / math.factorial(c) / (1 - rho)
+        p0 = 1 / (sum(a ** n / math.factorial(n) for n in range(c)) + last)
+        return last * p0
+    
+    def test_matches_factorial_formula(self):
+        """Erlang-B recurrence agrees with the factorial formula."""
+        mu = 1 / 180
+        for c in range(1, 15):
+            calc = MultiServerQueueCalculator(c, mu)
+            for lambda_rate in (0.001, c * mu * 0.5, c * mu * 0.95):
+                metrics = calc.evaluate(lambda_rate)
+                expected = self._factorial_erlang_c(lambda_rate, mu, c)
+                assert float(metrics.p_wait) == pytest.approx(expected, rel=1e-10)
+    
+    def test_large_server_counts(self):
+        """No overflow where a^c / c! would exceed float range."""
+        metrics = MultiServerQueueCalculator(400, 1.0).calculate_metrics(380.0)
+        
+        assert metrics["status"] == "stable"
+        assert 0 < metrics["p_wait"] < 1
+    
+    def test_vectorized_staffing_curve(self):
+        """Arrival rates × server counts evaluated in one call."""
+        calc = MultiServerQueueCalculator(1, 1 / 120)
+        rates = np.linspace(0.0, 0.2, 288)
+        servers = np.arange(1, 41)
+        
+        metrics = calc.evaluate(rates[:, None], servers[None, :])
+        
+        assert metrics.W_q.shape == (288, 40)
+        # Unstable cells are exactly those with λ >= cμ
+        assert np.array_equal(~metrics.stable, rates[:, None] >= servers[None, :] / 120)
+        # Spot-check against the scalar path
+        scalar = MultiServerQueueCalculator(30, 1 / 120).calculate_metrics(float(rates[200]))
+        assert round(float(metrics.W_q[200, 29]), 2) == scalar["W_q"]
+        # Wait time never increases as servers are added
+        both_stable = metrics.stable[:, 1:] & metrics.stable[:, :-1]
+        assert np.all(np.diff(metrics.W_q, axis=1)[both_stable] <= 1e-12)
+    
+    def test_staffing_plan_matches_linear_search(self):
+        """Vectorized plan picks the same c as testing every c in turn."""
+        mu = 1 / 90
+        calc = MultiServerQueueCalculator(1, mu)
+        # Includes integer offered loads, where ρ == 1 sits on the boundary
+        rates = np.concatenate([np.linspace(0.0, 0.25, 120), np.arange(0, 20) * mu])
+        
+        plan = calc.plan_staffing(rates, target_wait_time=30, max_servers=20)
+        
+        for i, rate in enumerate(rates):
+            expected = None
+            for c in range(1, 21):
+                metrics = MultiServerQueueCalculator(c, mu).calculate_metrics(float(rate))
+                if metrics.get("status") == "stable" and metrics["W_q"] <= 30:
+                    expected = c
+                    break
+            
+            assert (int(plan.servers[i]) or None) == expected
+            assert calc.find_optimal_servers(float(rate), 30)["optimal_servers"] == expected
+        
+        assert not plan.feasible.all()  # 0.25/s needs more than 20 servers
+
+
 class TestEntropyCalculator:
     """Test entropy/variability calculations."""
     
@@ -150,6 +470,111 @@ class TestEntropyCalculator:
         assert impact["status"] == "calculated"
         assert impact["variability_term"] == 1.0  # (1² + 1²) / 2
         assert impact["utilization_term"] == 4.0  # 0.8 / (1 - 0.8)
+    
+    def test_pattern_buckets_match_grouped_loop(self):
+        """Grouped sums give the same per-bucket stats as per-bucket numpy."""
+        calculator = EntropyCalculator()
+        # Three days from a Saturday, so hour-of-week spans a week boundary
+        measurements = make_measurements(count=864, start=datetime(2024, 1, 13, 0, 0))
+        
+        key_functions = {
+            "hour": lambda ts: ts.hour,
+            "quarter_hour": lambda ts: ts.hour * 4 + ts.minute // 15,
+            "hour_of_week": lambda ts: ts.weekday() * 24 + ts.hour,
+        }
+        for bucket, key in key_functions.items():
+            groups = {}
+            for m in measurements:
+                groups.setdefault(key(m.timestamp), []).append(m.arrival_count)
+            
+            patterns = calculator.analyze_patterns(measurements, bucket=bucket)
+            
+            assert patterns["bucket"] == bucket
+            assert sorted(patterns["hourly_stats"]) == sorted(groups)
+            for b, values in groups.items():
+                stats_ = patterns["hourly_stats"][b]
+                assert stats_["count"] == len(values)
+                assert stats_["mean"] == np.mean(values)
+                assert stats_["std"] == pytest.approx(np.std(values), rel=1e-12)
+                assert stats_["cv"] == pytest.approx(
+                    np.std(values, ddof=1) / np.mean(values), rel=1e-12
+                )
+            
+            means = {b: np.mean(v) for b, v in groups.items()}
+            expected_peaks = sorted(means, key=lambda b: (-means[b], b))[:3]
+            assert patterns["peak_hours"] == expected_peaks
+        
+        with pytest.raises(ValueError):
+            calculator.analyze_patterns(measurements, bucket="minute")
+
+
+class TestStabilityAnalyzer:
+    """Test sliding-window stability analysis."""
+    
+    def test_sliding_windows_match_per_window_regression(self):
+        """O(n) windows agree with per-window linregress/std results."""
+        import numpy as np
+        from scipy import stats
+        
+        # Flat, then doubling build-up, then drain: exercises every state
+        queue_profile = (
+            [2] * 8 +
+            [1, 2, 4, 8, 16, 32, 64] +
+            [32, 16, 8, 4, 2, 1] +
+            [2] * 8
+        )
+        measurements = [
+            FlowMeasurement(
+                timestamp=datetime(2024, 1, 15, 6, 0) + timedelta(minutes=5 * i),
+                location_id="front_desk_main",
+                location_type=LocationType.FRONT_DESK,
+                arrival_count=10 + i % 3,
+                queue_length=q,
+                observation_period_seconds=300
+            )
+            for i, q in enumerate(queue_profile)
+        ]
+        w = 4
+        windows = OperationalStabilityAnalyzer().sliding_windows(measurements, w)
+        
+        arrivals = [m.arrival_count for m in measurements]
+        queues = [m.queue_length for m in measurements]
+        
+        def trend(data):
+            slope = stats.linregress(np.arange(len(data)), data).slope
+            mean = np.mean(data)
+            return slope / mean if mean > 0 else 0.0
+        
+        assert len(windows) == len(measurements) - w
+        for i in range(len(windows)):
+            a = arrivals[i:i + w]
+            q = queues[i:i + w]
+            assert windows.arrival_trend[i] == pytest.approx(trend(a), abs=1e-12)
+            assert windows.queue_trend[i] == pytest.approx(trend(q), abs=1e-12)
+            assert windows.arrival_cv[i] == pytest.approx(np.std(a) / np.mean(a), abs=1e-12)
+        
+        assert {"stable", "degrading", "recovering", "crisis"} <= set(windows.states)
+    
+    def test_full_state_series_exposed(self):
+        """Every window's state is returned, not only the first 20."""
+        measurements = make_measurements(count=100)
+        result = OperationalStabilityAnalyzer().analyze_stability(measurements)
+        
+        assert result["status"] == "analyzed"
+        assert len(result["state_series"]) == result["total_periods"] == 88
+        assert len(result["periods"]) == 20
+        assert sum(result["state_distribution"].values()) == pytest.approx(1.0, abs=1e-3)
+    
+    def test_single_observation_windows_have_no_trend(self):
+        """window_size=1 is analyzed with zero trends, as before vectorization."""
+        measurements = make_measurements(count=10)
+        result = OperationalStabilityAnalyzer().analyze_stability(measurements, window_size=1)
+        
+        assert result["status"] == "analyzed"
+        assert result["total_periods"] == 9
+        assert all(p["arrival_trend"] == 0 and p["queue_trend"] == 0 for p in result["periods"])
+        assert all(p["arrival_cv"] == 0 for p in result["periods"])
+        assert set(result["state_series"]) == {"stable"}
 
 
 class TestLossCalculator:
@@ -219,6 +644,68 @@ class TestLossCalculator:
         # Loss should be reduced by conservative factor
         # This is implicitly tested by the factor being applied
         assert loss.total_loss >= 0
+    
+    def test_vectorized_components_match_per_observation_loop(self):
+        """Single-pass engine reproduces the per-observation loss loops exactly."""
+        params = FinancialParameters()
+        calculator = LossCalculator(params=params)
+        measurements = make_measurements(count=288, seed=11)
+        capacity = CapacityConstraint(
+            location_type=LocationType.FRONT_DESK,
+            max_servers=2,
+            max_queue_capacity=50
+        )
+        
+        # Reference: straightforward loops over measurements
+        acceptable = params.acceptable_wait_minutes * 60
+        walkaway_threshold = params.walkaway_threshold_minutes * 60
+        excess_wait = 0.0
+        walkaways = 0
+        lost = 0
+        idle = 0.0
+        overtime = 0.0
+        for m in measurements:
+            if m.avg_wait_time and m.avg_wait_time > acceptable:
+                excess_wait += (m.avg_wait_time - acceptable) * m.queue_length
+            if m.avg_wait_time and m.avg_wait_time > walkaway_threshold:
+                excess_minutes = (m.avg_wait_time - walkaway_threshold) / 60
+                prob = min(0.5, excess_minutes * params.walkaway_probability_per_minute)
+                walkaways += int(m.queue_length * prob)
+            max_throughput = capacity.max_servers * m.observation_period_seconds / 60
+            if m.arrival_count > max_throughput * 1.2:
+                lost += max(0, int(m.arrival_count - max_throughput))
+            if m.departure_rate > 0:
+                util = m.arrival_rate / (capacity.max_servers * m.departure_rate)
+            else:
+                util = 0.5
+            if util < capacity.target_utilization * 0.7:
+                idle += (
+                    (capacity.target_utilization - util) *
+                    m.observation_period_seconds * capacity.max_servers
+                )
+            if m.departure_rate > 0 and util > 1.0:
+                overtime += (util - 1.0) * m.observation_period_seconds * capacity.max_servers
+        
+        components = calculator.calculate_loss_components(measurements, capacity)
+        
+        assert components.excess_wait_seconds == excess_wait
+        assert components.estimated_walkaways == walkaways
+        assert components.lost_throughput_count == lost
+        assert components.idle_seconds == idle
+        assert components.overtime_seconds == overtime
+        
+        loss = calculator.calculate_total_loss(measurements, None, None, capacity)
+        assert loss.total_wait_time_seconds == excess_wait
+        assert loss.overtime_hours == overtime / 3600
+    
+    def test_components_without_capacity(self):
+        """Capacity-dependent categories are zero without capacity."""
+        calculator = LossCalculator()
+        components = calculator.calculate_loss_components(make_measurements())
+        
+        assert components.lost_throughput_count == 0
+        assert components.idle_seconds == 0.0
+        assert components.overtime_seconds == 0.0
 
 
 class TestPhysicsEngine:
@@ -283,6 +770,122 @@ class TestPhysicsEngine:
         assert result1["queue_metrics"]["L"] == result2["queue_metrics"]["L"]
         assert result1["queue_metrics"]["lambda_rate"] == result2["queue_metrics"]["lambda_rate"]
         assert result1["total_loss"] == result2["total_loss"]
+    
+    def test_analyze_day_runs_each_stage_once_per_location(self):
+        """Daily analysis shares one context per location."""
+        from unittest import mock
+        
+        engine = PhysicsEngine()
+        by_location = {
+            loc: make_measurements(count=60, seed=i, location_id=loc)
+            for i, loc in enumerate(["front_desk_main", "restaurant_main", "lobby"])
+        }
+        
+        stages = [
+            (engine.littles_law, "calculate"),
+            (engine.littles_law, "verify_littles_law"),
+            (engine.entropy_calc, "calculate_entropy"),
+            (engine.entropy_calc, "analyze_patterns"),
+            (engine.stability_analyzer, "analyze_stability"),
+            (engine.loss_calc, "calculate_total_loss"),
+        ]
+        with contextlib.ExitStack() as stack:
+            mocks = [
+                stack.enter_context(
+                    mock.patch.object(obj, name, wraps=getattr(obj, name))
+                )
+                for obj, name in stages
+            ]
+            insight = engine.analyze_day(by_location, {}, date(2024, 1, 15))
+        
+        for stage in mocks:
+            assert stage.call_count == len(by_location)
+        assert set(insight.loss_by_location) == set(by_location)
+    
+    def test_day_loss_matches_location_analysis(self):
+        """The daily FinancialLoss is the one behind analyze_location."""
+        engine = PhysicsEngine()
+        measurements = make_measurements(count=60)
+        
+        insight = engine.analyze_day(
+            {"front_desk_main": measurements}, {}, date(2024, 1, 20)
+        )
+        analysis = engine.analyze_location(measurements)
+        
+        assert round(insight.loss_by_location["front_desk_main"], 2) == analysis["total_loss"]
+        
+        context = engine.build_location_context(measurements, target_date=date(2024, 1, 20))
+        assert context.loss.calculation_date == date(2024, 1, 20)
+    
+    def test_analyze_day_uses_matching_entropy_sketch(self):
+        """A sketch covering exactly the day's data replaces the rescan."""
+        from unittest import mock
+        from app.core import EntropySketch
+        
+        engine = PhysicsEngine()
+        day = date(2024, 1, 15)
+        key = ("front_desk_main", day)
+        measurements = make_measurements(count=60)
+        complete, partial = EntropySketch(key=key), EntropySketch(key=key)
+        other_day = EntropySketch(key=("front_desk_main", date(2024, 1, 16)))
+        for m in measurements:
+            complete.update_measurement(m)
+            other_day.update_measurement(m)
+        for m in measurements[:-1]:
+            partial.update_measurement(m)
+        
+        batch = engine.analyze_day({"front_desk_main": measurements}, {}, day)
+        with mock.patch.object(
+            engine.entropy_calc, "calculate_entropy",
+            wraps=engine.entropy_calc.calculate_entropy
+        ) as batch_entropy:
+            sketched = engine.analyze_day(
+                {"front_desk_main": measurements}, {}, day,
+                entropy_sketches={key: complete}
+            )
+            assert batch_entropy.call_count == 0
+            
+            for sketch in (partial, other_day):
+                engine.analyze_day(
+                    {"front_desk_main": measurements}, {}, day,
+                    entropy_sketches={key: sketch}
+                )
+            assert batch_entropy.call_count == 2
+        
+        # Same losses and CVs; only the entropy score differs (fixed bins)
+        assert sketched.loss_by_location == batch.loss_by_location
+        from_sketch = engine.build_location_context(measurements, None, day, complete).analysis
+        rescanned = engine.build_location_context(measurements, None, day).analysis
+        assert from_sketch["entropy"]["arrival_cv"] == pytest.approx(rescanned["entropy"]["arrival_cv"])
+        assert from_sketch["entropy"]["entropy_score"] == complete.entropy_score()
+        assert from_sketch["entropy"]["entropy_score"] != rescanned["entropy"]["entropy_score"]
+    
+    def test_parallel_analyze_day_matches_sequential(self):
+        """Process-pool analysis merges results in location order."""
+        from app.core import shutdown_analysis_pool
+        
+        by_location = {
+            loc: make_measurements(count=80, seed=i, location_id=loc)
+            for i, loc in enumerate(["lobby", "front_desk_main", "spa", "restaurant_main"])
+        }
+        by_location["gym"] = []
+        
+        params = FinancialParameters(acceptable_wait_minutes=3.0)
+        sequential = PhysicsEngine(loss_calc=LossCalculator(params=params))
+        parallel = PhysicsEngine(loss_calc=LossCalculator(params=params))
+        parallel.analysis_workers = 2
+        
+        try:
+            expected = sequential.analyze_day(by_location, {}, date(2024, 1, 15))
+            actual = parallel.analyze_day(by_location, {}, date(2024, 1, 15))
+        finally:
+            shutdown_analysis_pool()
+        
+        assert list(actual.loss_by_location.items()) == list(expected.loss_by_location.items())
+        assert actual.total_calculated_loss == expected.total_calculated_loss
+        assert actual.top_loss_location == expected.top_loss_location
+        assert actual.calculation_confidence == expected.calculation_confidence
+        assert actual.calculation_hash == expected.calculation_hash != ""
 
 
 if __name__ == "__main__":
@@ -56,6 +56,339 @@ class TestDataIngestionService:
             in_service_count=2
         )
         assert service._calculate_confidence(partial_data) == 0.8  # -0.1 for each missing
+    
+    def test_bulk_rows_follow_single_ingest_rules(self, service):
+        """Column-wise preparation gives the same rates, confidence and rejections."""
+        from app.services.bulk_ingestion import prepare_bulk_rows, to_frame
+        
+        inputs = [
+            OperationalDataInput(
+                timestamp=datetime(2024, 1, 15, 10, 5 * i),
+                location_id="front_desk_main",
+                location_type=LocationTypeEnum.FRONT_DESK,
+                arrival_count=10 + i,
+                departure_count=25 if i == 3 else 9 + i,
+                queue_length=i,
+                in_service_count=2,
+                avg_service_duration_seconds=180 if i % 2 else None,
+                avg_wait_time_seconds=120 if i % 3 else None,
+                observation_period_seconds=300
+            )
+            for i in range(6)
+        ]
+        rows = [dp.model_dump(mode="json") for dp in inputs]
+        rows.insert(2, {**rows[0], "observation_period_seconds": 30})
+        rows.insert(4, {**rows[0], "queue_length": -1})
+        
+        created = datetime(2024, 1, 16)
+        prepared = prepare_bulk_rows(to_frame(rows), "gateway", created)
+        
+        assert prepared.errors == [
+            "Record 2: Invalid observation period",
+            "Record 4: queue_length must be a non-negative integer"
+        ]
+        assert list(prepared.record_numbers) == [0, 1, 3, 5, 6, 7]
+        for dp, doc in zip(inputs, prepared.documents):
+            assert doc["timestamp"] == dp.timestamp
+            assert doc["date"] == datetime(2024, 1, 15)
+            assert doc["arrival_rate"] == dp.arrival_count / 300
+            assert doc["departure_rate"] == dp.departure_count / 300
+            assert doc["confidence_score"] == service._calculate_confidence(dp)
+            assert doc["avg_service_duration"] == dp.avg_service_duration_seconds
+            assert doc["data_source"] == "gateway" and doc["created_at"] == created
+    
+    @pytest.mark.asyncio
+    async def test_bulk_insert_reports_failures_per_chunk(self, service):
+        """A failed document or chunk is reported; other chunks are still stored."""
+        from pymongo.errors import BulkWriteError
+        
+        rows = [
+            {
+                "timestamp": f"2024-01-15T10:{i:02d}:00Z",
+                "location_id": "lobby",
+                "location_type": "lobby",
+                "arrival_count": 5
+            }
+            for i in range(5)
+        ]
+        
+        async def insert_many(chunk, ordered):
+            assert ordered is False
+            for doc in chunk:
+                doc["_id"] = doc["timestamp"].minute
+            if chunk[0]["_id"] == 0:
+                raise BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "duplicate key"}]})
+            if chunk[0]["_id"] == 4:
+                raise ConnectionError("connection reset")
+        
+        service.live_metrics = MagicMock()
+        service.rollups = MagicMock(record_points=AsyncMock())
+        with patch("app.services.data_ingestion.OperationalDataPoint") as model, \
+                patch.object(service, "_create_audit_log", AsyncMock()):
+            model.get_motor_collection.return_value.insert_many = insert_many
+            result = await service.ingest_bulk(rows, chunk_size=2)
+        
+        assert result.records_processed == 3
+        assert result.records_failed == 2
+        assert result.data_point_ids == ["0", "2", "3"]
+        assert [(c.first_record, c.last_record, c.inserted) for c in result.chunks] == [
+            (0, 1, 1), (2, 3, 2), (4, 4, 0)
+        ]
+        assert result.chunks[0].errors == ["Record 1: duplicate key"]
+        assert result.chunks[2].errors == ["Chunk 2 insert failed: connection reset"]
+        assert service.rollups.record_points.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_idempotent_replay_only_counts_new_points(self, service):
+        """Replayed points are matched, not failed; only new ones reach rollups and insights."""
+        from pymongo.errors import BulkWriteError
+        
+        rows = [
+            {
+                "timestamp": f"2024-01-{15 + i // 2}T10:{i:02d}:00Z",
+                "location_id": "lobby",
+                "location_type": "lobby",
+                "arrival_count": 5
+            }
+            for i in range(4)
+        ]
+        
+        async def bulk_write(operations, ordered):
+            assert ordered is False
+            assert operations[0]._filter == {
+                "location_id": "lobby",
+                "timestamp": datetime(2024, 1, 15, 10, 0),
+                "data_source": "gateway"
+            }
+            raise BulkWriteError({
+                "writeErrors": [{"index": 3, "code": 11000, "errmsg": "duplicate key"}],
+                "upserted": [{"index": 2, "_id": "new"}],
+                "nMatched": 2,
+                "nModified": 0
+            })
+        
+        service.live_metrics = MagicMock()
+        service.rollups = MagicMock(record_points=AsyncMock())
+        with patch("app.services.data_ingestion.OperationalDataPoint") as model, \
+                patch("app.services.ingest_queue.DailyInsight") as insights, \
+                patch.object(service, "_create_audit_log", AsyncMock()):
+            model.get_motor_collection.return_value.bulk_write = bulk_write
+            insights.get_motor_collection.return_value.update_many = AsyncMock()
+            result = await service.ingest_bulk(rows, source="gateway", idempotent=True)
+        
+        assert result.success
+        assert result.records_processed == 4 and result.records_failed == 0
+        assert (result.inserted, result.matched) == (1, 3)
+        assert result.data_point_ids == ["new"]
+        stored = service.rollups.record_points.await_args.args[0]
+        assert [doc["timestamp"].minute for doc in stored] == [2]
+        stale_filter = insights.get_motor_collection.return_value.update_many.await_args.args[0]
+        assert stale_filter["date"] == {"$in": [datetime(2024, 1, 16)]}
+    
+    @pytest.mark.asyncio
+    async def test_retried_batch_keeps_new_points_and_derived_state(self, service):
+        """
+        A plain batch with an already-stored point stores the others, counts
+        the duplicate as failed and updates derived state for what was stored.
+        """
+        from types import SimpleNamespace
+        from pymongo.errors import BulkWriteError
+        from app.models.schemas import BatchOperationalDataInput
+        
+        batch = BatchOperationalDataInput(data_points=[
+            OperationalDataInput(
+                timestamp=datetime(2024, 1, 15 + i, 10, 0),
+                location_id="lobby",
+                location_type=LocationTypeEnum.LOBBY,
+                arrival_count=5,
+                departure_count=4,
+                queue_length=1,
+                in_service_count=1
+            )
+            for i in range(3)
+        ])
+        
+        async def insert_many(docs, ordered):
+            assert ordered is False
+            raise BulkWriteError({"writeErrors": [
+                {"index": 0, "code": 11000, "errmsg": "duplicate key"}
+            ]})
+        
+        service.live_metrics = MagicMock()
+        service.rollups = MagicMock(record_many=AsyncMock())
+        service.locations = MagicMock(observe=AsyncMock())
+        with patch("app.services.data_ingestion.OperationalDataPoint") as model, \
+                patch("app.services.data_ingestion.mark_insights_stale", AsyncMock()) as stale, \
+                patch.object(service, "_create_audit_log", AsyncMock()):
+            model.side_effect = lambda **fields: SimpleNamespace(id=None, **fields)
+            model.insert_many = insert_many
+            result = await service.ingest_batch(batch)
+        
+        stored = service.rollups.record_many.await_args.args[0]
+        assert not result.success
+        assert (result.records_processed, result.records_failed) == (2, 1)
+        assert result.errors == ["Record 0: duplicate key"]
+        assert result.data_point_ids == [str(doc.id) for doc in stored]
+        assert [doc.date for doc in stored] == [date(2024, 1, 16), date(2024, 1, 17)]
+        service.live_metrics.record_many.assert_called_once_with(stored)
+        service.locations.observe.assert_awaited_once_with(stored)
+        assert sorted(stale.await_args.args[0]) == [date(2024, 1, 16), date(2024, 1, 17)]
+    
+    @pytest.mark.asyncio
+    async def test_quality_report_from_aggregation_facets(self, service):
+        """Completeness is per location-day; gaps include days without data."""
+        facets = {
+            "days": [{
+                "_id": {"location_id": "lobby", "date": datetime(2024, 1, 15)},
+                "records": 278,
+                "intervals": 276,
+                "duplicates": 2,
+                "covered_seconds": 82800,
+                "first": datetime(2024, 1, 15),
+                "end": datetime(2024, 1, 16),
+                "departures_exceed_arrivals": 1,
+                "negative_counts": 0
+            }],
+            "duplicates": [
+                {"location_id": "lobby", "timestamp": datetime(2024, 1, 15, 8), "records": 3}
+            ],
+            "gaps": [{
+                "location_id": "lobby",
+                "period": 300,
+                "start": datetime(2024, 1, 15, 10),
+                "end": datetime(2024, 1, 15, 11),
+                "missing_seconds": 3600.0
+            }]
+        }
+        
+        with patch("app.services.data_ingestion.OperationalDataPoint") as model:
+            collection = model.get_motor_collection.return_value
+            collection.aggregate.return_value.to_list = AsyncMock(return_value=[facets])
+            report = await service.check_data_quality(date(2024, 1, 15), date(2024, 1, 16))
+        
+        pipeline = collection.aggregate.call_args.args[0]
+        assert set(pipeline[-1]["$facet"]) == {"days", "duplicates", "gaps"}
+        model.find.assert_not_called()
+        
+        assert report.total_records == 278
+        assert report.completeness_score == round((82800 / 86400) / 2, 4)
+        assert report.consistency_score == round(1 - 1 / 278, 4)
+        assert [(d["date"], d["completeness"]) for d in report.location_days] == [
+            ("2024-01-15", round(82800 / 86400, 4)), ("2024-01-16", 0.0)
+        ]
+        assert [(g["start"], g["missing_intervals"]) for g in report.gaps] == [
+            ("2024-01-16T00:00:00", 288), ("2024-01-15T10:00:00", 12)
+        ]
+        assert report.duplicate_timestamps[0]["timestamp"] == "2024-01-15T08:00:00"
+        assert report.consistency_violations == {
+            "departures_exceed_arrivals": 1, "negative_counts": 0
+        }
+    
+    @pytest.mark.asyncio
+    async def test_stream_parses_records_across_body_chunks(self):
+        """Lines split across body chunks are reassembled; bad lines keep their number."""
+        from app.services import bulk_ingestion
+        from app.services.bulk_ingestion import iter_record_batches
+        
+        body = (
+            b"timestamp,location_id,location_type,arrival_count\r\n"
+            b"2024-01-15T10:00:00Z,lobby,lobby,5\n"
+            b"\n"
+            b"2024-01-15T10:05:00Z,lobby,lobby\n"
+            b"2024-01-15T10:10:00Z,lobby,lobby,\n"
+            + b"x" * (bulk_ingestion.MAX_LINE_BYTES + 10) + b"\n"
+            b"2024-01-15T10:20:00Z,lobby,lobby,7"
+        )
+        
+        async def stream():
+            for i in range(0, len(body), 7000):
+                yield body[i:i + 7000]
+        
+        batches = [b async for b in iter_record_batches(stream(), "csv", batch_size=3)]
+        
+        assert [(b.first_record, b.last_record) for b in batches] == [(0, 2), (3, 4)]
+        assert batches[0].rows == [
+            {"timestamp": "2024-01-15T10:00:00Z", "location_id": "lobby",
+             "location_type": "lobby", "arrival_count": "5"},
+            {"timestamp": "2024-01-15T10:10:00Z", "location_id": "lobby", "location_type": "lobby"}
+        ]
+        assert batches[0].record_numbers == [0, 2]
+        assert batches[0].errors == ["Record 1: expected 4 fields, got 3"]
+        assert batches[1].errors[0].startswith("Record 3: line longer than")
+        assert batches[1].record_numbers == [4]
+    
+    @pytest.mark.asyncio
+    async def test_stream_ingests_batch_by_batch(self, service):
+        """Each batch is inserted before the next is read and summarized per chunk."""
+        lines = [
+            '{"timestamp": "2024-01-15T10:%02d:00Z", "location_id": "lobby", '
+            '"location_type": "lobby", "arrival_count": %d}' % (i, -1 if i == 3 else i)
+            for i in range(5)
+        ]
+        lines.insert(1, "{not json")
+        inserted = []
+        
+        async def stream():
+            for line in lines:
+                yield (line + "\n").encode()
+        
+        async def insert_many(chunk, ordered):
+            inserted.append(len(chunk))
+            for doc in chunk:
+                doc["_id"] = doc["timestamp"].minute
+        
+        service.live_metrics = MagicMock()
+        service.rollups = MagicMock(record_points=AsyncMock())
+        with patch("app.services.data_ingestion.OperationalDataPoint") as model, \
+                patch.object(service, "_create_audit_log", AsyncMock()):
+            model.get_motor_collection.return_value.insert_many = insert_many
+            result = await service.ingest_stream(stream(), "ndjson", chunk_size=4)
+        
+        assert inserted == [3, 1]
+        assert result.records_processed == 4 and result.records_failed == 2
+        assert result.data_point_ids == []
+        assert [(c.first_record, c.last_record, c.submitted, c.inserted) for c in result.chunks] == [
+            (0, 3, 4, 3), (4, 5, 2, 1)
+        ]
+        assert result.chunks[0].errors[0].startswith("Record 1: invalid JSON")
+        assert result.chunks[1].errors == ["Record 4: arrival_count must be a non-negative integer"]
+    
+    @pytest.mark.asyncio
+    async def test_backfill_csv_export_in_chunks(self, service):
+        """A renamed CSV export is imported chunk by chunk with record numbers."""
+        import io
+        from app.services import backfill
+        
+        export = "ts,outlet,location_type,arrival_count,observation_period_seconds\n" + "".join(
+            f"2024-01-15 10:{i:02d}:00,0042,restaurant,{i},{30 if i == 4 else 300}\n"
+            for i in range(7)
+        )
+        stored = []
+        
+        async def insert_many(chunk, ordered):
+            for doc in chunk:
+                doc["_id"] = len(stored)
+                stored.append(doc)
+        
+        service.live_metrics = MagicMock()
+        service.rollups = MagicMock(record_points=AsyncMock())
+        with patch("app.services.data_ingestion.OperationalDataPoint") as model, \
+                patch.object(service, "_create_audit_log", AsyncMock()), \
+                patch.object(backfill, "get_ingestion_service", return_value=service):
+            model.get_motor_collection.return_value.insert_many = insert_many
+            summary = await backfill.backfill_file(
+                io.BytesIO(export.encode()), "csv", chunk_size=3,
+                rename={"ts": "timestamp", "outlet": "location_id"}
+            )
+        
+        assert summary["records_processed"] == 6
+        assert summary["errors"] == ["Record 4: Invalid observation period"]
+        assert [(c["first_record"], c["last_record"], c["inserted"]) for c in summary["chunks"]] == [
+            (0, 2, 3), (3, 5, 2), (6, 6, 1)
+        ]
+        assert {doc["location_id"] for doc in stored} == {"0042"}
+        assert stored[-1]["timestamp"] == datetime(2024, 1, 15, 10, 6)
+        assert service.rollups.record_points.await_count == 3
 
 
 class TestVideoProcessorService:
@@ -139,7 +472,710 @@ class TestROIVerification:
         assert result.is_valid is True
         assert result.loss_reduction == 300
         assert result.improvement_percentage == 30.0
+    
+    @pytest.mark.asyncio
+    async def test_period_statistics_need_full_rollup_coverage(self):
+        """Daily rollups are used only when they hold every stored point."""
+        from app.services.rollups import RollupService
+        
+        rows = [
+            {"location_id": "lobby", "data_points": 12, "stats": {},
+             "loss": {"excess_wait_seconds": 60.0, "estimated_walkaways": 1.0}}
+        ]
+        service = ROITrackerService()
+        service.rollups = RollupService()
+        service._get_period_data = AsyncMock(return_value=[])
+        
+        with patch("app.services.rollups.DailyRollup") as rollup, \
+             patch("app.services.rollups.OperationalDataPoint") as points:
+            rollup.get_motor_collection.return_value.find.return_value.sort.return_value \
+                .to_list = AsyncMock(return_value=rows)
+            count = points.get_motor_collection.return_value.count_documents = AsyncMock(
+                return_value=12
+            )
+            
+            count_, loss = await service._get_period_statistics(
+                "lobby", date(2024, 1, 1), date(2024, 1, 7)
+            )
+            assert (count_, loss.excess_wait_seconds) == (12, 60.0)
+            service._get_period_data.assert_not_awaited()
+            
+            # A day without a bucket: counts disagree, raw data is read
+            count.return_value = 20
+            assert await service._get_period_statistics(
+                "lobby", date(2024, 1, 1), date(2024, 1, 7)
+            ) is None
+            service._get_period_data.assert_awaited_once()
+
+
+class TestLiveMetricsRegistry:
+    """Tests for running per-location metrics."""
+    
+    @staticmethod
+    def _point(doc_id, minute, arrivals, queue, location_id="front_desk_main"):
+        from types import SimpleNamespace
+        return SimpleNamespace(
+            id=doc_id,
+            timestamp=datetime(2024, 1, 15, 10, minute),
+            date=date(2024, 1, 15),
+            location_id=location_id,
+            location_type="front_desk",
+            arrival_count=arrivals,
+            departure_count=arrivals,
+            queue_length=queue,
+            in_service_count=2,
+            avg_service_duration=120.0,
+            avg_wait_time=60.0,
+            observation_period_seconds=300
+        )
+    
+    @pytest.mark.asyncio
+    async def test_seeds_once_then_updates_incrementally(self):
+        """First read scans the day; later ingests update in O(1)."""
+        from app.services.live_metrics import LiveMetricsRegistry
+        
+        stored = [self._point(f"id{i}", i, 10 + i, i % 4) for i in range(12)]
+        query = MagicMock()
+        query.sort.return_value.to_list = AsyncMock(return_value=stored)
+        
+        registry = LiveMetricsRegistry()
+        with patch("app.services.live_metrics.OperationalDataPoint") as model:
+            model.find.return_value = query
+            
+            # Not requested yet: nothing is tracked
+            registry.record(self._point("early", 30, 5, 1))
+            
+            accumulator = await registry.get_accumulator("front_desk_main", date(2024, 1, 15))
+            assert accumulator.count == 12
+            
+            registry.record(self._point("id12", 40, 30, 6))
+            registry.record(self._point("other", 40, 30, 6, location_id="lobby"))
+            again = await registry.get_accumulator("front_desk_main", date(2024, 1, 15))
+            
+            assert model.find.call_count == 1
+        
+        assert again is accumulator
+        assert accumulator.count == 13
+        assert accumulator.arrival_rate.mean == pytest.approx(
+            (sum(10 + i for i in range(12)) + 30) / 13 / 300
+        )
+
 
+class TestFlowDataRepository:
+    """Tests for the projection-only analysis reads."""
+    
+    @staticmethod
+    def _raw(minute, location_id, arrivals, wait=None):
+        return {
+            "timestamp": datetime(2024, 1, 15, 10, minute),
+            "location_id": location_id,
+            "location_type": "front_desk" if location_id == "front_desk_main" else "lobby",
+            "arrival_count": arrivals,
+            "departure_count": arrivals - 1,
+            "queue_length": minute % 5,
+            "in_service_count": 2,
+            "avg_service_duration": 120.0,
+            "avg_wait_time": wait,
+            "observation_period_seconds": 300
+        }
+    
+    @pytest.mark.asyncio
+    async def test_batches_fill_columns_per_location(self):
+        """Raw projected batches become the same series as measurements would."""
+        import numpy as np
+        from app.core.flow_series import FlowSeries
+        from app.models.domain import FlowMeasurement
+        from app.services.flow_repository import (
+            FlowDataRepository, FLOW_PROJECTION, FLOW_SORT
+        )
+        
+        raw = [
+            self._raw(i, "front_desk_main" if i % 3 else "lobby", 10 + i, 30.0 if i % 2 else None)
+            for i in range(25)
+        ]
+        cursor = MagicMock()
+        cursor.sort.return_value.batch_size.return_value = cursor
+        cursor.to_list = AsyncMock(side_effect=[raw[0:4], raw[4:8], raw[8:12], raw[12:16],
+                                                raw[16:20], raw[20:24], raw[24:], []])
+        
+        with patch("app.services.flow_repository.OperationalDataPoint") as model:
+            model.get_motor_collection.return_value.find.return_value = cursor
+            by_location = await FlowDataRepository(batch_size=4).fetch_series_by_location(
+                date(2024, 1, 15)
+            )
+            query, projection = model.get_motor_collection.return_value.find.call_args.args
+        
+        # Dates are stored as midnight datetimes; only physics fields are read,
+        # in (date, location_id, timestamp) index order
+        assert query == {"date": datetime(2024, 1, 15)}
+        assert projection is FLOW_PROJECTION
+        cursor.sort.assert_called_once_with(FLOW_SORT)
+        
+        assert list(by_location) == ["lobby", "front_desk_main"]
+        for location_id, series in by_location.items():
+            expected = FlowSeries.from_measurements([
+                FlowMeasurement(**doc) for doc in raw if doc["location_id"] == location_id
+            ])
+            assert series.location_type == expected.location_type
+            for column in ("timestamps", "arrival_count", "departure_count", "queue_length",
+                           "in_service_count", "avg_service_duration", "avg_wait_time",
+                           "observation_period_seconds", "has_wait_time"):
+                np.testing.assert_array_equal(getattr(series, column), getattr(expected, column))
+    
+    @pytest.mark.asyncio
+    async def test_summary_is_aggregated_server_side(self):
+        """Summary totals come back as one $group row; empty days give None."""
+        from app.services.flow_repository import FlowDataRepository
+        
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(side_effect=[[{"_id": None, "count": 3}], []])
+        
+        with patch("app.services.flow_repository.OperationalDataPoint") as model:
+            model.get_motor_collection.return_value.aggregate.return_value = cursor
+            repository = FlowDataRepository()
+            summary = await repository.summarize_day(date(2024, 1, 15), "lobby")
+            empty = await repository.summarize_day(date(2024, 1, 16))
+            pipeline = model.get_motor_collection.return_value.aggregate.call_args_list[0].args[0]
+        
+        assert summary["count"] == 3
+        assert empty is None
+        assert pipeline[0] == {"$match": {"date": datetime(2024, 1, 15), "location_id": "lobby"}}
+        assert list(pipeline[1]) == ["$group"]
+    
+    @pytest.mark.asyncio
+    async def test_combined_series_is_time_ordered(self):
+        """Points read in index (location) order are merged back into time order."""
+        import numpy as np
+        from app.services.flow_repository import FlowDataRepository
+        
+        raw = [self._raw(i, "front_desk_main", 10) for i in (0, 10, 20)]
+        raw += [self._raw(i, "lobby", 10) for i in (5, 15)]
+        cursor = MagicMock()
+        cursor.sort.return_value.batch_size.return_value = cursor
+        cursor.to_list = AsyncMock(side_effect=[raw, []])
+        
+        with patch("app.services.flow_repository.OperationalDataPoint") as model:
+            model.get_motor_collection.return_value.find.return_value = cursor
+            series = await FlowDataRepository().fetch_series(date(2024, 1, 15))
+        
+        minutes = [ts.astype(object).minute for ts in series.timestamps]
+        assert minutes == [0, 5, 10, 15, 20]
+        np.testing.assert_array_equal(series.queue_length, [m % 5 for m in minutes])
+        assert series.location_id == "front_desk_main"
+    
+    def test_explain_summary_flags_scans_and_sorts(self):
+        """Plan stages and examined/returned counts are pulled from explain()."""
+        from app.services.query_plans import summarize_explain
+        
+        indexed = summarize_explain({
+            "queryPlanner": {"winningPlan": {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "indexName": "date_-1_location_id_1_timestamp_1"}
+            }},
+            "executionStats": {"nReturned": 288, "totalKeysExamined": 288,
+                               "totalDocsExamined": 288, "executionTimeMillis": 3}
+        })
+        assert indexed["stages"] == ["FETCH", "IXSCAN"]
+        assert indexed["indexes"] == ["date_-1_location_id_1_timestamp_1"]
+        assert not indexed["collection_scan"] and not indexed["in_memory_sort"]
+        assert indexed["examined_per_returned"] == 1.0
+        
+        # Aggregations nest the planner output under $cursor
+        scanned = summarize_explain({"stages": [{"$cursor": {
+            "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}},
+            "executionStats": {"nReturned": 10, "totalKeysExamined": 0, "totalDocsExamined": 5000}
+        }}]})
+        assert scanned["collection_scan"] and scanned["in_memory_sort"]
+        assert scanned["examined_per_returned"] == 500.0
+
+
+class TestRollups:
+    """Tests for ingest-time hourly/daily rollups."""
+    
+    def test_rollup_summary_matches_point_scan(self):
+        """Buckets built in two updates summarize like a scan of all points."""
+        from app.services.rollups import build_buckets, summarize_rows, hourly_rows, row_statistics
+        
+        points = []
+        for i in range(40):
+            arrivals = (i * 7) % 13
+            departures = (i * 5) % 11
+            points.append({
+                "timestamp": datetime(2024, 1, 15, 8 + i // 12, (i * 5) % 60),
+                "date": date(2024, 1, 15),
+                "location_id": "front_desk_main" if i % 2 else "lobby",
+                "location_type": "front_desk" if i % 2 else "lobby",
+                "arrival_count": arrivals,
+                "departure_count": departures,
+                "queue_length": i % 6,
+                "in_service_count": 2,
+                "avg_wait_time": [None, 0.0, 45.0, 120.0][i % 4],
+                "avg_service_duration": 90.0 + i,
+                "arrival_rate": arrivals / 300,
+                "departure_rate": departures / 300
+            })
+        
+        # Two ingest batches folded into the same buckets
+        first_hourly, first_daily = build_buckets(points[:25])
+        second_hourly, second_daily = build_buckets(points[25:])
+        daily = [b.as_document() for b in first_daily.values()] + \
+                [b.as_document() for b in second_daily.values()]
+        hourly = [b.as_document() for b in first_hourly.values()] + \
+                 [b.as_document() for b in second_hourly.values()]
+        
+        summary = summarize_rows(daily)
+        waits = [p["avg_wait_time"] for p in points if p["avg_wait_time"]]
+        utilizations = [
+            min(p["arrival_rate"] / p["departure_rate"], 2.0)
+            for p in points if p["departure_rate"]
+        ]
+        
+        assert summary["count"] == 40
+        assert summary["total_arrivals"] == sum(p["arrival_count"] for p in points)
+        assert summary["avg_queue"] == pytest.approx(sum(p["queue_length"] for p in points) / 40)
+        assert summary["max_queue"] == 5
+        assert summary["avg_wait"] == pytest.approx(sum(waits) / len(waits))
+        assert summary["max_wait"] == max(waits)
+        assert summary["avg_util"] == pytest.approx(sum(utilizations) / len(utilizations))
+        assert summary["peak_util"] == max(utilizations)
+        assert row_statistics(daily).field_stats("total_in_system").total_sq == sum(
+            (p["queue_length"] + 2) ** 2 for p in points
+        )
+        
+        rows = hourly_rows(hourly)
+        assert [r["_id"] for r in rows] == [8, 9, 10, 11]
+        assert sum(
+            sum(h["quantiles"].get("avg_wait_time", {}).get("0_01", {}).get("bins", {}).values())
+            for h in hourly
+        ) == len(waits)
+        assert sum(r["arrivals"] for r in rows) == summary["total_arrivals"]
+        assert summarize_rows([]) is None
+    
+    @pytest.mark.asyncio
+    async def test_partial_rollups_are_not_served(self):
+        """Summaries need buckets for every stored point of the day."""
+        from app.services.rollups import RollupService, build_buckets
+        
+        points = [{
+            "timestamp": datetime(2024, 1, 15, hour, 0),
+            "date": date(2024, 1, 15),
+            "location_id": "lobby",
+            "location_type": "lobby",
+            "arrival_count": 4,
+            "departure_count": 3,
+            "queue_length": 2,
+            "in_service_count": 1,
+            "avg_wait_time": 30.0,
+            "avg_service_duration": 60.0,
+            "arrival_rate": 4 / 300,
+            "departure_rate": 3 / 300
+        } for hour in (8, 9)]
+        hourly, daily = build_buckets(points)
+        service = RollupService()
+        
+        with patch("app.services.rollups.DailyRollup") as daily_model, \
+             patch("app.services.rollups.HourlyRollup") as hourly_model, \
+             patch("app.services.rollups.OperationalDataPoint") as model:
+            daily_model.get_motor_collection.return_value.find.return_value.sort.return_value \
+                .to_list = AsyncMock(return_value=[b.as_document() for b in daily.values()])
+            hourly_model.get_motor_collection.return_value.find.return_value.sort.return_value \
+                .to_list = AsyncMock(return_value=[b.as_document() for b in hourly.values()])
+            count = model.get_motor_collection.return_value.count_documents = AsyncMock(
+                return_value=2
+            )
+            assert (await service.summarize_day(date(2024, 1, 15)))["count"] == 2
+            assert len(await service.hourly_breakdown(date(2024, 1, 15))) == 2
+            
+            count.return_value = 3
+            assert await service.summarize_day(date(2024, 1, 15)) is None
+            assert await service.hourly_breakdown(date(2024, 1, 15)) == []
+    
+    @pytest.mark.asyncio
+    async def test_quantile_sketches_are_kept_per_accuracy(self):
+        """Changing the accuracy setting starts new sketches instead of relabeling bins."""
+        from app.core import QuantileSketch
+        from app.services.rollups import RollupBucket, RollupService
+        
+        coarse, fine = QuantileSketch(relative_accuracy=0.05), QuantileSketch(relative_accuracy=0.01)
+        for value in (30.0, 60.0, 240.0):
+            coarse.update(value)
+            fine.update(value)
+        bucket = RollupBucket("lobby", "lobby", date(2024, 1, 15), 9, sketches={"avg_wait_time": fine})
+        update = bucket.update_operation()._doc
+        assert update["$set"]["quantiles.avg_wait_time.0_01.relative_accuracy"] == 0.01
+        assert all(path.startswith("quantiles.avg_wait_time.0_01.") for path in update["$inc"]
+                   if path.startswith("quantiles"))
+        
+        row = {"quantiles": {"avg_wait_time": {"0_05": coarse.to_dict(), "0_01": fine.to_dict()}}}
+        service = RollupService()
+        service.relative_accuracy = 0.01
+        with patch("app.services.rollups.HourlyRollup") as model:
+            cursor = model.get_motor_collection.return_value.find.return_value.batch_size.return_value
+            cursor.__aiter__.return_value = [row, row]
+            merged = await service.get_quantile_sketches(date(2024, 1, 15), date(2024, 1, 15))
+        
+        assert merged["avg_wait_time"].relative_accuracy == 0.01
+        assert merged["avg_wait_time"].count == 6
+
+
+class TestIngestBatcher:
+    """Tests for micro-batched single-point ingestion."""
+    
+    @staticmethod
+    def _doc(i):
+        from types import SimpleNamespace
+        return SimpleNamespace(id=None, location_id="lobby", minute=i)
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_points_share_insert_many(self):
+        """A full batch commits at once, the rest after the linger time; each caller gets its id."""
+        import asyncio
+        from app.services.ingest_queue import IngestBatcher
+        
+        batcher = IngestBatcher(max_batch_size=3, linger_ms=20)
+        batcher.live_metrics = MagicMock()
+        batcher.rollups = MagicMock(record_many=AsyncMock())
+        docs = [self._doc(i) for i in range(5)]
+        
+        with patch("app.services.ingest_queue.OperationalDataPoint") as model:
+            model.insert_many = AsyncMock()
+            tasks = [asyncio.create_task(batcher.submit(doc)) for doc in docs]
+            await asyncio.sleep(0.005)
+            assert [len(c.args[0]) for c in model.insert_many.call_args_list] == [3]
+            ids = await asyncio.gather(*tasks)
+            batches = [c.args[0] for c in model.insert_many.call_args_list]
+        
+        assert [len(b) for b in batches] == [3, 2]
+        assert ids == [str(doc.id) for doc in docs]
+        assert len(set(ids)) == 5
+        assert batcher.rollups.record_many.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_point_is_reported_to_its_caller_only(self):
+        """Points of a partly failed batch are acknowledged individually."""
+        import asyncio
+        from pymongo.errors import BulkWriteError
+        from app.services.ingest_queue import IngestBatcher
+        
+        batcher = IngestBatcher(max_batch_size=3, linger_ms=1000)
+        batcher.live_metrics = MagicMock()
+        batcher.rollups = MagicMock(record_many=AsyncMock())
+        docs = [self._doc(i) for i in range(3)]
+        
+        with patch("app.services.ingest_queue.OperationalDataPoint") as model:
+            model.insert_many = AsyncMock(side_effect=BulkWriteError(
+                {"writeErrors": [{"index": 1, "errmsg": "document failed validation"}]}
+            ))
+            results = await asyncio.gather(
+                *(batcher.submit(doc) for doc in docs), return_exceptions=True
+            )
+        
+        assert results[0] == str(docs[0].id) and results[2] == str(docs[2].id)
+        assert isinstance(results[1], RuntimeError)
+        assert "document failed validation" in str(results[1])
+        batcher.rollups.record_many.assert_awaited_once_with([docs[0], docs[2]])
+    
+    @pytest.mark.asyncio
+    async def test_failing_updates_do_not_block_callers(self):
+        """Callers are acknowledged even when derived-state updates raise; stale days are flagged."""
+        import asyncio
+        from types import SimpleNamespace
+        from app.services.ingest_queue import IngestBatcher
+        
+        batcher = IngestBatcher(max_batch_size=2, linger_ms=1000)
+        batcher.live_metrics = MagicMock(record_many=MagicMock(side_effect=KeyError("hour")))
+        batcher.rollups = MagicMock(record_many=AsyncMock(side_effect=ConnectionError("down")))
+        batcher.locations = MagicMock(observe=AsyncMock())
+        docs = [
+            SimpleNamespace(id=None, location_id="lobby", date=date(2024, 1, 15 + i))
+            for i in range(2)
+        ]
+        
+        with patch("app.services.ingest_queue.OperationalDataPoint") as model, \
+                patch("app.services.ingest_queue.DailyInsight") as insights:
+            model.insert_many = AsyncMock()
+            update_many = insights.get_motor_collection.return_value.update_many = AsyncMock()
+            ids = await asyncio.wait_for(
+                asyncio.gather(*(batcher.submit(doc) for doc in docs)), timeout=1
+            )
+        
+        assert ids == [str(doc.id) for doc in docs]
+        batcher.locations.observe.assert_awaited_once()
+        assert update_many.await_args.args[0]["date"] == {
+            "$in": [datetime(2024, 1, 15), datetime(2024, 1, 16)]
+        }
+
+
+class TestAuditLogSink:
+    """Tests for group-committed, hash-chained audit entries."""
+    
+    @staticmethod
+    def _entry(i):
+        from types import SimpleNamespace
+        return SimpleNamespace(
+            calculation_id=f"ingest_{i}",
+            calculation_type="data_ingestion",
+            timestamp=datetime(2024, 1, 15, 10, 0, 0, 123456),
+            input_data={"operation": "ingest_single", "data_point_id": str(i)},
+            input_hash="",
+            output_data={"status": "ingested"},
+            output_hash=""
+        )
+    
+    @pytest.mark.asyncio
+    async def test_entries_are_written_in_chained_batches(self):
+        """Size-triggered and shutdown flushes write sealed batches that verify."""
+        import asyncio
+        from app.services.audit_sink import AuditLogSink, verify_batches
+        
+        sink = AuditLogSink(max_batch_size=3, flush_interval_ms=60000)
+        with patch("app.services.audit_sink.CalculationAuditLog") as model:
+            model.insert_many = AsyncMock()
+            await sink.start()
+            for i in range(3):
+                await sink.submit(self._entry(i))
+            await asyncio.sleep(0.01)
+            # A full batch goes out without waiting for the interval
+            assert model.insert_many.await_count == 1
+            for i in range(3, 5):
+                await sink.submit(self._entry(i))
+            await asyncio.sleep(0.01)
+            assert sink.buffered == 2
+            await sink.close()
+            batches = [c.args[0] for c in model.insert_many.call_args_list]
+        
+        assert [len(b) for b in batches] == [3, 2]
+        assert sink.buffered == 0
+        
+        stored = [dict(vars(e), timestamp=datetime(2024, 1, 15, 10, 0, 0, 123000))
+                  for batch in batches for e in batch]
+        assert verify_batches(stored) == {"valid": True, "batches_verified": 2}
+        
+        stored[3]["input_data"] = {**stored[3]["input_data"], "data_point_id": "forged"}
+        assert verify_batches(stored)["reason"] == "entry content changed"
+        del stored[3]
+        assert verify_batches(stored)["reason"] == "entries missing"
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried_unchanged(self):
+        """A failed write keeps the sealed batch; the retry reuses ids and digest."""
+        from pymongo.errors import BulkWriteError
+        from app.services.audit_sink import AuditLogSink
+        
+        sink = AuditLogSink(max_batch_size=10)
+        with patch("app.services.audit_sink.CalculationAuditLog") as model:
+            model.insert_many = AsyncMock(side_effect=[
+                ConnectionError("down"),
+                BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]}),
+                None
+            ])
+            await sink.submit(self._entry(0))  # not running: written through
+            assert sink.buffered == 1
+            await sink.submit(self._entry(1))
+            first, retry, second = [c.args[0] for c in model.insert_many.call_args_list]
+        
+        assert sink.buffered == 0
+        assert retry == first
+        assert (first[0].batch_sequence, second[0].batch_sequence) == (1, 2)
+        assert second[0].previous_batch_digest == first[0].batch_digest
+    
+    @pytest.mark.asyncio
+    async def test_full_backlog_blocks_submit_instead_of_dropping(self):
+        """With the write backlog full, submit waits; every batch is written in order."""
+        import asyncio
+        from app.services.audit_sink import AuditLogSink
+        
+        sink = AuditLogSink(max_batch_size=1, flush_interval_ms=60000)
+        with patch("app.services.audit_sink.CalculationAuditLog") as model, \
+             patch("app.services.audit_sink.MAX_UNWRITTEN_BATCHES", 2):
+            model.insert_many = AsyncMock(side_effect=ConnectionError("down"))
+            await sink.start()
+            for i in range(2):
+                await sink.submit(self._entry(i))
+                await asyncio.sleep(0.01)
+            
+            blocked = asyncio.create_task(sink.submit(self._entry(2)))
+            await asyncio.sleep(0.01)
+            assert not blocked.done()
+            assert sink.buffered == 2
+            
+            model.insert_many = AsyncMock()
+            await sink.flush()
+            await asyncio.wait_for(blocked, timeout=1)
+            await sink.close()
+            written = [c.args[0][0].batch_sequence for c in model.insert_many.call_args_list]
+        
+        assert written == [1, 2, 3]
+        assert sink.buffered == 0
+
+
+class TestLocationRegistry:
+    """Tests for the cached location registry."""
+    
+    @pytest.mark.asyncio
+    async def test_first_appearance_is_registered_once(self):
+        """New locations are written once; lookups afterwards are memory reads."""
+        from types import SimpleNamespace
+        from app.models.domain import LocationType
+        from app.services.location_registry import LocationRegistry
+        
+        stored = [{
+            "location_id": "desk_a", "location_type": "front_desk",
+            "max_servers": 4, "max_queue_capacity": 40,
+            "first_seen": datetime(2024, 1, 1), "last_seen": datetime(2024, 1, 15, 9)
+        }]
+        registry = LocationRegistry(ttl_seconds=3600)
+        with patch("app.services.location_registry.LocationRecord") as model:
+            collection = model.get_motor_collection.return_value
+            collection.find.return_value.to_list = AsyncMock(return_value=stored)
+            collection.bulk_write = AsyncMock()
+            
+            await registry.observe([
+                {"location_id": "desk_a", "location_type": "front_desk",
+                 "timestamp": datetime(2024, 1, 15, 9, 5)},
+                SimpleNamespace(location_id="pool_bar", location_type=LocationType.LOBBY,
+                                timestamp=datetime(2024, 1, 15, 9, 5))
+            ])
+            operations = collection.bulk_write.await_args.args[0]
+            assert [op._filter for op in operations] == [{"location_id": "pool_bar"}]
+            
+            await registry.observe([
+                {"location_id": "pool_bar", "location_type": "lobby",
+                 "timestamp": datetime(2024, 1, 15, 9, 10)}
+            ])
+            assert collection.bulk_write.await_count == 1
+            
+            assert await registry.location_ids() == ["desk_a", "pool_bar"]
+            capacities = await registry.capacities(["desk_a", "pool_bar", "restaurant_main"])
+            assert collection.find.call_count == 1
+        
+        assert (capacities["desk_a"].max_servers, capacities["desk_a"].max_queue_capacity) == (4, 40)
+        assert capacities["pool_bar"].location_type == LocationType.LOBBY
+        assert capacities["restaurant_main"].location_type == LocationType.RESTAURANT
+    
+    @pytest.mark.asyncio
+    async def test_observe_only_checks_the_batch_locations(self):
+        """Cached locations without new points are not rewritten."""
+        from app.services.location_registry import LocationRegistry
+        
+        stored = [
+            {"location_id": location_id, "location_type": "lobby",
+             "max_servers": 2, "max_queue_capacity": 20,
+             "first_seen": datetime(2024, 1, 1), "last_seen": datetime(2024, 1, 15, 9)}
+            for location_id in ("lobby_a", "lobby_b")
+        ]
+        registry = LocationRegistry(ttl_seconds=3600)
+        with patch("app.services.location_registry.LocationRecord") as model:
+            collection = model.get_motor_collection.return_value
+            collection.find.return_value.to_list = AsyncMock(return_value=stored)
+            collection.bulk_write = AsyncMock()
+            await registry.reload()
+            # lobby_b advanced in the cache but its write is still throttled
+            registry._locations["lobby_b"].last_seen = datetime(2024, 1, 15, 12)
+            registry._persisted_last_seen["lobby_b"] = datetime(2024, 1, 15, 9)
+            
+            await registry.observe([
+                {"location_id": "lobby_a", "location_type": "lobby",
+                 "timestamp": datetime(2024, 1, 15, 11)}
+            ])
+            operations = collection.bulk_write.await_args.args[0]
+        
+        assert [op._filter for op in operations] == [{"location_id": "lobby_a"}]
+    
+    @pytest.mark.asyncio
+    async def test_reload_keeps_locations_observed_meanwhile(self):
+        """A location registered while the registry is reloading is kept."""
+        from app.services.location_registry import LocationRegistry
+        
+        stored = [{
+            "location_id": "lobby_a", "location_type": "lobby",
+            "max_servers": 2, "max_queue_capacity": 20,
+            "first_seen": datetime(2024, 1, 1), "last_seen": datetime(2024, 1, 15, 9)
+        }]
+        registry = LocationRegistry(ttl_seconds=3600)
+        
+        async def read_during_observe(length=None):
+            await registry.observe([
+                {"location_id": "lobby_new", "location_type": "lobby",
+                 "timestamp": datetime(2024, 1, 15, 10)}
+            ])
+            return stored
+        
+        with patch("app.services.location_registry.LocationRecord") as model:
+            collection = model.get_motor_collection.return_value
+            collection.find.return_value.to_list = AsyncMock(return_value=stored)
+            collection.bulk_write = AsyncMock()
+            await registry.reload()
+            collection.find.return_value.to_list = AsyncMock(side_effect=read_during_observe)
+            await registry.reload()
+            collection.bulk_write.reset_mock()
+            
+            await registry.observe([
+                {"location_id": "lobby_new", "location_type": "lobby",
+                 "timestamp": datetime(2024, 1, 15, 10, 1)}
+            ])
+        
+        assert await registry.location_ids() == ["lobby_a", "lobby_new"]
+        # Its registration was persisted, so the next point is not re-registered
+        collection.bulk_write.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_loss_capacity_only_for_front_desk_data(self):
+        """/metrics/loss computes idle and overtime costs for front desks only."""
+        from app.models.domain import LocationType
+        from app.services.location_registry import LocationRegistry
+        
+        stored = [{
+            "location_id": "restaurant_main", "location_type": "restaurant",
+            "max_servers": 6, "max_queue_capacity": 25,
+            "first_seen": datetime(2024, 1, 1), "last_seen": datetime(2024, 1, 15, 9)
+        }, {
+            "location_id": "desk_east", "location_type": "front_desk",
+            "max_servers": 2, "max_queue_capacity": 12,
+            "first_seen": datetime(2024, 1, 1), "last_seen": datetime(2024, 1, 15, 9)
+        }]
+        registry = LocationRegistry(ttl_seconds=3600)
+        with patch("app.services.location_registry.LocationRecord") as model:
+            model.get_motor_collection.return_value.find.return_value.to_list = AsyncMock(
+                return_value=stored
+            )
+            restaurant = await registry.loss_capacity("restaurant_main", "restaurant")
+            unfiltered = await registry.loss_capacity(None, "restaurant")
+            registered = await registry.loss_capacity("desk_east", "front_desk")
+            front_desk = await registry.loss_capacity(None, "front_desk")
+        
+        assert restaurant is None
+        assert unfiltered is None
+        assert (registered.max_servers, registered.max_queue_capacity) == (2, 12)
+        assert front_desk.location_type == LocationType.FRONT_DESK
+        assert front_desk.max_queue_capacity == 50
+    
+    @pytest.mark.asyncio
+    async def test_analysis_capacity_uses_registry_for_every_type(self):
+        """
+        /metrics/analysis uses a requested location's registered capacity
+        whatever its type, and the front desk default for all locations.
+        """
+        from app.models.domain import LocationType
+        from app.services.location_registry import LocationRegistry
+        
+        stored = [{
+            "location_id": "restaurant_main", "location_type": "restaurant",
+            "max_servers": 6, "max_queue_capacity": 25,
+            "first_seen": datetime(2024, 1, 1), "last_seen": datetime(2024, 1, 15, 9)
+        }]
+        registry = LocationRegistry(ttl_seconds=3600)
+        with patch("app.services.location_registry.LocationRecord") as model:
+            model.get_motor_collection.return_value.find.return_value.to_list = AsyncMock(
+                return_value=stored
+            )
+            registered = await registry.analysis_capacity("restaurant_main")
+            unfiltered = await registry.analysis_capacity(None)
+        
+        assert registered.location_type == LocationType.RESTAURANT
+        assert (registered.max_servers, registered.max_queue_capacity) == (6, 25)
+        assert unfiltered.location_type == LocationType.FRONT_DESK
+        assert unfiltered.max_queue_capacity == 50
 
 class TestPrivacyPrinciples:
     """Tests for privacy principles across services."""